@@ -15,6 +15,20 @@ from langchain_community.vectorstores import Chroma
 from langchain.chains import RetrievalQA
 from langchain.memory import ConversationBufferMemory
 import tempfile
+import sys
+
+# Shared on-disk embedding cache from the app sources (src/embedding_cache.py).
+# As a script, src/ is next to this file; pasted into a notebook there is no
+# __file__, so look for it from the working directory (RAG/ or the repo root)
+try:
+    RAG_DIR = os.path.dirname(os.path.abspath(__file__))
+except NameError:
+    RAG_DIR = next((d for d in (os.getcwd(), os.path.join(os.getcwd(), "RAG"))
+                    if os.path.isdir(os.path.join(d, "src"))), os.getcwd())
+sys.path.insert(0, os.path.join(RAG_DIR, "src"))
+import config
+from chroma_store import EmbeddingMismatchError, load_persisted_chroma, record_embedding_signature
+from embedding_cache import CachedEmbeddings
 
 # Cell 3: Set Environment Variables (Replace with your actual values)
 os.environ["AZURE_OPENAI_API_KEY"] = "your-actual-api-key-here"
@@ -47,12 +61,12 @@ class RAGBot:
             
             try:
                 from langchain_openai import AzureOpenAIEmbeddings, AzureChatOpenAI
-                self.embeddings = AzureOpenAIEmbeddings(
+                self.embeddings = CachedEmbeddings(AzureOpenAIEmbeddings(
                     azure_deployment=azure_config["embedding_deployment"],
                     api_version=azure_config["api_version"],
                     azure_endpoint=azure_config["endpoint"],
                     api_key=azure_config["api_key"]
-                )
+                ), model_name=azure_config["embedding_deployment"])
                 print("✅ Azure OpenAI initialized successfully!")
                 return True
             except Exception as e:
@@ -105,14 +119,29 @@ class RAGBot:
             self.vectorstore = Chroma.from_documents(
                 documents=chunks,
                 embedding=self.embeddings,
-                persist_directory="./chroma_db"
+                collection_name=config.COLLECTION_NAME,
+                persist_directory=config.PERSIST_DIRECTORY
             )
+            record_embedding_signature(self.vectorstore, self.embeddings)
             print("✅ Vector store created successfully!")
             return True
         except Exception as e:
             print(f"❌ Error creating vector store: {str(e)}")
             return False
     
+    def reopen_vectorstore(self):
+        """Open the persisted collection instead of re-embedding the documents"""
+        try:
+            vectorstore = load_persisted_chroma(self.embeddings)
+        except EmbeddingMismatchError as e:
+            print(f"⚠️ {e}")
+            return False
+        if vectorstore is None:
+            return False
+        self.vectorstore = vectorstore
+        print(f"📂 Reopened persisted vector store with {vectorstore._collection.count()} chunks")
+        return True
+
     def create_qa_chain(self):
         """Create the QA chain for answering questions"""
         if not self.vectorstore:
@@ -168,20 +197,23 @@ if bot.initialize_openai():
 else:
     print("❌ Failed to initialize. Check your environment variables.")
 
-# Cell 6: Load Documents (Choose one option)
-
-# Option A: Load from directory
-documents = bot.load_pdfs_from_directory("./pdfs")  # Make sure you have PDFs in this folder
+# Cell 6: Load Documents (skipped when ./chroma_db already holds them)
+if bot.reopen_vectorstore():
+    if bot.create_qa_chain():
+        print("🎉 RAG Bot is ready! You can now ask questions.")
+else:
+    # Option A: Load from directory
+    documents = bot.load_pdfs_from_directory("./pdfs")  # Make sure you have PDFs in this folder
 
-# Option B: Load specific file (uncomment if you want to use this)
-# from langchain_community.document_loaders import PyPDFLoader
-# loader = PyPDFLoader("path/to/your/file.pdf")
-# documents = loader.load()
+    # Option B: Load specific file (uncomment if you want to use this)
+    # from langchain_community.document_loaders import PyPDFLoader
+    # loader = PyPDFLoader("path/to/your/file.pdf")
+    # documents = loader.load()
 
-if documents:
-    if bot.process_documents(documents):
-        if bot.create_qa_chain():
-            print("🎉 RAG Bot is ready! You can now ask questions.")
+    if documents:
+        if bot.process_documents(documents):
+            if bot.create_qa_chain():
+                print("🎉 RAG Bot is ready! You can now ask questions.")
 
 # Cell 7: Ask Questions
 def ask_question(question):
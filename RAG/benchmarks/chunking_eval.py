@@ -0,0 +1,229 @@
+"""
+Retrieval quality / cost sweep over chunk size, chunk overlap and k.
+
+Every question in the eval set names a passage the answer is in; a
+retrieved chunk is a hit if it contains that passage (case and whitespace
+insensitive). For each sweep point the corpus is re-split and re-indexed
+and every question goes through the configured retriever and QA chain, with
+the deterministic fake embedder and canned LLM from ``fake_models``. Sweep
+points run in parallel worker processes.
+
+Reported per (chunk size, overlap, k): recall@k, MRR, chunk count, index
+size on disk, mean prompt tokens sent to the LLM and p50/p99 query latency.
+
+    python benchmarks/chunking_eval.py --chunk-sizes 128 256 512 --overlaps 0 50 --k 2 4 8
+
+Sizes and overlaps are in tokens for the token splitter (the default) and
+in characters with ``--splitter characters``.
+
+The default corpus is ``sample_document.md``, the PDFs in ``pdfs/`` and a
+generated distractor corpus (``corpus.py``) whose site reports add
+questions of their own. ``--questions`` takes a JSON list of
+``{"question": ..., "expected": ...}``.
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import re
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.join(BENCHMARK_DIR, "..")
+sys.path.insert(0, os.path.join(REPO_DIR, "src"))
+
+import config  # noqa: E402
+from corpus import generate_corpus, site_findings  # noqa: E402
+
+DEFAULT_QUESTIONS = os.path.join(BENCHMARK_DIR, "eval_questions.json")
+DEFAULT_DOCUMENTS = [os.path.join(REPO_DIR, "sample_document.md"),
+                     os.path.join(REPO_DIR, "pdfs")]
+ADD_BATCH = 1000
+
+
+def normalize(text):
+    return re.sub(r"\s+", " ", text).strip().lower()
+
+
+def load_documents(paths):
+    """Text/markdown files as one document each, PDFs (or directories of them) per page"""
+    from langchain_core.documents import Document
+    from parallel_loader import ParallelPDFLoader, find_pdfs
+
+    documents, pdfs = [], []
+    for path in paths:
+        if os.path.isdir(path):
+            pdfs += find_pdfs(path)
+        elif path.lower().endswith(".pdf"):
+            pdfs.append(path)
+        else:
+            with open(path, encoding="utf-8") as f:
+                documents.append(Document(page_content=f.read(), metadata={"source": path}))
+    return documents + ParallelPDFLoader(paths=pdfs).load()
+
+
+def site_questions(n_reports, n_questions):
+    """Questions about generated site reports, spread evenly over the corpus"""
+    questions = []
+    for number in np.linspace(1, n_reports, num=min(n_questions, n_reports), dtype=int):
+        site, area, findings = site_findings(int(number))
+        outcome, change, months = findings[0]
+        questions.append({
+            "question": f"In site report {number}, how did AI support in {area} "
+                        f"at the {site} site change {outcome}?",
+            "expected": f"changed {outcome} by {change:.1f}% over {months} months",
+        })
+    return questions
+
+
+def _directory_bytes(directory):
+    return sum(
+        os.path.getsize(os.path.join(root, name))
+        for root, _, names in os.walk(directory) for name in names
+    )
+
+
+def _prompt_tokens(qa_chain, question, documents):
+    from langchain_core.prompts import format_document
+    from token_utils import count_tokens
+
+    chain = qa_chain.combine_documents_chain
+    context = chain.document_separator.join(
+        format_document(doc, chain.document_prompt) for doc in documents
+    )
+    return count_tokens(chain.llm_chain.prompt.format(context=context, question=question))
+
+
+def evaluate_point(splitter, chunk_size, chunk_overlap, ks, documents, questions, backend, dim):
+    """Split and index ``documents`` once, then score every k; runs in a worker process"""
+    from fake_models import CannedChatModel, HashEmbeddings
+    from rag_engine import RAGEngine
+
+    results = []
+    with tempfile.TemporaryDirectory(prefix="rag-eval-") as workdir:
+        config.TEXT_SPLITTER = splitter
+        if splitter == "tokens":
+            config.CHUNK_SIZE_TOKENS, config.CHUNK_OVERLAP_TOKENS = chunk_size, chunk_overlap
+        else:
+            config.CHUNK_SIZE, config.CHUNK_OVERLAP = chunk_size, chunk_overlap
+        config.VECTOR_BACKEND = backend
+        config.VERBOSE = False
+        config.PERSIST_DIRECTORY = os.path.join(workdir, "chroma")
+        config.NATIVE_INDEX_DIRECTORY = os.path.join(workdir, "native")
+        engine = RAGEngine(HashEmbeddings(size=dim), CannedChatModel())
+        engine.answer_cache = None
+
+        chunks = engine.text_splitter().split_documents(documents)
+        ids = [f"chunk-{i}" for i in range(len(chunks))]
+        vectorstore = engine.open_vectorstore()
+        for i in range(0, len(chunks), ADD_BATCH):
+            vectorstore.add_documents(chunks[i:i + ADD_BATCH], ids=ids[i:i + ADD_BATCH])
+        engine.get_lexical_index().add_documents(chunks, ids)
+        engine.save_lexical_index()
+        engine.vectorstore = vectorstore
+        index_bytes = _directory_bytes(workdir)
+
+        for k in ks:
+            config.RETRIEVAL_K = config.RERANK_TOP_N = k
+            qa_chain = engine.create_qa_chain()
+            # Keep one-off lazy initialization out of the latency numbers
+            engine.ask_question(questions[0]["question"])
+            hits, reciprocal_ranks, tokens, latencies = 0, [], [], []
+            for item in questions:
+                start = time.perf_counter()
+                _, sources = engine.ask_question(item["question"])
+                latencies.append((time.perf_counter() - start) * 1000)
+                sources = sources[:k]
+                expected = normalize(item["expected"])
+                rank = next((i + 1 for i, doc in enumerate(sources)
+                             if expected in normalize(doc.page_content)), None)
+                hits += rank is not None
+                reciprocal_ranks.append(1 / rank if rank else 0.0)
+                tokens.append(_prompt_tokens(qa_chain, item["question"], sources))
+            results.append({
+                "chunk_size": chunk_size,
+                "chunk_overlap": chunk_overlap,
+                "k": k,
+                "recall": hits / len(questions),
+                "mrr": float(np.mean(reciprocal_ranks)),
+                "chunks": len(chunks),
+                "index_mb": index_bytes / 2**20,
+                "prompt_tokens": float(np.mean(tokens)),
+                "p50_ms": float(np.percentile(latencies, 50)),
+                "p99_ms": float(np.percentile(latencies, 99)),
+            })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--splitter", choices=["tokens", "characters"],
+                        default=config.TEXT_SPLITTER)
+    parser.add_argument("--chunk-sizes", type=int, nargs="+", default=None,
+                        help="default: 64 128 256 512 tokens / 250 500 1000 2000 characters")
+    parser.add_argument("--overlaps", type=int, nargs="+", default=None,
+                        help="default: 0 25 50 tokens / 0 100 200 characters")
+    parser.add_argument("--k", type=int, nargs="+", default=[2, 4, 8])
+    parser.add_argument("--questions", default=DEFAULT_QUESTIONS)
+    parser.add_argument("--documents", nargs="+", default=DEFAULT_DOCUMENTS,
+                        help="text/markdown files, PDFs or directories of PDFs")
+    parser.add_argument("--distractor-pages", type=int, default=100,
+                        help="pages of generated site reports mixed into the corpus (0 = none)")
+    parser.add_argument("--site-questions", type=int, default=30,
+                        help="questions generated from the distractor reports")
+    parser.add_argument("--backend", choices=["chroma", "native"], default="native")
+    parser.add_argument("--dim", type=int, default=1536, help="fake embedding size")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--output", default=None, help="write the results as JSON")
+    args = parser.parse_args()
+
+    with open(args.questions, encoding="utf-8") as f:
+        questions = json.load(f)
+    documents = load_documents(args.documents)
+    if args.distractor_pages:
+        corpus = generate_corpus(args.distractor_pages)
+        documents += load_documents(
+            [os.path.join(corpus["directory"], name) for name in corpus["files"]]
+        )
+        questions += site_questions(corpus.get("reports", 0), args.site_questions)
+    print(f"{len(documents)} documents, {len(questions)} questions")
+
+    tokens = args.splitter == "tokens"
+    args.chunk_sizes = args.chunk_sizes or ([64, 128, 256, 512] if tokens else [250, 500, 1000, 2000])
+    args.overlaps = args.overlaps or ([0, 25, 50] if tokens else [0, 100, 200])
+    points = [(size, overlap) for size in args.chunk_sizes for overlap in args.overlaps
+              if overlap < size]
+    results = []
+    with ProcessPoolExecutor(max_workers=args.workers,
+                             mp_context=multiprocessing.get_context("spawn")) as executor:
+        futures = [
+            executor.submit(evaluate_point, args.splitter, size, overlap, args.k, documents,
+                            questions, args.backend, args.dim)
+            for size, overlap in points
+        ]
+        for future in as_completed(futures):
+            results += future.result()
+    results.sort(key=lambda r: (r["chunk_size"], r["chunk_overlap"], r["k"]))
+
+    print(f"{'size':>6}{'overlap':>8}{'k':>4}{'recall@k':>10}{'MRR':>7}{'chunks':>8}"
+          f"{'index MB':>10}{'prompt tok':>12}{'p50 ms':>8}{'p99 ms':>8}")
+    for r in results:
+        print(f"{r['chunk_size']:>6}{r['chunk_overlap']:>8}{r['k']:>4}{r['recall']:>10.3f}"
+              f"{r['mrr']:>7.3f}{r['chunks']:>8}{r['index_mb']:>10.2f}"
+              f"{r['prompt_tokens']:>12.0f}{r['p50_ms']:>8.1f}{r['p99_ms']:>8.1f}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"questions": len(questions), "documents": len(documents),
+                       "results": results}, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Synthetic PDF corpora for the offline benchmarks.
+
+Each corpus is the sample research paper from ``create_sample_pdf.py``
+repeated as numbered "site reports" until the requested page count is
+reached, split into files of ``pages_per_file`` pages. Every report gets a
+deterministic paragraph of its own, so chunks are not exact duplicates of
+each other (which would make embedding caches and BM25 unrealistically
+kind). Corpora are cached on disk and reused if already generated.
+
+    python benchmarks/corpus.py --pages 10 1000 10000
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.platypus import PageBreak, Paragraph, SimpleDocTemplate
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from create_sample_pdf import sample_story  # noqa: E402
+
+DEFAULT_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "corpora")
+MANIFEST = "corpus.json"
+
+SITES = ["Boston", "Lagos", "Mumbai", "Sao Paulo", "Osaka", "Berlin", "Nairobi", "Toronto",
+         "Melbourne", "Lima", "Seoul", "Madrid"]
+AREAS = ["radiology", "oncology", "cardiology", "pathology", "pharmacy", "emergency care",
+         "genomics", "intensive care", "dermatology", "neurology"]
+OUTCOMES = ["diagnostic accuracy", "time to treatment", "readmission rate", "staff workload",
+            "false positive rate", "cost per patient", "length of stay", "adverse events"]
+
+
+def site_findings(number):
+    """``(site, area, [(outcome, change_percent, months), ...])`` of report ``number``"""
+    rng = random.Random(number)
+    site, area = rng.choice(SITES), rng.choice(AREAS)
+    return site, area, [
+        (outcome, round(rng.uniform(-40, 40), 1), rng.randint(3, 36))
+        for outcome in rng.sample(OUTCOMES, 3)
+    ]
+
+
+def finding_sentence(site, area, outcome, change, months):
+    return (f"At the {site} site, AI support in {area} changed {outcome} by "
+            f"{change:.1f}% over {months} months.")
+
+
+def site_report(number, styles):
+    """A short paragraph that makes report ``number`` distinguishable from the rest"""
+    site, area, findings = site_findings(number)
+    text = " ".join(finding_sentence(site, area, *finding) for finding in findings)
+    return [
+        Paragraph(f"Site report {number}: {area.title()} in {site}", styles["Heading2"]),
+        Paragraph(text, styles["Normal"]),
+    ]
+
+
+def _write_pdf(path, first_report, n_reports, styles):
+    story = []
+    for number in range(first_report, first_report + n_reports):
+        story += site_report(number, styles) + sample_story() + [PageBreak()]
+    doc = SimpleDocTemplate(path, pagesize=letter)
+    doc.build(story)
+    return doc.page
+
+
+def generate_corpus(pages, directory=None, pages_per_file=100):
+    """Generate (or reuse) a corpus of about ``pages`` pages; returns its manifest.
+
+    The manifest holds ``directory``, ``files``, the number of ``reports``
+    and the actual ``pages`` written, which may overshoot ``pages`` by at
+    most one report.
+    """
+    directory = os.path.join(directory or DEFAULT_DIRECTORY, f"pages-{pages}")
+    manifest_path = os.path.join(directory, MANIFEST)
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            return json.load(f)
+
+    os.makedirs(directory, exist_ok=True)
+    styles = getSampleStyleSheet()
+    # Measure how many pages one report takes, then fill each file with reports
+    probe = os.path.join(directory, "probe.pdf")
+    pages_per_report = _write_pdf(probe, 0, 1, styles)
+    os.remove(probe)
+    reports_per_file = max(1, pages_per_file // pages_per_report)
+
+    files, written, report = [], 0, 1
+    while written < pages:
+        remaining = -(-(pages - written) // pages_per_report)
+        n_reports = min(reports_per_file, remaining)
+        path = os.path.join(directory, f"reports-{len(files):05d}.pdf")
+        written += _write_pdf(path, report, n_reports, styles)
+        report += n_reports
+        files.append(os.path.basename(path))
+
+    manifest = {"directory": directory, "files": files, "pages": written, "reports": report - 1}
+    with open(manifest_path, "w") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--pages", type=int, nargs="+", default=[10, 1000, 10_000])
+    parser.add_argument("--directory", default=DEFAULT_DIRECTORY)
+    parser.add_argument("--pages-per-file", type=int, default=100)
+    args = parser.parse_args()
+    for pages in args.pages:
+        manifest = generate_corpus(pages, args.directory, args.pages_per_file)
+        print(f"{manifest['pages']:>6} pages in {len(manifest['files']):>4} files: "
+              f"{manifest['directory']}")
+
+
+if __name__ == "__main__":
+    main()
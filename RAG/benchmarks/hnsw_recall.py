@@ -0,0 +1,90 @@
+"""
+Recall / latency benchmark for the HNSW native index against exact search.
+
+Rows are added in batches, the way ``process_documents`` grows the index, so
+the benchmark also measures incremental build and reload time.
+
+    python benchmarks/hnsw_recall.py --vectors 200000 --dim 384 --ef 16 32 64 128
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+import config  # noqa: E402
+from native_index import FlatIVFIndex  # noqa: E402
+from quantization_recall import clustered_vectors, recall  # noqa: E402
+
+
+def run(index, queries, k, ef=None):
+    results, latencies = [], []
+    for query in queries:
+        start = time.perf_counter()
+        hits = index.search(query, k=k, ef=ef)
+        latencies.append((time.perf_counter() - start) * 1000)
+        results.append([row for row, _ in hits])
+    return results, np.percentile(latencies, 50), np.percentile(latencies, 99)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--vectors", type=int, default=100_000)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--batch", type=int, default=10_000, help="rows per add() call")
+    parser.add_argument("--m", type=int, default=config.HNSW_M)
+    parser.add_argument("--ef-construction", type=int, default=config.HNSW_EF_CONSTRUCTION)
+    parser.add_argument("--ef", type=int, nargs="+", default=[16, 32, 64, 128, 256])
+    args = parser.parse_args()
+
+    # Queries are held-out points from the same clusters as the corpus
+    vectors = clustered_vectors(args.vectors + args.queries, args.dim)
+    vectors, queries = vectors[:args.vectors], vectors[args.vectors:]
+    config.NATIVE_ANN_INDEX = "hnsw"
+    config.NATIVE_QUANTIZATION = None
+    config.HNSW_M = args.m
+    config.HNSW_EF_CONSTRUCTION = args.ef_construction
+
+    with tempfile.TemporaryDirectory() as directory:
+        index = FlatIVFIndex(directory)
+        ids = [str(i) for i in range(args.vectors)]
+        start = time.perf_counter()
+        for offset in range(0, args.vectors, args.batch):
+            batch = slice(offset, offset + args.batch)
+            index.add(ids[batch], vectors[batch], [""] * len(ids[batch]), [{}] * len(ids[batch]))
+        index.save_hnsw()
+        build_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        index = FlatIVFIndex(directory)
+        reload_ms = (time.perf_counter() - start) * 1000
+        print(f"{args.vectors} x {args.dim}, M={args.m}, ef_construction={args.ef_construction}: "
+              f"built in {build_seconds:.1f}s ({args.vectors / build_seconds:.0f} vectors/s), "
+              f"reloaded in {reload_ms:.0f} ms")
+
+        # Exact ground truth: one brute-force scan over the memory-mapped rows
+        truth, latencies = [], []
+        for query in queries:
+            t = time.perf_counter()
+            scores = index.vectors @ query
+            top = np.argpartition(-scores, args.k)[:args.k]
+            truth.append(list(top[np.argsort(-scores[top])]))
+            latencies.append((time.perf_counter() - t) * 1000)
+        print(f"{'mode':<12}{'recall@' + str(args.k):>11}{'p50 ms':>9}{'p99 ms':>9}")
+        print(f"{'exact':<12}{1.0:>11.4f}{np.percentile(latencies, 50):>9.3f}"
+              f"{np.percentile(latencies, 99):>9.3f}")
+        for ef in args.ef:
+            results, p50, p99 = run(index, queries, args.k, ef=ef)
+            print(f"{'hnsw ef=' + str(ef):<12}{recall(results, truth, args.k):>11.4f}"
+                  f"{p50:>9.3f}{p99:>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,239 @@
+"""
+Offline end-to-end benchmark of the RAG pipeline.
+
+Runs parse -> split -> index -> retrieve -> answer over synthetic corpora
+(see ``corpus.py``) with the deterministic ``HashEmbeddings`` and
+``CannedChatModel`` from ``fake_models``, so no API key or network is
+needed and numbers are comparable across machines and commits. Each corpus
+size runs in a fresh process so peak RSS is per size.
+
+    python benchmarks/pipeline_benchmark.py --pages 10 1000 10000
+
+Results are written as JSON (by default to
+``benchmarks/results/pipeline-<commit>.json``); diff two runs with
+
+    python benchmarks/pipeline_benchmark.py --compare old.json new.json
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCHMARK_DIR, "..", "src"))
+
+import config  # noqa: E402
+from corpus import AREAS, OUTCOMES, SITES, generate_corpus  # noqa: E402
+
+ADD_BATCH = 1000  # Chunks per vector store add (Chroma caps a single insert at ~5k)
+
+CONFIG_KEYS = (
+    "TEXT_SPLITTER", "CHUNK_SIZE_TOKENS", "CHUNK_OVERLAP_TOKENS", "CHUNK_SIZE", "CHUNK_OVERLAP",
+    "RETRIEVAL_K", "HYBRID_RETRIEVAL", "HYBRID_FETCH_K",
+    "RERANK_ENABLED", "RERANK_FETCH_K", "RERANK_SCORER", "VECTOR_BACKEND", "NATIVE_ANN_INDEX",
+    "NATIVE_QUANTIZATION", "PDF_LOADER_WORKERS", "PDF_PAGES_PER_TASK",
+)
+
+
+def _git_commit():
+    try:
+        root = os.path.join(BENCHMARK_DIR, "..")
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=root,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"],
+                               cwd=root, capture_output=True, text=True).stdout.strip()
+        return commit + ("-dirty" if dirty else "")
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def _questions(n, seed=0):
+    rng = random.Random(seed)
+    return [
+        f"How did AI support in {rng.choice(AREAS)} change {rng.choice(OUTCOMES)} "
+        f"at the {rng.choice(SITES)} site?"
+        for _ in range(n)
+    ]
+
+
+def _latency_ms(fn, inputs):
+    latencies = []
+    for item in inputs:
+        start = time.perf_counter()
+        fn(item)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return {"p50_ms": float(np.percentile(latencies, 50)),
+            "p99_ms": float(np.percentile(latencies, 99)),
+            "queries": len(latencies)}
+
+
+def _peak_rss_mb(who):
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(who).ru_maxrss / 1024
+
+
+def _split(splitter, documents):
+    from token_utils import count_tokens
+
+    start = time.perf_counter()
+    chunks = splitter.split_documents(documents)
+    elapsed = time.perf_counter() - start
+    return {"seconds": elapsed, "chunks": len(chunks), "chunks_per_second": len(chunks) / elapsed,
+            "pages_per_second": len(documents) / elapsed,
+            "max_tokens": max((count_tokens(chunk.page_content) for chunk in chunks), default=0)}
+
+
+def run_size(pages, corpus_directory, backend, dim, n_queries):
+    """Benchmark one corpus size; meant to run in its own process"""
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+    from fake_models import CannedChatModel, HashEmbeddings
+    from parallel_loader import ParallelPDFLoader
+    from rag_engine import RAGEngine
+    from token_splitter import TokenSplitter
+
+    corpus = generate_corpus(pages, corpus_directory)
+    paths = [os.path.join(corpus["directory"], name) for name in corpus["files"]]
+    result = {"pages_requested": pages, "pages": corpus["pages"], "files": len(paths)}
+
+    with tempfile.TemporaryDirectory(prefix="rag-bench-") as workdir:
+        config.VECTOR_BACKEND = backend
+        config.VERBOSE = False
+        config.PERSIST_DIRECTORY = os.path.join(workdir, "chroma")
+        config.NATIVE_INDEX_DIRECTORY = os.path.join(workdir, "native")
+        engine = RAGEngine(HashEmbeddings(size=dim), CannedChatModel())
+        # Every question is distinct, but keep paraphrase hits out of the latency numbers
+        engine.answer_cache = None
+
+        start = time.perf_counter()
+        documents = ParallelPDFLoader(paths=paths).load()
+        elapsed = time.perf_counter() - start
+        result["parse"] = {"seconds": elapsed, "pages_per_second": len(documents) / elapsed}
+
+        start = time.perf_counter()
+        chunks = engine.text_splitter().split_documents(documents)
+        elapsed = time.perf_counter() - start
+        result["split"] = {"seconds": elapsed, "chunks": len(chunks),
+                           "chunks_per_second": len(chunks) / elapsed}
+        # Both splitters on the same pages, whichever config.TEXT_SPLITTER selects
+        result["split_tokens"] = _split(TokenSplitter(), documents)
+        result["split_characters"] = _split(RecursiveCharacterTextSplitter(
+            chunk_size=config.CHUNK_SIZE, chunk_overlap=config.CHUNK_OVERLAP,
+            add_start_index=True), documents)
+
+        start = time.perf_counter()
+        vectorstore = engine.open_vectorstore()
+        ids = [f"chunk-{i}" for i in range(len(chunks))]
+        for i in range(0, len(chunks), ADD_BATCH):
+            vectorstore.add_documents(chunks[i:i + ADD_BATCH], ids=ids[i:i + ADD_BATCH])
+        engine.get_lexical_index().add_documents(chunks, ids)
+        engine.save_lexical_index()
+        elapsed = time.perf_counter() - start
+        result["index"] = {"seconds": elapsed, "vectors": len(chunks),
+                           "vectors_per_second": len(chunks) / elapsed}
+
+        engine.vectorstore = vectorstore
+        engine.create_qa_chain()
+        questions = _questions(n_queries)
+        result["vector_search"] = _latency_ms(
+            lambda q: vectorstore.similarity_search(q, k=config.RETRIEVAL_K), questions)
+        retriever = engine.build_retriever()
+        result["retrieval"] = _latency_ms(retriever.invoke, questions)
+        result["query"] = _latency_ms(engine.ask_question, questions)
+
+    result["peak_rss_mb"] = _peak_rss_mb(resource.RUSAGE_SELF)
+    result["peak_rss_workers_mb"] = _peak_rss_mb(resource.RUSAGE_CHILDREN)
+    return result
+
+
+def compare(old_path, new_path):
+    """Print the relative change of every metric between two result files"""
+    with open(old_path) as f:
+        old = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+    print(f"{old['commit']} -> {new['commit']}")
+    old_runs = {run["pages_requested"]: run for run in old["runs"]}
+    for run in new["runs"]:
+        before = old_runs.get(run["pages_requested"])
+        if before is None:
+            continue
+        print(f"\n{run['pages_requested']} pages")
+        for stage, metrics in run.items():
+            if not isinstance(metrics, dict):
+                continue
+            for name, value in metrics.items():
+                previous = before.get(stage, {}).get(name)
+                if not previous or name in ("seconds", "chunks", "vectors", "queries", "max_tokens"):
+                    continue
+                print(f"  {stage + '.' + name:<34}{previous:>12.2f}{value:>12.2f}"
+                      f"{(value - previous) / previous:>+9.1%}")
+        for name in ("peak_rss_mb", "peak_rss_workers_mb"):
+            print(f"  {name:<34}{before[name]:>12.1f}{run[name]:>12.1f}"
+                  f"{(run[name] - before[name]) / (before[name] or 1):>+9.1%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--pages", type=int, nargs="+", default=[10, 1000, 10_000])
+    parser.add_argument("--backend", choices=["chroma", "native"], default=config.VECTOR_BACKEND)
+    parser.add_argument("--dim", type=int, default=1536, help="fake embedding size")
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--corpus-directory", default=None,
+                        help="where generated corpora are cached (default: benchmarks/corpora)")
+    parser.add_argument("--output", default=None)
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"),
+                        help="diff two result files instead of running")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    commit = _git_commit()
+    report = {
+        "commit": commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "cpus": os.cpu_count(),
+        "embedding_dim": args.dim,
+        "config": {key: getattr(config, key) for key in CONFIG_KEYS},
+        "runs": [],
+    }
+    report["config"]["VECTOR_BACKEND"] = args.backend
+    spawn = multiprocessing.get_context("spawn")
+    for pages in args.pages:
+        with ProcessPoolExecutor(max_workers=1, mp_context=spawn) as executor:
+            run = executor.submit(run_size, pages, args.corpus_directory, args.backend,
+                                  args.dim, args.queries).result()
+        report["runs"].append(run)
+        print(f"{run['pages']:>6} pages | "
+              f"parse {run['parse']['pages_per_second']:8.1f} pages/s | "
+              f"split {run['split']['chunks_per_second']:9.1f} chunks/s "
+              f"(tokens {run['split_tokens']['pages_per_second']:.0f} vs characters "
+              f"{run['split_characters']['pages_per_second']:.0f} pages/s) | "
+              f"index {run['index']['vectors_per_second']:8.1f} vectors/s | "
+              f"retrieval p50 {run['retrieval']['p50_ms']:6.1f} ms "
+              f"p99 {run['retrieval']['p99_ms']:6.1f} ms | "
+              f"peak RSS {run['peak_rss_mb']:.0f} MB")
+
+    output = args.output or os.path.join(BENCHMARK_DIR, "results", f"pipeline-{commit}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
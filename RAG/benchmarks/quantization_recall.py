@@ -0,0 +1,93 @@
+"""
+Recall / memory / latency benchmark for quantized native-index search.
+
+Builds a native index over synthetic clustered unit vectors and compares
+exact brute-force search with int8 and PQ first-pass search plus exact
+re-scoring. No API key needed.
+
+    python benchmarks/quantization_recall.py --vectors 50000 --dim 256
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+import config  # noqa: E402
+from native_index import FlatIVFIndex  # noqa: E402
+
+
+def clustered_vectors(n, dim, n_clusters=200, noise=0.35, seed=0):
+    """Unit vectors scattered around random cluster centres, like real embeddings"""
+    rng = np.random.default_rng(seed)
+    centres = rng.standard_normal((n_clusters, dim)).astype(np.float32)
+    labels = rng.integers(n_clusters, size=n)
+    vectors = centres[labels] + noise * rng.standard_normal((n, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def run(index, queries, k):
+    results, latencies = [], []
+    for query in queries:
+        start = time.perf_counter()
+        hits = index.search(query, k=k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        results.append([row for row, _ in hits])
+    return results, np.percentile(latencies, 50), np.percentile(latencies, 99)
+
+
+def recall(results, truth, k):
+    return float(np.mean([len(set(r[:k]) & set(t[:k])) / k for r, t in zip(results, truth)]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--vectors", type=int, default=50_000)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--candidates", type=int, default=config.NATIVE_RESCORE_CANDIDATES,
+                        help="rows re-scored exactly after the quantized pass")
+    parser.add_argument("--pq-subspaces", type=int, default=None)
+    args = parser.parse_args()
+
+    # Queries are held-out points from the same clusters as the corpus
+    vectors = clustered_vectors(args.vectors + args.queries, args.dim)
+    vectors, queries = vectors[:args.vectors], vectors[args.vectors:]
+    # Brute force only: keep IVF out of the comparison
+    config.NATIVE_IVF_MIN_VECTORS = args.vectors + 1
+    config.NATIVE_RESCORE_CANDIDATES = args.candidates
+
+    with tempfile.TemporaryDirectory() as directory:
+        index = FlatIVFIndex(directory)
+        ids = [str(i) for i in range(args.vectors)]
+        for start in range(0, args.vectors, 10_000):
+            stop = start + 10_000
+            index.add(ids[start:stop], vectors[start:stop], [""] * len(ids[start:stop]),
+                      [{}] * len(ids[start:stop]))
+
+        config.NATIVE_QUANTIZATION = None
+        truth, p50, p99 = run(index, queries, args.k)
+        float_bytes = 4 * args.dim
+        print(f"{'mode':<8}{'recall@' + str(args.k):>11}{'bytes/vec':>11}{'ratio':>8}"
+              f"{'p50 ms':>9}{'p99 ms':>9}{'fit s':>8}")
+        print(f"{'float32':<8}{1.0:>11.4f}{float_bytes:>11}{1.0:>7.1f}x{p50:>9.2f}{p99:>9.2f}{'-':>8}")
+
+        for kind in ("int8", "pq"):
+            config.NATIVE_QUANTIZATION = kind
+            start = time.perf_counter()
+            index.quantize(kind, n_subspaces=args.pq_subspaces)
+            fit_seconds = time.perf_counter() - start
+            results, p50, p99 = run(index, queries, args.k)
+            code_bytes = index.codes.shape[1]
+            print(f"{kind:<8}{recall(results, truth, args.k):>11.4f}{code_bytes:>11}"
+                  f"{float_bytes / code_bytes:>7.1f}x{p50:>9.2f}{p99:>9.2f}{fit_seconds:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -8,16 +8,8 @@ from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch
 import os
 
-def create_sample_pdf():
-    """Create a sample PDF document for testing"""
-    
-    # Ensure pdfs directory exists
-    if not os.path.exists('pdfs'):
-        os.makedirs('pdfs')
-    
-    # Create PDF file
-    pdf_path = 'pdfs/sample_ai_healthcare_research.pdf'
-    doc = SimpleDocTemplate(pdf_path, pagesize=letter)
+def sample_story():
+    """Flowables of the sample research paper (also used by the benchmark corpus)"""
     
     # Get styles
     styles = getSampleStyleSheet()
@@ -150,8 +142,19 @@ def create_sample_pdf():
     """
     story.append(Paragraph(conclusion_text, styles['Normal']))
     
+    return story
+
+def create_sample_pdf(pdf_path='pdfs/sample_ai_healthcare_research.pdf'):
+    """Create a sample PDF document for testing"""
+    
+    # Ensure pdfs directory exists
+    directory = os.path.dirname(pdf_path)
+    if directory and not os.path.exists(directory):
+        os.makedirs(directory)
+    
     # Build PDF
-    doc.build(story)
+    doc = SimpleDocTemplate(pdf_path, pagesize=letter)
+    doc.build(sample_story())
     
     return pdf_path
 
@@ -0,0 +1,164 @@
+"""
+Semantic answer cache in front of the QA chain.
+
+Questions are matched exactly (after normalization) and, failing that, by
+cosine similarity of their embeddings against earlier questions that name
+the same numbers and proper nouns ("revenue in 2023" must not answer "revenue
+in 2024", however close the embeddings). Entries are scoped to a vector-store
+version and metadata filter; when the index version changes, answers from
+older versions are dropped. Bounded by TTL and LRU size.
+"""
+
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+import numpy as np
+
+import config
+from embedding_cache import normalize_text
+
+
+_NUMBER = re.compile(r"\d+(?:[.,]\d+)*")
+_WORD = re.compile(r"[^\W\d_][\w'&-]*|[.?!]")
+
+
+def normalize_question(question):
+    """Key under which equivalent phrasings of a question match exactly"""
+    return normalize_text(question).lower().rstrip("?!. ")
+
+
+def key_terms(question):
+    """Numbers and names (capitalized past a sentence start, or acronyms) in ``question``"""
+    terms = set(_NUMBER.findall(question))
+    sentence_start = True
+    for word in _WORD.findall(question):
+        if word in ".?!":
+            sentence_start = True
+            continue
+        if len(word) > 1 and (word.isupper() or word[0].isupper() and not sentence_start):
+            terms.add(word.lower())
+        sentence_start = False
+    return frozenset(terms)
+
+
+@dataclass
+class CachedAnswer:
+    question: str
+    answer: str
+    sources: list
+    embedding: object  # unit-norm numpy vector, or None
+    terms: frozenset  # key_terms of the question
+    created: float
+
+
+class SemanticAnswerCache:
+    """Exact + embedding-similarity cache of (answer, source_documents)"""
+
+    def __init__(self, embeddings=None, similarity_threshold=None, ttl_seconds=None,
+                 max_entries=None, clock=time.monotonic):
+        self.embeddings = embeddings
+        self.similarity_threshold = similarity_threshold or config.ANSWER_CACHE_SIMILARITY
+        self.ttl_seconds = ttl_seconds or config.ANSWER_CACHE_TTL_SECONDS
+        self.max_entries = max_entries or config.ANSWER_CACHE_MAX_ENTRIES
+        self._clock = clock
+        # (index_version, filters, normalized question) -> CachedAnswer
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+
+    def _embed(self, question):
+        if self.embeddings is None:
+            return None
+        vector = np.asarray(self.embeddings.embed_query(question), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _expire(self, now):
+        expired = [k for k, e in self._entries.items() if now - e.created > self.ttl_seconds]
+        for key in expired:
+            del self._entries[key]
+
+    def get(self, question, index_version, filters=None):
+        """Return ``(answer, sources)`` for a matching question, or None.
+
+        ``filters`` (hashable, e.g. a ``MetadataFilter``) must equal the one
+        the answer was cached with.
+        """
+        key = (index_version, filters, normalize_question(question))
+        with self._lock:
+            self._expire(self._clock())
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.exact_hits += 1
+                return entry.answer, entry.sources
+            terms = key_terms(question)
+            candidates = [
+                (k, e) for k, e in self._entries.items()
+                if k[:2] == key[:2] and e.embedding is not None and e.terms == terms
+            ]
+
+        if candidates:
+            query = self._embed(question)
+            if query is not None:
+                matrix = np.stack([e.embedding for _, e in candidates])
+                scores = matrix @ query
+                best = int(np.argmax(scores))
+                if scores[best] >= self.similarity_threshold:
+                    best_key, entry = candidates[best]
+                    with self._lock:
+                        if best_key in self._entries:
+                            self._entries.move_to_end(best_key)
+                        self.semantic_hits += 1
+                    return entry.answer, entry.sources
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, question, index_version, answer, sources, filters=None):
+        entry = CachedAnswer(
+            question=question,
+            answer=answer,
+            sources=list(sources),
+            embedding=self._embed(question),
+            terms=key_terms(question),
+            created=self._clock(),
+        )
+        key = (index_version, filters, normalize_question(question))
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, index_version=None):
+        """Drop all entries, or only those of one index version"""
+        with self._lock:
+            if index_version is None:
+                self._entries.clear()
+                return
+            for key in [k for k in self._entries if k[0] == index_version]:
+                del self._entries[key]
+
+    def retain(self, index_version):
+        """Drop the entries of every index version but ``index_version``"""
+        with self._lock:
+            for key in [k for k in self._entries if k[0] != index_version]:
+                del self._entries[key]
+
+    def stats(self):
+        hits = self.exact_hits + self.semantic_hits
+        total = hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "exact_hits": self.exact_hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "hit_rate": hits / total if total else 0.0,
+        }
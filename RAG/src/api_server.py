@@ -0,0 +1,411 @@
+"""
+Headless HTTP API for the RAG bot.
+
+Each tenant has its own ``RAGEngine`` (and collection), shared by all of that
+tenant's clients; the tenant comes from the ``X-Tenant`` header or a
+``?tenant=`` parameter (default ``config.DEFAULT_TENANT``). Engines are only
+kept for tenants that have an index, at most ``config.API_MAX_TENANT_ENGINES``
+of them, least recently used first out; questions for tenants missing from a
+periodically refreshed listing of indexes are answered without building one.
+Idle tenants' indexes are unloaded by the resident-index manager and reloaded
+on their next query; tenants unused for ``config.TENANT_IDLE_DAYS`` are
+deleted. Request handlers are async; blocking work (retrieval, reranking, LLM
+calls, ingest) runs on a bounded thread pool, each streamed answer is pulled
+by a thread of its own, and requests beyond the admission limits get ``429
+Too Many Requests`` with a ``Retry-After`` header instead of piling up.
+Malformed request bodies get ``400``.
+
+    python src/api_server.py                # or: uvicorn api_server:app --app-dir src
+
+Endpoints:
+
+    GET  /health          index / queue / resident-index status
+    POST /ingest          {"directory": "./pdfs"} syncs a directory under
+                          config.API_INGEST_ROOT; a raw application/pdf body
+                          (?filename=x.pdf) adds one PDF
+    POST /query           {"question": "..."} -> answer + sources; an optional
+                          "filters": {"sources": [...], "page_min": 3, "page_max": 7,
+                          "ingested_after": epoch seconds} searches only those chunks
+    POST /query/stream    same, as newline-delimited JSON events
+"""
+
+import asyncio
+import contextlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Annotated
+
+from dotenv import load_dotenv
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel, ConfigDict, StringConstraints, ValidationError
+
+import config
+from metadata_filter import MetadataFilter
+from parallel_loader import UploadPDFLoader
+from embedding_cache import document_cache
+from rag_engine import NO_DOCUMENTS, RAGEngine, embeddings_from_env, llm_from_env
+from streaming import AnswerStream
+from tenants import (
+    InvalidTenantError, indexed_tenants, resident_indexes, start_tenant_pruning, validate_tenant,
+)
+
+load_dotenv()
+
+
+class AdmissionGate:
+    """Counts in-flight requests and rejects new ones above ``limit``.
+
+    Only touched from the event loop thread, so a plain counter is enough.
+    """
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.in_flight = 0
+        self.rejected = 0
+
+    def try_acquire(self):
+        if self.in_flight >= self.limit:
+            self.rejected += 1
+            return False
+        self.in_flight += 1
+        return True
+
+    def release(self):
+        self.in_flight -= 1
+
+
+class QueryFilters(BaseModel):
+    """``MetadataFilter`` fields a query may restrict its search with"""
+    model_config = ConfigDict(extra="forbid")
+
+    sources: str | list[str] | None = None
+    page_min: int | None = None
+    page_max: int | None = None
+    ingested_after: float | None = None  # epoch seconds
+    ingested_before: float | None = None
+
+
+class QueryRequest(BaseModel):
+    question: Annotated[str, StringConstraints(strip_whitespace=True, min_length=1)]
+    filters: QueryFilters | None = None
+
+    def metadata_filter(self):
+        return MetadataFilter(**self.filters.model_dump()) if self.filters else MetadataFilter()
+
+
+class IngestRequest(BaseModel):
+    directory: Annotated[str, StringConstraints(min_length=1)]
+
+
+def _too_busy(what):
+    return JSONResponse(
+        {"detail": f"Too many {what} in progress, retry later"},
+        status_code=429,
+        headers={"Retry-After": str(config.API_RETRY_AFTER_SECONDS)},
+    )
+
+
+def _source_json(doc):
+    return {
+        "source": doc.metadata.get("source"),
+        "page": doc.metadata.get("page"),
+        "content": doc.page_content[:config.MAX_CONTENT_PREVIEW],
+    }
+
+
+def _ingest_result_json(result):
+    body = {"chunks": result.chunks, "files": result.files}
+    if result.diff is not None:
+        body.update(
+            added=len(result.diff.added), modified=len(result.diff.modified),
+            removed=len(result.diff.removed), unchanged=len(result.diff.unchanged),
+        )
+    if result.embedding_stats:
+        body["embedding"] = result.embedding_stats.summary()
+    if result.embedding_cache:
+        body["embedding_cache"] = {"hits": result.embedding_cache.hits,
+                                   "misses": result.embedding_cache.misses}
+    if result.failed:
+        body["failed"] = [{"source": path, "error": str(e)} for path, e in result.failed]
+    return body
+
+
+def _ingest_directory(directory):
+    """``directory`` resolved, if it lies inside ``config.API_INGEST_ROOT``"""
+    if not config.API_INGEST_ROOT:
+        raise HTTPException(403, "Directory ingest is disabled; send an application/pdf body")
+    root = os.path.realpath(config.API_INGEST_ROOT)
+    path = os.path.realpath(directory)
+    if os.path.commonpath([root, path]) != root:
+        raise HTTPException(403, f"Only directories under {config.API_INGEST_ROOT} can be ingested")
+    return path
+
+
+async def _invalid_request(request, exc):
+    # Malformed bodies are the client's fault, like every other bad input here
+    return JSONResponse({"detail": jsonable_encoder(exc.errors())}, status_code=400)
+
+
+def _request_tenant(request):
+    tenant = request.headers.get("x-tenant") or request.query_params.get("tenant")
+    try:
+        return validate_tenant(tenant or config.DEFAULT_TENANT)
+    except InvalidTenantError as e:
+        raise HTTPException(400, str(e))
+
+
+def create_app(engine=None, resident=None):
+    """Build the FastAPI app around ``engine`` (default: one configured from env).
+
+    ``engine`` serves its own tenant; engines for other tenants reuse its
+    embeddings and chat model clients.
+    """
+    resident = resident or resident_indexes
+    pool = ThreadPoolExecutor(max_workers=config.API_WORKERS, thread_name_prefix="rag-worker")
+    # Queries may queue a little behind the workers; ingests are serialized anyway
+    query_gate = AdmissionGate(config.API_WORKERS + config.API_MAX_QUEUED_QUERIES)
+    ingest_gate = AdmissionGate(config.API_MAX_CONCURRENT_INGESTS)
+    # One thread per answer being streamed, apart so slow streams cannot starve the workers
+    stream_pool = ThreadPoolExecutor(max_workers=query_gate.limit, thread_name_prefix="rag-stream")
+
+    @contextlib.asynccontextmanager
+    async def lifespan(app):
+        # Serve the default tenant's index straight away instead of waiting for an ingest
+        await run_blocking(open_existing_index)
+        start_tenant_pruning()
+        yield
+        pool.shutdown(wait=False, cancel_futures=True)
+        stream_pool.shutdown(wait=False, cancel_futures=True)
+
+    app = FastAPI(title="RAG Bot API", lifespan=lifespan)
+    app.add_exception_handler(RequestValidationError, _invalid_request)
+    app.state.pool = pool
+    app.state.query_gate = query_gate
+    app.state.ingest_gate = ingest_gate
+
+    engines = OrderedDict()  # tenant -> RAGEngine, least recently used first
+    engines_lock = threading.Lock()
+    clients = {}  # embeddings and chat model shared by every tenant's engine
+    if engine is not None:
+        engine.resident = engine.resident or resident
+        engines[engine.tenant] = engine
+        clients.update(embeddings=engine.embeddings, llm=engine.llm)
+
+    def prune_engines(keep):
+        """Drop least recently used engines beyond the limit; ingesting ones stay"""
+        for tenant in list(engines):
+            if len(engines) <= config.API_MAX_TENANT_ENGINES:
+                break
+            if tenant != keep and engines[tenant].unload():
+                del engines[tenant]
+
+    listing = {"tenants": set(), "at": None}  # tenants with an index on disk
+    listing_lock = threading.Lock()
+
+    def has_index(tenant):
+        """Whether ``tenant`` has an index on disk, per a listing at most
+        ``config.API_TENANT_LIST_SECONDS`` old (indexes may come from other processes)"""
+        with listing_lock:
+            now = time.monotonic()
+            if listing["at"] is None or now - listing["at"] >= config.API_TENANT_LIST_SECONDS:
+                listing.update(tenants=indexed_tenants(), at=now)
+            return tenant in listing["tenants"]
+
+    def get_engine(tenant=None, create=False):
+        """The tenant's engine, its persisted index opened on first use.
+
+        ``None`` for tenants without an index, unless ``create`` (ingests).
+        """
+        with engines_lock:
+            engine = engines.get(tenant)
+            if engine is not None:
+                engines.move_to_end(tenant)
+                return engine
+        if not create and not has_index(tenant):
+            return None
+        with engines_lock:
+            if not clients:
+                clients.update(embeddings=embeddings_from_env(), llm=llm_from_env())
+        engine = RAGEngine(clients["embeddings"], clients["llm"], tenant=tenant,
+                           resident=resident)
+        # Opened before it is published, so no request sees it half-loaded;
+        # if two requests race, the first one published wins
+        if not engine.open_existing_index() and not create:
+            return None
+        with engines_lock:
+            engine = engines.setdefault(tenant, engine)
+            engines.move_to_end(tenant)
+            prune_engines(keep=tenant)
+        return engine
+
+    app.state.engines = engines
+    app.state.resident = resident
+
+    async def run_blocking(fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(pool, fn, *args)
+
+    def open_existing_index():
+        get_engine(validate_tenant(config.DEFAULT_TENANT))
+
+    @app.get("/health")
+    async def health(request: Request):
+        engine = engines.get(_request_tenant(request))
+        # Shared by every tenant's engine
+        document_stats = document_cache(clients.get("embeddings"))
+        return {
+            "ready": bool(engine and (engine.qa_chain or engine.evicted)),
+            "index_version": engine.index_version if engine else None,
+            "queries_in_flight": query_gate.in_flight,
+            "queries_rejected": query_gate.rejected,
+            "ingests_in_flight": ingest_gate.in_flight,
+            "answer_cache": engine.answer_cache.stats() if engine and engine.answer_cache else None,
+            "coalesced_queries": engine.flights.stats() if engine else None,
+            "query_embeddings": engine.embeddings.stats() if engine and engine.embeddings else None,
+            "embedding_cache": document_stats.stats() if document_stats else None,
+            "tenants": len(engines),
+            "resident_indexes": resident.stats(),
+        }
+
+    @app.post("/ingest")
+    async def ingest(request: Request):
+        if not ingest_gate.try_acquire():
+            return _too_busy("ingests")
+        try:
+            engine = await run_blocking(get_engine, _request_tenant(request), True)
+            if request.headers.get("content-type", "").startswith("application/pdf"):
+                data = await request.body()
+                filename = request.query_params.get("filename", "upload.pdf")
+                result = await run_blocking(_ingest_pdf_bytes, engine, data, filename)
+            else:
+                try:
+                    payload = IngestRequest.model_validate_json(await request.body())
+                except ValidationError as e:
+                    raise RequestValidationError(e.errors(include_url=False, include_context=False,
+                                                          include_input=False))
+                directory = _ingest_directory(payload.directory)
+                try:
+                    result = await run_blocking(engine.sync_directory, directory, None,
+                                                config.API_INGEST_ROOT)
+                except FileNotFoundError as e:
+                    raise HTTPException(404, str(e))
+            return _ingest_result_json(result)
+        finally:
+            ingest_gate.release()
+
+    @app.post("/query")
+    async def query(body: QueryRequest, request: Request):
+        tenant = _request_tenant(request)
+        if not query_gate.try_acquire():
+            return _too_busy("queries")
+        try:
+            started = time.perf_counter()
+            engine = await run_blocking(get_engine, tenant)
+            if engine is None:
+                answer, sources = NO_DOCUMENTS, []
+            else:
+                answer, sources = await run_blocking(engine.ask_question, body.question,
+                                                     body.metadata_filter())
+            return {
+                "answer": answer,
+                "sources": [_source_json(doc) for doc in sources],
+                "total_time": time.perf_counter() - started,
+            }
+        finally:
+            query_gate.release()
+
+    @app.post("/query/stream")
+    async def query_stream(body: QueryRequest, request: Request):
+        tenant = _request_tenant(request)
+        if not query_gate.try_acquire():
+            return _too_busy("queries")
+        try:
+            engine = await run_blocking(get_engine, tenant)
+            if engine is None:
+                stream = AnswerStream.from_text(NO_DOCUMENTS)
+            else:
+                stream = await run_blocking(engine.stream_question, body.question,
+                                            body.metadata_filter())
+        except BaseException:
+            query_gate.release()
+            raise
+
+        async def events():
+            # One stream thread pulls every token and hands it over through a
+            # queue; the slot is held until the stream ends or the client disconnects
+            tokens = asyncio.Queue()
+            stop = threading.Event()
+            asyncio.get_running_loop().run_in_executor(
+                stream_pool, _pump_tokens, stream, asyncio.get_running_loop(), tokens, stop)
+            try:
+                yield json.dumps({"sources": [_source_json(d) for d in stream.sources]}) + "\n"
+                while (token := await tokens.get()) is not _STREAM_END:
+                    if isinstance(token, Exception):
+                        raise token
+                    yield json.dumps({"token": token}) + "\n"
+                yield json.dumps({
+                    "done": True,
+                    "cached": stream.cached,
+                    "time_to_first_token": stream.time_to_first_token,
+                    "total_time": stream.total_time,
+                }) + "\n"
+            finally:
+                stop.set()
+                query_gate.release()
+
+        return StreamingResponse(events(), media_type="application/x-ndjson")
+
+    return app
+
+
+_STREAM_END = object()
+
+
+def _pump_tokens(stream, loop, queue, stop):
+    """Iterate ``stream`` on this thread, passing each token (then an error or
+    ``_STREAM_END``) to ``queue`` on ``loop``; stops early once ``stop`` is set"""
+    tokens = iter(stream)
+
+    def put(item):
+        try:
+            loop.call_soon_threadsafe(queue.put_nowait, item)
+        except RuntimeError:
+            # The event loop is gone (server shutdown); nobody is listening
+            stop.set()
+
+    try:
+        for token in tokens:
+            if stop.is_set():
+                break
+            put(token)
+        put(_STREAM_END)
+    except Exception as e:
+        put(e)
+    finally:
+        # Closing the generator lets a shared stream stop generating for us
+        close = getattr(tokens, "close", None)
+        if close is not None:
+            close()
+
+
+def _ingest_pdf_bytes(engine, data, filename):
+    loader = UploadPDFLoader([(filename, data)], max_workers=1)
+    documents = loader.load()
+    if loader.errors:
+        raise HTTPException(400, f"Could not parse {filename}: {loader.errors[0][1]}")
+    return engine.add_documents(documents)
+
+
+app = create_app()
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run(app, host=config.API_HOST, port=config.API_PORT)
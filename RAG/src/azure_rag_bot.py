@@ -1,38 +1,37 @@
 # Azure AI Studio optimized version
 import os
 import streamlit as st
-from azure.identity import DefaultAzureCredential
 from dotenv import load_dotenv
-from langchain_community.document_loaders import PyPDFLoader, DirectoryLoader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_openai import OpenAIEmbeddings, ChatOpenAI
-from langchain_community.vectorstores import Chroma
-from langchain.chains import RetrievalQA
-from langchain.memory import ConversationBufferMemory
-import tempfile
+
+import config
+from chroma_store import EmbeddingMismatchError, load_persisted_chroma, record_embedding_signature
+from embedding_cache import CachedEmbeddings
+from embedding_pipeline import PipelinedEmbeddings
+from parallel_loader import ParallelPDFLoader, UploadPDFLoader
+from streaming import AnswerStream, stream_answer
+from token_splitter import get_text_splitter
+from warmup import start_warmup
 
 # Load environment variables
 load_dotenv()
 
+
 class AzureRAGBot:
     def __init__(self):
         self.embeddings = None
         self.vectorstore = None
         self.qa_chain = None
-        self.memory = ConversationBufferMemory(
-            memory_key="chat_history",
-            return_messages=True
-        )
-        # Use Azure managed identity when possible
-        self.use_managed_identity = self._check_managed_identity()
-        
-    def _check_managed_identity(self):
-        """Check if running in Azure with managed identity"""
-        try:
-            credential = DefaultAzureCredential()
-            return True
-        except:
-            return False
+        self._memory = None
+
+    @property
+    def memory(self):
+        if self._memory is None:
+            from langchain.memory import ConversationBufferMemory
+            self._memory = ConversationBufferMemory(
+                memory_key="chat_history",
+                return_messages=True
+            )
+        return self._memory
     
     def initialize_azure_openai(self, api_key=None, endpoint=None, chat_deployment=None, embedding_deployment=None, api_version=None):
         """Initialize Azure OpenAI with explicit parameters or environment variables"""
@@ -52,12 +51,12 @@ class AzureRAGBot:
             from langchain_openai import AzureOpenAIEmbeddings, AzureChatOpenAI
             
             # Initialize embeddings
-            self.embeddings = AzureOpenAIEmbeddings(
+            self.embeddings = CachedEmbeddings(PipelinedEmbeddings(AzureOpenAIEmbeddings(
                 azure_deployment=self.embedding_deployment,
                 api_version=self.api_version,
                 azure_endpoint=self.endpoint,
                 api_key=self.api_key
-            )
+            )), model_name=self.embedding_deployment)
             
             st.success("✅ Azure OpenAI initialized successfully!")
             return True
@@ -71,27 +70,14 @@ class AzureRAGBot:
         documents = []
         
         if files:
-            for file in files:
-                try:
-                    with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as tmp_file:
-                        tmp_file.write(file.getvalue())
-                        tmp_file_path = tmp_file.name
-                    
-                    loader = PyPDFLoader(tmp_file_path)
-                    docs = loader.load()
-                    documents.extend(docs)
-                    os.unlink(tmp_file_path)
-                    
-                except Exception as e:
-                    st.error(f"Error loading {file.name}: {e}")
+            # Parsed from the upload buffers; nothing is written to disk
+            loader = UploadPDFLoader(files)
+            documents = loader.load()
+            for name, e in loader.errors:
+                st.error(f"Error loading {name}: {e}")
                     
         elif directory and os.path.exists(directory):
-            loader = DirectoryLoader(
-                directory,
-                glob="**/*.pdf",
-                loader_cls=PyPDFLoader,
-                show_progress=True
-            )
+            loader = ParallelPDFLoader(directory)
             documents = loader.load()
             
         return documents
@@ -107,29 +93,48 @@ class AzureRAGBot:
             return False
             
         # Split documents
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=200,
-            length_function=len
-        )
-        
-        chunks = text_splitter.split_documents(documents)
+        chunks = get_text_splitter().split_documents(documents)
         st.info(f"Split into {len(chunks)} chunks")
         
         # Create vector store
         try:
+            self.embeddings.reset_pipeline_stats()
+            from langchain_community.vectorstores import Chroma
             self.vectorstore = Chroma.from_documents(
                 documents=chunks,
                 embedding=self.embeddings,
-                persist_directory="./chroma_db"
+                collection_name=config.COLLECTION_NAME,
+                persist_directory=config.PERSIST_DIRECTORY
             )
+            record_embedding_signature(self.vectorstore, self.embeddings)
             st.success("✅ Vector store created!")
+            stats = getattr(self.embeddings, "pipeline_stats", None)
+            if stats and stats.chunks:
+                st.info(f"⚡ {stats.summary()}")
             return True
             
         except Exception as e:
             st.error(f"Error creating vector store: {e}")
             return False
     
+    def reopen_vectorstore(self):
+        """Open the persisted collection instead of re-embedding the documents"""
+        if self.vectorstore is not None or not self.embeddings:
+            return False
+        try:
+            vectorstore = load_persisted_chroma(self.embeddings)
+        except EmbeddingMismatchError as e:
+            st.warning(f"⚠️ {e}")
+            return False
+        except Exception as e:
+            st.error(f"Error opening persisted vector store: {e}")
+            return False
+        if vectorstore is None:
+            return False
+        self.vectorstore = vectorstore
+        st.info(f"📂 Reopened persisted vector store with {vectorstore._collection.count()} chunks")
+        return self.create_qa_chain()
+
     def create_qa_chain(self):
         """Create QA chain"""
         if not self.vectorstore:
@@ -138,6 +143,7 @@ class AzureRAGBot:
             
         try:
             from langchain_openai import AzureChatOpenAI
+            from langchain.chains import RetrievalQA
             
             llm = AzureChatOpenAI(
                 azure_deployment=self.chat_deployment,
@@ -173,12 +179,24 @@ class AzureRAGBot:
         except Exception as e:
             return f"Error: {e}", []
 
+    def stream_question(self, question):
+        """Retrieve sources, then stream the answer token by token"""
+        if not self.qa_chain:
+            return AnswerStream.from_text("Please initialize the system first!")
+
+        try:
+            return stream_answer(self.qa_chain, question)
+        except Exception as e:
+            return AnswerStream.from_text(f"Error: {e}")
+
 def main():
     st.set_page_config(
         page_title="Azure RAG Bot",
         page_icon="☁️",
         layout="wide"
     )
+    # Load langchain/OpenAI/Chroma in the background while the page renders
+    start_warmup()
     
     st.title("☁️ Azure AI Studio RAG Bot")
     st.markdown("Enterprise RAG solution powered by Azure OpenAI")
@@ -201,6 +219,7 @@ def main():
         if st.button("🔄 Auto-Initialize with Environment"):
             success = st.session_state.bot.initialize_azure_openai()
             if success:
+                st.session_state.bot.reopen_vectorstore()
                 st.success("Ready to use!")
         
         st.markdown("---")
@@ -217,6 +236,8 @@ def main():
                 success = st.session_state.bot.initialize_azure_openai(
                     api_key, endpoint, chat_deployment, embedding_deployment, api_version
                 )
+                if success:
+                    st.session_state.bot.reopen_vectorstore()
         
         st.markdown("---")
         
@@ -272,10 +293,14 @@ def main():
         
         # Get bot response
         with st.chat_message("assistant"):
-            with st.spinner("Thinking..."):
-                answer, sources = st.session_state.bot.ask_question(prompt)
+            with st.spinner("Searching documents..."):
+                stream = st.session_state.bot.stream_question(prompt)
             
-            st.markdown(answer)
+            answer_placeholder = st.empty()
+            for _ in stream:
+                answer_placeholder.markdown(stream.answer + "▌")
+            answer_placeholder.markdown(stream.answer)
+            answer, sources = stream.answer, stream.sources
             
             if sources:
                 with st.expander("📚 Sources"):
@@ -0,0 +1,167 @@
+"""
+Open the persisted Chroma collection instead of re-embedding the corpus.
+
+The collection is named ``config.COLLECTION_NAME`` and lives in
+``config.PERSIST_DIRECTORY``. Its metadata records the embedding model and
+vector dimension it was built with. On startup the collection is reopened
+only if it holds vectors from the same model, so no embeddings API call is
+needed; querying it with a different model would return nonsense.
+"""
+
+import os
+
+import config
+from embedding_cache import embedding_model_name
+
+# Output sizes of common embedding models, used when the client does not say
+KNOWN_DIMENSIONS = {
+    "text-embedding-ada-002": 1536,
+    "text-embedding-3-small": 1536,
+    "text-embedding-3-large": 3072,
+}
+
+
+class EmbeddingMismatchError(ValueError):
+    """The persisted collection was built with a different embedding model"""
+
+
+def expected_dimension(embeddings):
+    """Vector size ``embeddings`` produces, if it can be known without an API call"""
+    current = embeddings
+    while current is not None:
+        for attr in ("dimensions", "size"):
+            value = getattr(current, attr, None)
+            if isinstance(value, int):
+                return value
+        current = getattr(current, "underlying", None)
+    return KNOWN_DIMENSIONS.get(embedding_model_name(embeddings))
+
+
+def open_chroma(embeddings, persist_directory=None, collection_name=None):
+    """Open (or create) the persisted collection"""
+    # Deferred: chromadb is one of the slowest imports at startup
+    from langchain_community.vectorstores import Chroma
+    return Chroma(
+        collection_name=collection_name or config.COLLECTION_NAME,
+        persist_directory=persist_directory or config.PERSIST_DIRECTORY,
+        embedding_function=embeddings,
+    )
+
+
+def chroma_collection_names(persist_directory=None):
+    """Names of the persisted collections, listed without creating anything"""
+    persist_directory = persist_directory or config.PERSIST_DIRECTORY
+    if not os.path.exists(os.path.join(persist_directory, "chroma.sqlite3")):
+        return set()
+    import chromadb
+    # Same settings as LangChain's Chroma, so the client's system is shared
+    settings = chromadb.config.Settings(is_persistent=True, persist_directory=persist_directory)
+    return {collection.name for collection in chromadb.Client(settings).list_collections()}
+
+
+def chroma_collection_exists(persist_directory=None, collection_name=None):
+    """Whether the collection exists, checked without creating it"""
+    return (collection_name or config.COLLECTION_NAME) in chroma_collection_names(persist_directory)
+
+
+def reset_chroma(embeddings, persist_directory=None, collection_name=None):
+    """Drop the persisted collection so it can be rebuilt from scratch"""
+    persist_directory = persist_directory or config.PERSIST_DIRECTORY
+    if os.path.exists(os.path.join(persist_directory, "chroma.sqlite3")):
+        open_chroma(embeddings, persist_directory, collection_name).delete_collection()
+
+
+def drop_chroma_collection(collection_name, persist_directory=None):
+    """Delete a collection by name, without an embeddings client; missing is fine"""
+    if chroma_collection_exists(persist_directory, collection_name):
+        import chromadb
+        settings = chromadb.config.Settings(
+            is_persistent=True, persist_directory=persist_directory or config.PERSIST_DIRECTORY
+        )
+        chromadb.Client(settings).delete_collection(collection_name)
+
+
+def unload_chroma(vectorstore):
+    """Release the memory Chroma holds for the collection (HNSW graph, segment state).
+
+    Chroma keeps every collection it has opened loaded for the life of the
+    process; this drops the collection's segments from the local segment
+    manager (chromadb 0.4.x) so they are reloaded from disk on next use.
+    Writes not yet synced to the HNSW files are replayed from Chroma's
+    write-ahead log on reload. Returns False if the client has no local
+    segment manager.
+    """
+    collection_id = vectorstore._collection.id
+    manager = getattr(getattr(vectorstore._client, "_server", None), "_manager", None)
+    if manager is None or not hasattr(manager, "_segment_cache"):
+        return False
+    with manager._lock:
+        segments = manager._segment_cache.pop(collection_id, {})
+        handles = getattr(manager, "_vector_instances_file_handle_cache", None)
+        if handles is not None:
+            handles.cache.pop(collection_id, None)
+        instances = [manager._instances.pop(segment["id"], None)
+                     for segment in segments.values()]
+    for instance in instances:
+        if instance is not None:
+            # Unsubscribes from the write log; queries already running keep their reference
+            instance.stop()
+    return True
+
+
+def _stored_dimension(vectorstore):
+    sample = vectorstore._collection.get(limit=1, include=["embeddings"])
+    embeddings = sample.get("embeddings") or []
+    return len(embeddings[0]) if embeddings else None
+
+
+def record_embedding_signature(vectorstore, embeddings):
+    """Store the embedding model and dimension in the collection metadata"""
+    collection = vectorstore._collection
+    metadata = dict(collection.metadata or {})
+    signature = {
+        "embedding_model": embedding_model_name(embeddings),
+        "embedding_dimension": _stored_dimension(vectorstore) or expected_dimension(embeddings),
+    }
+    if all(metadata.get(key) == value for key, value in signature.items()):
+        return
+    metadata.update({key: value for key, value in signature.items() if value is not None})
+    # Chroma rejects changing the distance function after creation
+    metadata.pop("hnsw:space", None)
+    collection.modify(metadata=metadata)
+
+
+def check_embedding_signature(vectorstore, embeddings):
+    """Raise ``EmbeddingMismatchError`` if the collection was built with another model"""
+    metadata = vectorstore._collection.metadata or {}
+    stored_model = metadata.get("embedding_model")
+    current_model = embedding_model_name(embeddings)
+    if stored_model and stored_model != current_model:
+        raise EmbeddingMismatchError(
+            f"Collection '{vectorstore._collection.name}' was built with embedding model "
+            f"'{stored_model}', but '{current_model}' is configured. "
+            "Re-ingest the documents or switch back to the original model."
+        )
+    stored_dim = metadata.get("embedding_dimension") or _stored_dimension(vectorstore)
+    current_dim = expected_dimension(embeddings)
+    if stored_dim and current_dim and stored_dim != current_dim:
+        raise EmbeddingMismatchError(
+            f"Collection '{vectorstore._collection.name}' holds {stored_dim}-dimensional "
+            f"vectors, but the configured embeddings produce {current_dim}."
+        )
+
+
+def load_persisted_chroma(embeddings, persist_directory=None, collection_name=None):
+    """Reopen a non-empty persisted collection, or return ``None`` if there is none.
+
+    Raises ``EmbeddingMismatchError`` when the collection does not match
+    ``embeddings``.
+    """
+    persist_directory = persist_directory or config.PERSIST_DIRECTORY
+    if not chroma_collection_exists(persist_directory, collection_name):
+        return None
+    vectorstore = open_chroma(embeddings, persist_directory, collection_name)
+    if vectorstore._collection.count() == 0:
+        return None
+    check_embedding_signature(vectorstore, embeddings)
+    return vectorstore
@@ -1,32 +1,30 @@
 """
 Simple CLI version of the RAG bot for testing without Streamlit
+
+    python src/cli_bot.py [--rebuild] [--source FILE ...] [--pages FROM-TO] [--since YYYY-MM-DD]
+
+The filter options restrict every question to chunks from those source
+files / pages / ingested on or after that date.
 """
 
+import argparse
 import os
+from datetime import date
 from dotenv import load_dotenv
-from langchain_community.document_loaders import PyPDFLoader, DirectoryLoader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_openai import OpenAIEmbeddings, ChatOpenAI
-from langchain_community.vectorstores import Chroma
-from langchain.chains import RetrievalQA
+
+from chroma_store import EmbeddingMismatchError
+from embedding_cache import CachedEmbeddings
+from embedding_pipeline import PipelinedEmbeddings
+from metadata_filter import MetadataFilter
+from rag_engine import RAGEngine
 
 # Load environment variables
 load_dotenv()
 
 
-def main():
-    print("🤖 LangChain RAG Bot - CLI Version")
-    print("=" * 50)
-    
-    # Check if OpenAI API key is set
-    if not os.getenv("OPENAI_API_KEY"):
-        print("❌ Please set your OPENAI_API_KEY in the .env file")
-        return
-    
-    # Initialize components
-    print("🔧 Initializing components...")
-    embeddings = OpenAIEmbeddings()
-    
+def build_index(engine):
+    """Load, split and embed the PDFs into a fresh persisted index"""
     # Load PDFs from directory
     pdf_directory = "./pdfs"
     print(f"📁 Loading PDFs from {pdf_directory}...")
@@ -34,63 +32,92 @@ def main():
     if not os.path.exists(pdf_directory):
         print(f"❌ Directory {pdf_directory} does not exist!")
         print("Please create the 'pdfs' directory and add your PDF files.")
-        return
+        return False
     
     # Check if there are PDF files
     pdf_files = [f for f in os.listdir(pdf_directory) if f.endswith('.pdf')]
     if not pdf_files:
         print("❌ No PDF files found in the pdfs directory!")
         print("Please add some PDF files to the 'pdfs' directory.")
-        return
+        return False
     
     print(f"📚 Found {len(pdf_files)} PDF files: {', '.join(pdf_files)}")
     
-    # Load documents
-    loader = DirectoryLoader(
-        pdf_directory,
-        glob="**/*.pdf",
-        loader_cls=PyPDFLoader
-    )
-    
+    # Rebuild through the engine so the ingest manifest and BM25 index
+    # stored beside the vectors are rebuilt with them, not left stale
+    print("🗄️ Rebuilding vector store...")
     try:
-        documents = loader.load()
-        print(f"✅ Loaded {len(documents)} document pages")
+        engine.reset_index()
+        result = engine.sync_directory(pdf_directory)
+        print(f"✅ Indexed {result.chunks} text chunks from {result.files} files")
+        for path, error in result.failed:
+            print(f"⚠️ Skipped unreadable PDF {path}: {error}")
+        if result.embedding_stats:
+            print(f"⚡ {result.embedding_stats.summary()}")
+        if result.embedding_cache:
+            print(f"🗃️ {result.embedding_cache.summary()}")
+        return True
     except Exception as e:
-        print(f"❌ Error loading PDFs: {str(e)}")
+        print(f"❌ Error creating vector store: {str(e)}")
+        return False
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="LangChain RAG Bot - CLI Version")
+    parser.add_argument("--rebuild", action="store_true", help="re-index the PDFs")
+    parser.add_argument("--source", action="append", default=[],
+                        help="only search chunks from this source file (repeatable)")
+    parser.add_argument("--pages", help="only search this page range, e.g. 3-7 or 10-")
+    parser.add_argument("--since", type=date.fromisoformat,
+                        help="only search chunks ingested on or after this date (YYYY-MM-DD)")
+    args = parser.parse_args()
+    page_min = page_max = None
+    if args.pages:
+        low, _, high = args.pages.partition("-")
+        try:
+            page_min = int(low) if low else None
+            page_max = int(high) if high else (None if _ else page_min)
+        except ValueError:
+            parser.error(f"--pages expects FROM-TO, got {args.pages!r}")
+    args.filters = MetadataFilter(sources=tuple(args.source), page_min=page_min,
+                                  page_max=page_max, ingested_after=args.since)
+    return args
+
+
+def main():
+    args = parse_args()
+    print("🤖 LangChain RAG Bot - CLI Version")
+    print("=" * 50)
+    
+    # Check if OpenAI API key is set
+    if not os.getenv("OPENAI_API_KEY"):
+        print("❌ Please set your OPENAI_API_KEY in the .env file")
         return
     
-    # Split documents
-    print("✂️ Splitting documents into chunks...")
-    text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=1000,
-        chunk_overlap=200
-    )
-    chunks = text_splitter.split_documents(documents)
-    print(f"✅ Created {len(chunks)} text chunks")
+    # Initialize components
+    print("🔧 Initializing components...")
+    embeddings = CachedEmbeddings(PipelinedEmbeddings(OpenAIEmbeddings()))
+    llm = ChatOpenAI(temperature=0.7, model="gpt-3.5-turbo")
+    # The engine answers from the configured backend, like the web app and API
+    engine = RAGEngine(embeddings, llm)
     
-    # Create vector store
-    print("🗄️ Creating vector store...")
-    try:
-        vectorstore = Chroma.from_documents(
-            documents=chunks,
-            embedding=embeddings,
-            persist_directory="./chroma_db"
-        )
-        print("✅ Vector store created successfully!")
-    except Exception as e:
-        print(f"❌ Error creating vector store: {str(e)}")
+    # Reuse the persisted index unless asked to rebuild it
+    reopened = False
+    if not args.rebuild:
+        try:
+            reopened = engine.open_existing_index()
+        except EmbeddingMismatchError as e:
+            print(f"⚠️ {e}")
+            print("Rebuilding the vector store...")
+        if reopened:
+            print(f"📂 Reopened persisted vector store with {engine.document_count()} chunks "
+                  "(run with --rebuild to re-index the PDFs)")
+    if not reopened and not build_index(engine):
         return
     
-    # Create QA chain
-    print("🔗 Creating QA chain...")
-    llm = ChatOpenAI(temperature=0.7, model="gpt-3.5-turbo")
-    qa_chain = RetrievalQA.from_chain_type(
-        llm=llm,
-        chain_type="stuff",
-        retriever=vectorstore.as_retriever(search_kwargs={"k": 4}),
-        return_source_documents=True
-    )
     print("✅ QA chain ready!")
+    if not args.filters.empty:
+        print(f"🔎 Searching only: {args.filters.describe()}")
     
     # Interactive Q&A loop
     print("\n" + "=" * 50)
@@ -109,13 +136,14 @@ def main():
         
         try:
             print("🤔 Thinking...")
-            result = qa_chain({"query": question})
-            answer = result["result"]
-            sources = result["source_documents"]
+            stream = engine.stream_question(question, args.filters)
+            sources = stream.sources
             
             print(f"\n🤖 Answer:")
             print("-" * 30)
-            print(answer)
+            for token in stream:
+                print(token, end="", flush=True)
+            print()
             
             if sources:
                 print(f"\n📖 Sources ({len(sources)} found):")
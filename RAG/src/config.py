@@ -8,20 +8,98 @@ OPENAI_TEMPERATURE = 0.7
 OPENAI_MAX_TOKENS = 1000
 
 # Text Splitting Settings
-CHUNK_SIZE = 1000
+TEXT_SPLITTER = "tokens"  # or "characters" for LangChain's RecursiveCharacterTextSplitter
+CHUNK_SIZE_TOKENS = 256  # Chunk length in model tokens (token splitter)
+CHUNK_OVERLAP_TOKENS = 50
+EMBEDDING_MAX_TOKENS = 8191  # Embedding model input limit; no chunk may exceed it
+CHUNK_SIZE = 1000  # Characters (character splitter)
 CHUNK_OVERLAP = 200
 
 # Retrieval Settings
 RETRIEVAL_K = 4  # Number of similar chunks to retrieve
 SEARCH_TYPE = "similarity"  # or "mmr" for maximum marginal relevance
+HYBRID_RETRIEVAL = True  # Fuse BM25 lexical results with vector results
+HYBRID_FETCH_K = 20  # Candidates taken from each retriever before fusion
+RRF_K = 60  # Reciprocal-rank fusion constant
+
+# Reranking Settings
+RERANK_ENABLED = True  # Retrieve wide, rerank on CPU, keep the best few
+RERANK_FETCH_K = 50  # Candidates fetched by the first-stage retriever
+RERANK_TOP_N = 4  # Chunks passed to the LLM after reranking
+RERANK_TIME_BUDGET_MS = 150  # Hard per-query budget for scoring candidates; unscored ones keep first-stage order
+RERANK_SCORER = "lexical"  # or "cross-encoder" (needs sentence-transformers)
+RERANK_CROSS_ENCODER_MODEL = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+
+# Context Packing Settings
+CONTEXT_PACKING = True  # Merge adjacent chunks and drop repeated overlap before the prompt
+CONTEXT_MAX_TOKENS = 1500  # Token budget for retrieved context sent to the LLM
+
+# Answer Cache Settings
+ANSWER_CACHE_ENABLED = True
+ANSWER_CACHE_SIMILARITY = 0.97  # Cosine similarity for paraphrased questions to match (numbers and names must be equal too)
+ANSWER_CACHE_TTL_SECONDS = 3600
+ANSWER_CACHE_MAX_ENTRIES = 1000
+
+# Conversation Memory Settings
+MEMORY_WINDOW_TURNS = 4  # Most recent question / answer turns kept verbatim
+MEMORY_MAX_TOKENS = 1200  # Budget for summary + verbatim turns used to rewrite follow-ups
+MEMORY_SUMMARY_TOKENS = 300  # Part of the budget for the rolling summary of older turns
 
 # Vector Database Settings
 PERSIST_DIRECTORY = "./chroma_db"
 COLLECTION_NAME = "rag_documents"
+MANIFEST_FILE = "ingest_manifest.json"  # Incremental ingest manifest, stored with the vector index
+LEXICAL_INDEX_FILE = "lexical_index.pkl"  # BM25 index, stored with the vector index
+VECTOR_BACKEND = "chroma"  # or "native" for the memory-mapped flat/IVF index
+NATIVE_INDEX_DIRECTORY = "./native_index"
+NATIVE_IVF_MIN_VECTORS = 50_000  # Below this, native search is brute-force
+NATIVE_IVF_LISTS = None  # IVF partitions, None = 4 * sqrt(vectors)
+NATIVE_IVF_NPROBE = 8  # Partitions scanned per query
+NATIVE_ANN_INDEX = "ivf"  # or "hnsw" for a graph index grown as chunks are added
+HNSW_M = 16  # Graph links per node (build time); higher = better recall, more memory
+HNSW_EF_CONSTRUCTION = 200  # Candidate list size while inserting
+HNSW_EF_SEARCH = 64  # Candidate list size per query; higher = better recall, slower
+NATIVE_QUANTIZATION = None  # None, "int8" (4x smaller) or "pq" (product quantization, 16x smaller)
+NATIVE_QUANTIZATION_MIN_VECTORS = 10_000  # Rows needed before the quantizer is trained
+NATIVE_PQ_SUBSPACES = None  # PQ bytes per vector; None -> dim / 4
+NATIVE_RESCORE_CANDIDATES = 1000  # Rows re-scored at full precision; PQ needs ~1000 for <1% recall loss
+
+# Multi-tenant Settings
+DEFAULT_TENANT = None  # Tenant used when none is given; None = the shared, pre-tenant index
+RESIDENT_INDEX_MEMORY_MB = 2048  # Estimated memory of loaded tenant indexes; least recently used are unloaded beyond it
+TENANT_IDLE_DAYS = 30  # Tenant indexes unused this long are deleted (checked daily); None keeps them
+
+# Embedding Cache Settings
+EMBEDDING_CACHE_PATH = "./embedding_cache/embeddings.sqlite3"
+EMBEDDING_CACHE_MAX_ENTRIES = 500_000  # ~3 GB of ada-002 vectors at float32
+QUERY_EMBEDDING_CACHE_SIZE = 4096  # Question embeddings kept in memory (~25 MB for ada-002)
+
+# Embedding Pipeline Settings
+EMBEDDING_BATCH_TOKENS = 8000  # Max tokens per embeddings request
+EMBEDDING_BATCH_SIZE = 256  # Max chunks per embeddings request
+EMBEDDING_MAX_WORKERS = 4  # Concurrent embeddings requests
+EMBEDDING_TOKENS_PER_MINUTE = 240_000  # Match your deployment's TPM quota
+EMBEDDING_REQUESTS_PER_MINUTE = 1_440  # Match your deployment's RPM quota
 
 # File Settings
 PDF_DIRECTORY = "./pdfs"
 SUPPORTED_EXTENSIONS = [".pdf"]
+PDF_LOADER_WORKERS = None  # Worker processes for PDF parsing, None = all cores
+PDF_PAGES_PER_TASK = 50  # Page range size when splitting large PDFs across workers
+PDF_LARGE_FILE_BYTES = 2_000_000  # PDFs above this size are split into page ranges
+INGEST_BATCH_CHUNKS = 512  # Chunks buffered before each embed + upsert; bounds ingest memory
+INGEST_CHECKPOINT_SECONDS = 30  # Manifest + BM25 index saved at most this often during a sync
+
+# HTTP API Settings
+API_HOST = "0.0.0.0"
+API_PORT = 8000
+API_WORKERS = 8  # Threads for retrieval / LLM / ingest work
+API_MAX_QUEUED_QUERIES = 32  # Queries allowed to wait for a worker before 429s
+API_MAX_CONCURRENT_INGESTS = 1
+API_RETRY_AFTER_SECONDS = 1
+API_MAX_TENANT_ENGINES = 256  # Tenant engines kept; least recently used idle ones are dropped beyond it
+API_TENANT_LIST_SECONDS = 10  # Max age of the list of tenants with an index; others are answered without opening one
+API_INGEST_ROOT = "./pdfs"  # /ingest {"directory"} must be inside this; None disables directory ingest
 
 # Streamlit Settings
 PAGE_TITLE = "LangChain RAG Bot"
@@ -30,5 +108,6 @@ LAYOUT = "wide"
 
 # Display Settings
 MAX_CONTENT_PREVIEW = 500  # Characters to show in source preview
+CHAT_HISTORY_MAX_MESSAGES = 100  # Messages kept on screen; older turns live on in the summary
 SHOW_PROGRESS = True
 VERBOSE = True
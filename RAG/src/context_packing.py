@@ -0,0 +1,193 @@
+"""
+Context assembly between retrieval and the prompt.
+
+Chunks are split with about ``CHUNK_OVERLAP_TOKENS`` tokens of overlap
+(``CHUNK_OVERLAP`` characters with the character splitter), so two
+neighbouring chunks retrieved for the same question repeat that text in the
+prompt. ``pack_context`` merges chunks from the same source and page that
+touch or overlap, keeps the overlapping span once, and then fills a token
+budget (counted with tiktoken) in relevance order.
+
+Chunks carry a ``start_index`` when split by ``RAGEngine``, which places
+them exactly whatever the overlap unit. Chunks indexed without one are
+merged when the end of one is the start of the other and the shared text
+is at least ``MIN_OVERLAP_TOKENS`` tokens, or the configured token overlap
+if that is smaller (the token splitter starts the overlap at a word
+boundary, so neighbours share a little less than configured).
+"""
+
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+import config
+from token_utils import count_tokens, truncate_to_tokens
+
+MIN_OVERLAP_TOKENS = 5  # Shortest shared prefix/suffix treated as chunk overlap
+OVERLAP_PROBE = 4  # Leading characters of a chunk searched for in its neighbour
+MAX_JOIN_GAP = 2  # Characters of stripped whitespace allowed between adjacent chunks
+
+
+class _Span:
+    """Merged text of one or more chunks from the same source and page"""
+
+    def __init__(self, doc, rank):
+        self.text = doc.page_content
+        self.metadata = dict(doc.metadata)
+        self.start = doc.metadata.get("start_index")
+        if not isinstance(self.start, int) or self.start < 0:
+            self.start = None
+        self.rank = rank
+        self.chunks = 1
+
+    @property
+    def end(self):
+        return self.start + len(self.text)
+
+    def absorb(self, other, text):
+        self.text = text
+        self.rank = min(self.rank, other.rank)
+        self.chunks += other.chunks
+        if self.start is not None and other.start is not None:
+            self.start = min(self.start, other.start)
+        else:
+            # Merged by text; the position of the result is unknown
+            self.start = None
+
+
+def min_overlap_tokens():
+    """Fewest shared tokens that make two chunks overlap rather than coincide"""
+    if config.TEXT_SPLITTER == "characters" or not config.CHUNK_OVERLAP_TOKENS:
+        return MIN_OVERLAP_TOKENS
+    return max(1, min(MIN_OVERLAP_TOKENS, config.CHUNK_OVERLAP_TOKENS // 2))
+
+
+def _text_overlap(left, right):
+    """Length of the longest suffix of ``left`` that is a prefix of ``right``,
+    if it is at least ``min_overlap_tokens()`` long, else 0"""
+    probe = right[:OVERLAP_PROBE]
+    if len(probe) < OVERLAP_PROBE:
+        return 0
+    position = left.find(probe, max(0, len(left) - len(right)))
+    while position != -1:
+        if right.startswith(left[position:]):
+            # The longest match; shorter ones further right are smaller still
+            shared = left[position:]
+            return len(shared) if count_tokens(shared) >= min_overlap_tokens() else 0
+        position = left.find(probe, position + 1)
+    return 0
+
+
+def _merged_text(a, b):
+    """Text of ``a`` followed by ``b`` with their shared span kept once, or None"""
+    if a.start is not None and b.start is not None:
+        if b.start < a.start:
+            a, b = b, a
+        if b.end <= a.end:
+            offset = b.start - a.start
+            return a.text if a.text[offset:offset + len(b.text)] == b.text else None
+        if b.start <= a.end:
+            shared = a.end - b.start
+            if a.text[len(a.text) - shared:] == b.text[:shared]:
+                return a.text + b.text[shared:]
+            return None
+        if b.start - a.end <= MAX_JOIN_GAP:
+            # The splitter stripped the whitespace between them; usually newlines
+            return a.text + "\n" * (b.start - a.end) + b.text
+        return None
+
+    if b.text in a.text:
+        return a.text
+    if a.text in b.text:
+        return b.text
+    for left, right in ((a, b), (b, a)):
+        shared = _text_overlap(left.text, right.text)
+        if shared:
+            return left.text + right.text[shared:]
+    return None
+
+
+def merge_chunks(documents):
+    """Merge touching / overlapping chunks of the same source and page.
+
+    ``documents`` are in relevance order; the result is too, each merged
+    span ranked by its best chunk. Merged documents get a ``merged_chunks``
+    count in their metadata.
+    """
+    groups = {}
+    for rank, doc in enumerate(documents):
+        key = (doc.metadata.get("source"), doc.metadata.get("page"))
+        groups.setdefault(key, []).append(_Span(doc, rank))
+
+    spans = []
+    for group in groups.values():
+        merged = True
+        while merged and len(group) > 1:
+            merged = False
+            for i in range(len(group)):
+                for j in range(i + 1, len(group)):
+                    text = _merged_text(group[i], group[j])
+                    if text is not None:
+                        group[i].absorb(group.pop(j), text)
+                        merged = True
+                        break
+                if merged:
+                    break
+        spans.extend(group)
+
+    spans.sort(key=lambda span: span.rank)
+    packed = []
+    for span in spans:
+        metadata = span.metadata
+        if span.chunks > 1:
+            metadata["merged_chunks"] = span.chunks
+            if span.start is not None:
+                metadata["start_index"] = span.start
+        packed.append(Document(page_content=span.text, metadata=metadata))
+    return packed
+
+
+def pack_context(documents, max_tokens=None):
+    """Merge ``documents`` and keep as many as fit in ``max_tokens``, best first.
+
+    The best document is truncated rather than dropped if it alone exceeds
+    the budget; later ones that do not fit are skipped so smaller, less
+    relevant ones can still use the remaining budget.
+    """
+    max_tokens = config.CONTEXT_MAX_TOKENS if max_tokens is None else max_tokens
+    packed, used = [], 0
+    for doc in merge_chunks(documents):
+        tokens = count_tokens(doc.page_content)
+        if used + tokens <= max_tokens:
+            packed.append(doc)
+            used += tokens
+        elif not packed:
+            text = truncate_to_tokens(doc.page_content, max_tokens)
+            packed.append(Document(page_content=text, metadata=dict(doc.metadata)))
+            used += count_tokens(text)
+    return packed
+
+
+class ContextPackingRetriever(BaseRetriever):
+    """Wraps a retriever and packs its results into a token budget.
+
+    ``last_stats`` holds chunk and token counts before and after packing for
+    the most recent query.
+    """
+
+    base_retriever: BaseRetriever
+    max_tokens: int = config.CONTEXT_MAX_TOKENS
+    last_stats: dict = {}
+
+    class Config:
+        arbitrary_types_allowed = True
+
+    def _get_relevant_documents(self, query, *, run_manager=None):
+        documents = self.base_retriever.get_relevant_documents(query)
+        packed = pack_context(documents, self.max_tokens)
+        self.last_stats = {
+            "chunks": len(documents),
+            "packed": len(packed),
+            "tokens_before": sum(count_tokens(d.page_content) for d in documents),
+            "tokens_after": sum(count_tokens(d.page_content) for d in packed),
+        }
+        return packed
@@ -0,0 +1,207 @@
+"""
+Token-budgeted conversation memory for follow-up questions.
+
+The last ``MEMORY_WINDOW_TURNS`` question / answer turns are kept verbatim;
+older turns are folded into a rolling summary written by the chat model.
+Summary and verbatim turns together stay within ``MEMORY_MAX_TOKENS``, so
+the history sent with a question has the same ceiling however long the
+session runs.
+
+``RAGEngine`` uses the history only to rewrite a follow-up ("and on page
+4?") into a standalone question before retrieval. The answer prompt sees
+that standalone question and the retrieved context, never the history, so
+its size does not grow either, and standalone questions can be answered
+from the shared answer cache. Questions with nothing to resolve (no
+pronoun referring back, no elliptical opening) skip the rewrite call, and
+summaries are written on a background thread, so neither model call delays
+an answer that does not need it.
+"""
+
+import re
+import threading
+
+import config
+from token_utils import count_tokens, truncate_to_tokens
+
+SUMMARY_PROMPT = """Progressively summarize the conversation, adding onto the previous summary \
+and returning a new summary. Keep the documents, names, numbers and open questions the user \
+may refer back to. Use at most {max_words} words.
+
+Current summary:
+{summary}
+
+New lines of conversation:
+{lines}
+
+New summary:"""
+
+# Words that point back into the conversation
+_REFERRING = re.compile(
+    r"\b(it|its|itself|they|them|their|theirs|this|that|these|those|he|him|his|she|her|"
+    r"there|then|same|former|latter|above|previous|earlier|else|one|ones|also)\b",
+    re.IGNORECASE,
+)
+# Openings of a question that only makes sense as a continuation
+_ELLIPTICAL = re.compile(r"^\s*(and|or|but|so|what about|how about|why not|and if)\b",
+                         re.IGNORECASE)
+FRAGMENT_WORDS = 3  # Questions this short are taken as fragments ("page 4?")
+
+CONDENSE_PROMPT = """Given the conversation below and a follow-up question, rephrase the \
+follow-up question to be a standalone question that can be understood without the \
+conversation. If it already is one, return it unchanged. Return only the question.
+
+{history}
+
+Follow-up question: {question}
+Standalone question:"""
+
+
+def _text(message):
+    return getattr(message, "content", message).strip()
+
+
+def needs_context(question):
+    """Whether ``question`` may depend on the conversation (pronoun, ellipsis, fragment)"""
+    return bool(_REFERRING.search(question) or _ELLIPTICAL.match(question)
+                or len(question.split()) <= FRAGMENT_WORDS)
+
+
+def _tail_to_tokens(text, max_tokens):
+    """The most recent lines of ``text`` that fit in ``max_tokens`` tokens"""
+    while count_tokens(text) > max_tokens and "\n" in text:
+        text = text.split("\n", 1)[1]
+    return truncate_to_tokens(text, max_tokens)
+
+
+class ConversationMemory:
+    """Recent turns verbatim plus a rolling summary of older ones, within a token budget"""
+
+    def __init__(self, window_turns=None, max_tokens=None, summary_tokens=None):
+        self.window_turns = window_turns or config.MEMORY_WINDOW_TURNS
+        self.max_tokens = max_tokens or config.MEMORY_MAX_TOKENS
+        self.summary_tokens = summary_tokens or config.MEMORY_SUMMARY_TOKENS
+        self.summary = ""
+        self.turns = []  # (text, tokens), oldest first
+        self.summarized_turns = 0
+        self._lock = threading.Lock()
+        # Serializes folds; the model is called holding only this, so readers
+        # (history, standalone_question) never wait for it
+        self._fold_lock = threading.Lock()
+        self._generation = 0  # bumped by clear(), so a fold started before it is dropped
+        self._folder = None  # background thread folding turns while there are any to fold
+
+    @property
+    def empty(self):
+        return not self.turns and not self.summary
+
+    def clear(self):
+        with self._lock:
+            self.summary = ""
+            self.turns = []
+            self.summarized_turns = 0
+            self._generation += 1
+
+    def add_turn(self, question, answer, llm=None):
+        """Record a turn; the oldest turns over the window or budget go into the summary.
+
+        With a model the summary is written on a background thread (see
+        ``wait``); folded turns stay in the history until it replaces them.
+        """
+        text = truncate_to_tokens(f"Human: {question}\nAssistant: {answer}", self._turn_budget)
+        with self._lock:
+            self.turns.append((text, count_tokens(text)))
+            if llm is None or self._folder is not None:
+                # A running folder picks up the new turn before it stops
+                folder = None
+            else:
+                folder = self._folder = threading.Thread(
+                    target=self._fold_pending, args=(llm,), name="memory-fold", daemon=True)
+        if folder is not None:
+            folder.start()
+        elif llm is None:
+            self._fold(None)
+
+    @property
+    def _turn_budget(self):
+        return self.max_tokens - self.summary_tokens
+
+    def _fold_pending(self, llm):
+        try:
+            while self._fold(llm, stop_when_done=True):
+                pass
+        except BaseException:
+            with self._lock:
+                self._folder = None
+            raise
+
+    def _fold(self, llm, stop_when_done=False):
+        """Fold the turns over the window or budget into the summary; False if there were none"""
+        with self._fold_lock:
+            with self._lock:
+                folded = self._turns_to_fold(self._turn_budget)
+                summary, generation = self.summary, self._generation
+                if not folded:
+                    if stop_when_done:
+                        self._folder = None
+                    return False
+            summary = self._summarize(summary, "\n".join(folded), llm)
+            with self._lock:
+                if self._generation == generation:
+                    del self.turns[:len(folded)]
+                    self.summary = summary
+                    self.summarized_turns += len(folded)
+            return True
+
+    def wait(self, timeout=None):
+        """Wait for a background summary to finish"""
+        folder = self._folder
+        if folder is not None:
+            folder.join(timeout)
+
+    def _turns_to_fold(self, turn_budget):
+        """Texts of the oldest turns beyond the window or the token budget"""
+        kept = len(self.turns)
+        kept_tokens = sum(tokens for _, tokens in self.turns)
+        while kept > 1 and (kept > self.window_turns or kept_tokens > turn_budget):
+            kept_tokens -= self.turns[len(self.turns) - kept][1]
+            kept -= 1
+        return [text for text, _ in self.turns[:len(self.turns) - kept]]
+
+    def _summarize(self, summary, lines, llm):
+        if llm is not None:
+            try:
+                prompt = SUMMARY_PROMPT.format(summary=summary or "(none)", lines=lines,
+                                               max_words=self.summary_tokens * 3 // 4)
+                return truncate_to_tokens(_text(llm.invoke(prompt)), self.summary_tokens)
+            except Exception:
+                pass
+        # Without a model, keep the most recent lines that fit
+        return _tail_to_tokens(f"{summary}\n{lines}".strip(), self.summary_tokens)
+
+    def history(self):
+        """Summary and recent turns as prompt text"""
+        with self._lock:
+            parts = [f"Summary of the earlier conversation:\n{self.summary}"] if self.summary else []
+            parts.extend(text for text, _ in self.turns)
+        return "\n\n".join(parts)
+
+    def standalone_question(self, question, llm):
+        """``question`` rewritten to stand on its own, given the conversation so far"""
+        if self.empty or llm is None or not needs_context(question):
+            return question
+        try:
+            rewritten = _text(llm.invoke(CONDENSE_PROMPT.format(history=self.history(),
+                                                                 question=question)))
+        except Exception:
+            # Retrieval on the literal question beats failing the question
+            return question
+        return rewritten or question
+
+    def stats(self):
+        with self._lock:
+            return {
+                "turns": len(self.turns),
+                "summarized_turns": self.summarized_turns,
+                "tokens": count_tokens(self.summary) + sum(tokens for _, tokens in self.turns),
+                "max_tokens": self.max_tokens,
+            }
@@ -0,0 +1,255 @@
+"""
+Persistent on-disk embedding cache that wraps any LangChain embeddings backend.
+
+Vectors are stored in SQLite keyed by (embedding model/deployment, hash of the
+normalized text), so identical chunks are only ever embedded once across
+re-ingests, collections and entry points (Streamlit, CLI, notebooks).
+
+``QueryEmbeddingCache`` sits in front of that for questions: a bounded
+in-memory LRU, so a repeated question costs neither a SQLite lookup nor an
+API call, and concurrent misses for the same question share one call.
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from array import array
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from langchain_core.embeddings import Embeddings
+
+import config
+from single_flight import SingleFlight
+
+
+def normalize_text(text):
+    """Normalize unicode and whitespace so trivially different copies share a key"""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def text_hash(text):
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+def embedding_model_name(embeddings):
+    """Best-effort identifier of the model/deployment behind an embeddings object"""
+    for attr in ("deployment", "azure_deployment", "model", "model_name"):
+        value = getattr(embeddings, attr, None)
+        if value:
+            return str(value)
+    return type(embeddings).__name__
+
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings wrapper backed by a size-bounded SQLite cache with LRU eviction"""
+
+    def __init__(self, underlying, model_name=None, cache_path=None, max_entries=None):
+        self.underlying = underlying
+        self.model_name = model_name or embedding_model_name(underlying)
+        self.cache_path = cache_path or config.EMBEDDING_CACHE_PATH
+        self.max_entries = max_entries or config.EMBEDDING_CACHE_MAX_ENTRIES
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(self.cache_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(self.cache_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                text_hash TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (model, text_hash)
+            )"""
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings (last_used)"
+        )
+        self._conn.commit()
+
+    def __getattr__(self, name):
+        # Expose the wrapped backend's attributes (model, deployment, ...)
+        if name == "underlying":
+            raise AttributeError(name)
+        return getattr(self.underlying, name)
+
+    @staticmethod
+    def _pack(vector):
+        return array("f", vector).tobytes()
+
+    @staticmethod
+    def _unpack(blob):
+        values = array("f")
+        values.frombytes(blob)
+        return values.tolist()
+
+    def _lookup(self, hashes):
+        found = {}
+        unique = list(dict.fromkeys(hashes))
+        with self._lock:
+            # Stay well below SQLite's bound-parameter limit
+            for start in range(0, len(unique), 500):
+                batch = unique[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings "
+                    f"WHERE model = ? AND text_hash IN ({placeholders})",
+                    [self.model_name, *batch],
+                ).fetchall()
+                found.update((h, self._unpack(blob)) for h, blob in rows)
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE model = ? AND text_hash = ?",
+                    [(now, self.model_name, h) for h in found],
+                )
+                self._conn.commit()
+        return found
+
+    def _store(self, items):
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, text_hash, vector, last_used) "
+                "VALUES (?, ?, ?, ?)",
+                [(self.model_name, h, self._pack(v), now) for h, v in items],
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+        overflow = count - self.max_entries
+        if overflow > 0:
+            self._conn.execute(
+                "DELETE FROM embeddings WHERE rowid IN "
+                "(SELECT rowid FROM embeddings ORDER BY last_used LIMIT ?)",
+                (overflow,),
+            )
+
+    def embed_documents(self, texts):
+        hashes = [text_hash(t) for t in texts]
+        cached = self._lookup(hashes)
+
+        # Embed each distinct missing text once, even if it repeats in the batch
+        missing = {}
+        for h, t in zip(hashes, texts):
+            if h not in cached and h not in missing:
+                missing[h] = t
+        self.hits += len(texts) - len(missing)
+        self.misses += len(missing)
+
+        if missing:
+            vectors = self.underlying.embed_documents(list(missing.values()))
+            fresh = dict(zip(missing.keys(), vectors))
+            self._store(fresh.items())
+            cached.update(fresh)
+        return [cached[h] for h in hashes]
+
+    def embed_query(self, text):
+        h = text_hash(text)
+        cached = self._lookup([h])
+        if h in cached:
+            self.hits += 1
+            return cached[h]
+        self.misses += 1
+        vector = self.underlying.embed_query(text)
+        self._store([(h, vector)])
+        return vector
+
+    def stats(self):
+        with self._lock:
+            (size,) = self._conn.execute(
+                "SELECT COUNT(*) FROM embeddings WHERE model = ?", (self.model_name,)
+            ).fetchone()
+        total = self.hits + self.misses
+        return {
+            "model": self.model_name,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "entries": size,
+        }
+
+
+@dataclass
+class CacheUse:
+    """``CachedEmbeddings`` hits and misses over one ingest"""
+    hits: int = 0
+    misses: int = 0
+
+    def summary(self):
+        total = self.hits + self.misses
+        return (f"Embedding cache: {self.hits} of {total} texts cached "
+                f"({self.hits / total if total else 0.0:.0%}), {self.misses} embedded")
+
+
+def document_cache(embeddings):
+    """The ``CachedEmbeddings`` among ``embeddings``' wrappers, or None"""
+    while embeddings is not None and not isinstance(embeddings, CachedEmbeddings):
+        embeddings = getattr(embeddings, "underlying", None)
+    return embeddings
+
+
+class QueryEmbeddingCache(Embeddings):
+    """In-memory LRU of query embeddings with single-flight misses"""
+
+    def __init__(self, underlying, max_entries=None):
+        self.underlying = underlying
+        self.max_entries = max_entries or config.QUERY_EMBEDDING_CACHE_SIZE
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # normalized text -> vector
+        self._lock = threading.Lock()
+        self._flights = SingleFlight()
+
+    def __getattr__(self, name):
+        if name == "underlying":
+            raise AttributeError(name)
+        return getattr(self.underlying, name)
+
+    def embed_documents(self, texts):
+        return self.underlying.embed_documents(texts)
+
+    def embed_query(self, text):
+        key = normalize_text(text)
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                # Callers own the list they get back
+                return list(vector)
+            self.misses += 1
+        vector = self._flights.do(key, lambda: self.underlying.embed_query(text))
+        with self._lock:
+            self._entries[key] = vector
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return list(vector)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "coalesced": self._flights.coalesced,
+        }
+
+
+def with_query_cache(embeddings):
+    """``embeddings`` behind a ``QueryEmbeddingCache`` (once)"""
+    if embeddings is None or isinstance(embeddings, QueryEmbeddingCache):
+        return embeddings
+    return QueryEmbeddingCache(embeddings)
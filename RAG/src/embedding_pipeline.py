@@ -0,0 +1,237 @@
+"""
+Concurrent, rate-limit-aware batched embedding for ingestion.
+
+Chunks are grouped into batches by token count, the batches are embedded on a
+thread pool, and every request first takes its share of a tokens-per-minute /
+requests-per-minute budget. Requests rejected with HTTP 429 are retried with
+exponential backoff. Works with any LangChain embeddings object, including
+``fake_models.HashEmbeddings`` for offline runs.
+"""
+
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+from langchain_core.embeddings import Embeddings
+
+import config
+from token_utils import count_tokens
+
+
+def is_rate_limit_error(exc):
+    """True for ``openai.RateLimitError`` and HTTP 429 responses from httpx or requests.
+
+    Only the exception type and status code count: "429" may appear in any
+    message (request ids, token counts), which must not trigger retries.
+    """
+    try:
+        from openai import RateLimitError
+    except ImportError:
+        pass
+    else:
+        if isinstance(exc, RateLimitError):
+            return True
+    status = getattr(exc, "status_code", None)
+    if status is None:
+        status = getattr(getattr(exc, "response", None), "status_code", None)
+    return status == 429
+
+
+def retry_after_seconds(exc):
+    """Server-suggested delay from a Retry-After header, if any"""
+    headers = getattr(getattr(exc, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class RateLimiter:
+    """Token buckets for tokens-per-minute and requests-per-minute budgets"""
+
+    def __init__(self, tokens_per_minute=None, requests_per_minute=None,
+                 clock=time.monotonic, sleep=time.sleep):
+        self.tokens_per_minute = tokens_per_minute
+        self.requests_per_minute = requests_per_minute
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._tokens = float(tokens_per_minute or 0)
+        self._requests = float(requests_per_minute or 0)
+        self._updated = clock()
+
+    def _refill(self, now):
+        elapsed = now - self._updated
+        self._updated = now
+        if self.tokens_per_minute:
+            self._tokens = min(self.tokens_per_minute,
+                               self._tokens + elapsed * self.tokens_per_minute / 60.0)
+        if self.requests_per_minute:
+            self._requests = min(self.requests_per_minute,
+                                 self._requests + elapsed * self.requests_per_minute / 60.0)
+
+    def acquire(self, tokens):
+        """Block until one request of ``tokens`` tokens fits in the budget"""
+        if self.tokens_per_minute:
+            # A single batch may never need more than a full minute of budget
+            tokens = min(tokens, self.tokens_per_minute)
+        while True:
+            with self._lock:
+                self._refill(self._clock())
+                wait = 0.0
+                if self.tokens_per_minute and self._tokens < tokens:
+                    wait = (tokens - self._tokens) * 60.0 / self.tokens_per_minute
+                if self.requests_per_minute and self._requests < 1:
+                    wait = max(wait, (1 - self._requests) * 60.0 / self.requests_per_minute)
+                if wait <= 0:
+                    if self.tokens_per_minute:
+                        self._tokens -= tokens
+                    if self.requests_per_minute:
+                        self._requests -= 1
+                    return
+            self._sleep(wait)
+
+
+@dataclass
+class PipelineStats:
+    chunks: int = 0
+    tokens: int = 0
+    batches: int = 0
+    retries: int = 0
+    seconds: float = 0.0
+
+    @property
+    def chunks_per_second(self):
+        return self.chunks / self.seconds if self.seconds else 0.0
+
+    @property
+    def tokens_per_second(self):
+        return self.tokens / self.seconds if self.seconds else 0.0
+
+    def merge(self, other):
+        self.chunks += other.chunks
+        self.tokens += other.tokens
+        self.batches += other.batches
+        self.retries += other.retries
+        self.seconds += other.seconds
+
+    def summary(self):
+        return (
+            f"Embedded {self.chunks} chunks ({self.tokens} tokens) in {self.batches} batches "
+            f"in {self.seconds:.1f}s: {self.chunks_per_second:.1f} chunks/s, "
+            f"{self.tokens_per_second:.0f} tokens/s, {self.retries} rate-limit retries"
+        )
+
+
+class EmbeddingPipeline:
+    """Embeds texts in token-bounded batches on a thread pool under a rate budget"""
+
+    def __init__(self, embeddings, max_batch_tokens=None, max_batch_size=None,
+                 max_workers=None, tokens_per_minute=None, requests_per_minute=None,
+                 max_retries=6, backoff_base=1.0, backoff_max=60.0,
+                 clock=time.monotonic, sleep=time.sleep):
+        self.embeddings = embeddings
+        self.max_batch_tokens = max_batch_tokens or config.EMBEDDING_BATCH_TOKENS
+        self.max_batch_size = max_batch_size or config.EMBEDDING_BATCH_SIZE
+        self.max_workers = max_workers or config.EMBEDDING_MAX_WORKERS
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._sleep = sleep
+        self.rate_limiter = RateLimiter(
+            tokens_per_minute or config.EMBEDDING_TOKENS_PER_MINUTE,
+            requests_per_minute or config.EMBEDDING_REQUESTS_PER_MINUTE,
+            clock=clock, sleep=sleep,
+        )
+        self._stats_lock = threading.Lock()
+
+    def make_batches(self, texts):
+        """Group text indices into batches bounded by token count and size"""
+        batches = []
+        current, current_tokens = [], 0
+        for i, text in enumerate(texts):
+            tokens = count_tokens(text)
+            if current and (current_tokens + tokens > self.max_batch_tokens
+                            or len(current) >= self.max_batch_size):
+                batches.append((current, current_tokens))
+                current, current_tokens = [], 0
+            current.append(i)
+            current_tokens += tokens
+        if current:
+            batches.append((current, current_tokens))
+        return batches
+
+    def _embed_batch(self, texts, tokens, stats):
+        attempt = 0
+        while True:
+            self.rate_limiter.acquire(tokens)
+            try:
+                return self.embeddings.embed_documents(texts)
+            except Exception as e:
+                if not is_rate_limit_error(e) or attempt >= self.max_retries:
+                    raise
+                delay = retry_after_seconds(e)
+                if delay is None:
+                    delay = min(self.backoff_max, self.backoff_base * 2 ** attempt)
+                    delay *= 0.5 + random.random() / 2
+                attempt += 1
+                with self._stats_lock:
+                    stats.retries += 1
+                self._sleep(delay)
+
+    def embed(self, texts):
+        """Return ``(vectors, stats)`` with vectors in the same order as ``texts``"""
+        stats = PipelineStats(chunks=len(texts))
+        start = time.perf_counter()
+        batches = self.make_batches(texts)
+        stats.batches = len(batches)
+        stats.tokens = sum(tokens for _, tokens in batches)
+
+        vectors = [None] * len(texts)
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = [
+                (indices, executor.submit(
+                    self._embed_batch, [texts[i] for i in indices], tokens, stats))
+                for indices, tokens in batches
+            ]
+            for indices, future in futures:
+                for i, vector in zip(indices, future.result()):
+                    vectors[i] = vector
+
+        stats.seconds = time.perf_counter() - start
+        return vectors, stats
+
+
+class PipelinedEmbeddings(Embeddings):
+    """Embeddings wrapper that routes document embedding through EmbeddingPipeline.
+
+    Drop-in for vector stores: ``Chroma.add_documents`` calls
+    ``embed_documents`` with every chunk at once, which this fans out into
+    concurrent batches. Queries go straight to the wrapped backend.
+    """
+
+    def __init__(self, underlying, **pipeline_kwargs):
+        self.underlying = underlying
+        self.pipeline = EmbeddingPipeline(underlying, **pipeline_kwargs)
+        self.pipeline_stats = PipelineStats()
+
+    def __getattr__(self, name):
+        # Expose the wrapped backend's attributes (model, deployment, ...)
+        if name == "underlying":
+            raise AttributeError(name)
+        return getattr(self.underlying, name)
+
+    def reset_pipeline_stats(self):
+        self.pipeline_stats = PipelineStats()
+
+    def embed_documents(self, texts):
+        if not texts:
+            return []
+        vectors, stats = self.pipeline.embed(list(texts))
+        self.pipeline_stats.merge(stats)
+        return vectors
+
+    def embed_query(self, text):
+        return self.underlying.embed_query(text)
@@ -0,0 +1,90 @@
+"""
+Process-wide registry of shared RAG engines.
+
+Streamlit runs every browser session in the same process, but anything kept
+in ``st.session_state`` is per session. Engines (embeddings client, vector
+store handle, LLM client, QA chain, answer cache) are instead kept here,
+keyed by the provider / corpus configuration and reference-counted, so 50
+sessions on the same corpus share one engine while each keeps its own chat
+history. Sessions in different tenants get different engines.
+"""
+
+import hashlib
+import threading
+import weakref
+
+import config
+
+
+def engine_key(provider, model=None, embedding_model=None, endpoint=None, api_key=None,
+               tenant=None):
+    """Identity of an engine: provider settings plus the (tenant's) index it serves.
+
+    The API key is part of the identity (users must not spend each other's
+    quota) but only a hash of it is kept.
+    """
+    key_hash = hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:16] if api_key else None
+    index = (config.VECTOR_BACKEND, config.PERSIST_DIRECTORY, config.COLLECTION_NAME,
+             config.NATIVE_INDEX_DIRECTORY, tenant)
+    return (provider, endpoint, model, embedding_model, key_hash) + index
+
+
+class SessionHandle:
+    """One session's reference to a shared engine; released when dropped or closed"""
+
+    def __init__(self, registry, key, engine):
+        self.key = key
+        self.engine = engine
+        self._finalizer = weakref.finalize(self, registry.release, key)
+
+    def close(self):
+        self._finalizer()
+
+
+class EngineRegistry:
+    """Reference-counted engines keyed by configuration"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._engines = {}  # key -> [engine, refcount]
+        self._creating = {}  # key -> Lock, so one slow factory does not block other keys
+
+    def acquire(self, key, factory):
+        """Return a ``SessionHandle`` for the engine under ``key``, creating it if needed"""
+        with self._lock:
+            creating = self._creating.setdefault(key, threading.Lock())
+        with creating:
+            with self._lock:
+                entry = self._engines.get(key)
+                if entry is not None:
+                    entry[1] += 1
+                    self._creating.pop(key, None)
+                    return SessionHandle(self, key, entry[0])
+            engine = factory()
+            with self._lock:
+                self._engines[key] = [engine, 1]
+                self._creating.pop(key, None)
+            return SessionHandle(self, key, engine)
+
+    def release(self, key):
+        with self._lock:
+            entry = self._engines.get(key)
+            if entry is None:
+                return
+            entry[1] -= 1
+            if entry[1] <= 0:
+                del self._engines[key]
+
+    def refcount(self, key):
+        with self._lock:
+            entry = self._engines.get(key)
+            return entry[1] if entry else 0
+
+    def stats(self):
+        with self._lock:
+            return {"engines": len(self._engines),
+                    "sessions": sum(count for _, count in self._engines.values())}
+
+
+# Module state survives Streamlit reruns and is shared by all sessions
+registry = EngineRegistry()
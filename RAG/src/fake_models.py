@@ -0,0 +1,89 @@
+"""
+Deterministic in-process stand-ins for the OpenAI/Azure models.
+
+Useful for exercising ingestion and retrieval code without network access or
+API keys: the same text always yields the same vector, so results are
+reproducible across runs and machines.
+"""
+
+import hashlib
+import math
+import re
+import time
+
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+_WORD_RE = re.compile(r"\w+")
+
+
+class HashEmbeddings(Embeddings):
+    """Bag-of-words embeddings built from hashed tokens.
+
+    Texts that share words get similar vectors, which keeps retrieval results
+    meaningful. ``latency`` (seconds per call) simulates a remote API.
+    """
+
+    def __init__(self, size=1536, latency=0.0):
+        self.size = size
+        self.latency = latency
+        self.model = f"hash-embeddings-{size}"
+        self.calls = 0
+
+    def _embed(self, text):
+        vector = [0.0] * self.size
+        for word in _WORD_RE.findall(text.lower()):
+            digest = hashlib.md5(word.encode("utf-8")).digest()
+            index = int.from_bytes(digest[:4], "little") % self.size
+            vector[index] += 1.0 if digest[4] & 1 else -1.0
+        norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+        return [v / norm for v in vector]
+
+    def embed_documents(self, texts):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        return [self._embed(t) for t in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+class CannedChatModel(BaseChatModel):
+    """Chat model that answers every prompt with the same text.
+
+    The answer is streamed word by word. ``latency`` (seconds before the
+    first token) and ``token_latency`` (seconds per token) simulate a
+    remote model; ``calls`` counts requests.
+    """
+
+    response: str = "This is a canned answer based on the retrieved context."
+    latency: float = 0.0
+    token_latency: float = 0.0
+    calls: int = 0
+
+    @property
+    def _llm_type(self):
+        return "canned"
+
+    def _tokens(self):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        for token in re.findall(r"\S+\s*", self.response):
+            if self.token_latency:
+                time.sleep(self.token_latency)
+            yield token
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        text = "".join(self._tokens())
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text))])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        for token in self._tokens():
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token))
+            if run_manager:
+                run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
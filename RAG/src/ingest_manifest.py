@@ -0,0 +1,152 @@
+"""
+Ingest manifest for incremental re-indexing of a PDF directory.
+
+The manifest records, for every indexed PDF, its content hash, size, mtime and
+the IDs of the chunks it produced in the vector store. Diffing a directory
+against it tells us which files are new, modified, unchanged or removed, so
+only the changed ones need to be split and embedded again.
+"""
+
+import hashlib
+import json
+import os
+from dataclasses import dataclass, field
+
+MANIFEST_VERSION = 1
+
+
+def file_sha256(path, block_size=1 << 20):
+    """Return the hex SHA-256 of a file's contents"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def chunk_ids_for(path, sha256, count, start=0):
+    """Deterministic chunk IDs for a file version (path + content hash)"""
+    prefix = hashlib.sha1(f"{path}:{sha256}".encode("utf-8")).hexdigest()[:16]
+    return [f"{prefix}-{i}" for i in range(start, start + count)]
+
+
+@dataclass
+class FileState:
+    path: str
+    sha256: str
+    mtime: float
+    size: int
+    chunk_ids: list = field(default_factory=list)
+
+
+@dataclass
+class ManifestDiff:
+    added: list = field(default_factory=list)      # FileState, not yet indexed
+    modified: list = field(default_factory=list)   # FileState with new hash
+    unchanged: list = field(default_factory=list)  # FileState as recorded
+    removed: list = field(default_factory=list)    # FileState as recorded
+
+    @property
+    def to_index(self):
+        return self.added + self.modified
+
+    @property
+    def has_changes(self):
+        return bool(self.added or self.modified or self.removed)
+
+
+class IngestManifest:
+    """JSON manifest of indexed files, stored alongside the vector store"""
+
+    def __init__(self, path):
+        self.path = path
+        self.files = {}
+        self.load()
+
+    @staticmethod
+    def key(path):
+        return os.path.abspath(path)
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("version") != MANIFEST_VERSION:
+            return
+        self.files = {
+            path: FileState(path=path, **state)
+            for path, state in data.get("files", {}).items()
+        }
+
+    def save(self):
+        """Write the manifest atomically so an interrupted ingest never corrupts it"""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        data = {
+            "version": MANIFEST_VERSION,
+            "files": {
+                path: {
+                    "sha256": state.sha256,
+                    "mtime": state.mtime,
+                    "size": state.size,
+                    "chunk_ids": state.chunk_ids,
+                }
+                for path, state in sorted(self.files.items())
+            },
+        }
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=1)
+        os.replace(tmp_path, self.path)
+
+    def diff(self, directory, pdf_paths):
+        """Compare files on disk with the manifest.
+
+        Files whose size and mtime match the manifest are treated as unchanged
+        without being hashed; everything else is hashed so that a touched but
+        identical file is not re-embedded. Only manifest entries located under
+        ``directory`` can be reported as removed.
+        """
+        result = ManifestDiff()
+        seen = set()
+        for pdf_path in pdf_paths:
+            path = self.key(pdf_path)
+            seen.add(path)
+            stat = os.stat(path)
+            recorded = self.files.get(path)
+            if recorded and recorded.size == stat.st_size and recorded.mtime == stat.st_mtime:
+                result.unchanged.append(recorded)
+                continue
+
+            current = FileState(path, file_sha256(path), stat.st_mtime, stat.st_size)
+            if recorded is None:
+                result.added.append(current)
+            elif recorded.sha256 == current.sha256:
+                recorded.mtime = current.mtime
+                result.unchanged.append(recorded)
+            else:
+                result.modified.append(current)
+
+        root = os.path.join(self.key(directory), "")
+        for path, recorded in self.files.items():
+            if path.startswith(root) and path not in seen:
+                result.removed.append(recorded)
+        return result
+
+    def stale_chunk_ids(self, diff):
+        """Chunk IDs that must be deleted before applying ``diff``"""
+        ids = []
+        for state in diff.modified + diff.removed:
+            recorded = self.files.get(state.path)
+            if recorded:
+                ids.extend(recorded.chunk_ids)
+        return ids
+
+    def record(self, state, chunk_ids):
+        state.chunk_ids = list(chunk_ids)
+        self.files[state.path] = state
+
+    def forget(self, path):
+        return self.files.pop(self.key(path), None)
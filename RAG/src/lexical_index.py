@@ -0,0 +1,478 @@
+"""
+In-process BM25 inverted index and hybrid (lexical + vector) retrieval.
+
+Vector search misses exact-term queries such as drug names or figure numbers.
+This index is built alongside the vector store during ingestion and fused
+with vector results by reciprocal-rank fusion (RRF).
+
+Postings are compact: per term, document numbers are delta-encoded into the
+narrowest unsigned dtype that fits (uint8/16/32) with term frequencies in a
+parallel uint16 array. Queries decode postings with ``np.cumsum``, score
+them with vectorized BM25 and sum scores over the posting hits only, so a
+query costs O(hits), not O(corpus).
+
+A ``MetadataFilter`` is checked against per-document source / page /
+ingest-time arrays for the posting hits; hits outside it are dropped before
+they are scored.
+
+The index keeps no chunk texts: hits are fetched from the vector store by
+chunk id, which already holds them, so neither memory nor the saved index
+carries a second copy of the corpus.
+"""
+
+import os
+import pickle
+import re
+import threading
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+import config
+from metadata_filter import INGESTED_AT
+
+INDEX_VERSION = 2
+READABLE_VERSIONS = (1, INDEX_VERSION)  # version 1 also stored texts, ignored on load
+# Python object overhead estimates for memory_bytes (dict entry + _Postings + arrays,
+# and id / metadata objects per document)
+_TERM_OVERHEAD = 300
+_DOC_OVERHEAD = 400
+
+_TOKEN_RE = re.compile(r"\w+(?:[.-]\w+)*")
+STOPWORDS = frozenset(
+    "a an and are as at be but by for from has have if in into is it its of on or "
+    "that the their then there these they this to was were what when where which "
+    "who why will with how does do did can about".split()
+)
+
+
+class LexicalIndexError(ValueError):
+    """A saved lexical index that cannot be loaded"""
+
+
+def _number(value):
+    return float(value) if isinstance(value, (int, float)) else np.nan
+
+
+def tokenize(text):
+    """Lowercased word tokens; keeps dotted/hyphenated terms like "3.2" or "covid-19" whole"""
+    return [t for t in _TOKEN_RE.findall(text.lower()) if t not in STOPWORDS]
+
+
+_UINT_LIMITS = [(np.uint8, 0xFF), (np.uint16, 0xFFFF), (np.uint32, 0xFFFFFFFF)]
+
+
+def _narrowest_uint(max_value):
+    for dtype, limit in _UINT_LIMITS:
+        if max_value <= limit:
+            return dtype
+    return np.uint64
+
+
+class _GrowableArray:
+    """Append-only 1-D array with capacity doubling, so appends copy O(n) in total"""
+
+    __slots__ = ("buffer", "size")
+
+    def __init__(self, values):
+        self.buffer = np.asarray(values)
+        self.size = len(self.buffer)
+
+    @property
+    def values(self):
+        """The filled part, as a view"""
+        return self.buffer[:self.size]
+
+    def extend(self, values):
+        values = np.asarray(values)
+        dtype = np.promote_types(self.buffer.dtype, values.dtype)
+        end = self.size + len(values)
+        if end > len(self.buffer) or dtype != self.buffer.dtype:
+            grown = np.empty(max(end, 2 * len(self.buffer)), dtype=dtype)
+            grown[:self.size] = self.buffer[:self.size]
+            self.buffer = grown
+        self.buffer[self.size:end] = values
+        self.size = end
+
+
+class _Column:
+    """Attribute stored as a ``_GrowableArray``; reads give its filled part"""
+
+    def __set_name__(self, owner, name):
+        self.name = "_" + name
+
+    def __get__(self, obj, owner=None):
+        return self if obj is None else getattr(obj, self.name).values
+
+    def __set__(self, obj, values):
+        setattr(obj, self.name, _GrowableArray(values))
+
+    def extend(self, obj, values):
+        getattr(obj, self.name).extend(values)
+
+    def nbytes(self, obj):
+        return getattr(obj, self.name).buffer.nbytes
+
+
+class _Postings:
+    """Delta-encoded document numbers and term frequencies for one term"""
+
+    __slots__ = ("_deltas", "_tfs", "last_doc")
+
+    deltas = _Column()
+    tfs = _Column()
+
+    def __init__(self, deltas=None, tfs=None, last_doc=-1):
+        self.deltas = np.zeros(0, dtype=np.uint8) if deltas is None else deltas
+        self.tfs = np.zeros(0, dtype=np.uint16) if tfs is None else tfs
+        self.last_doc = last_doc
+
+    @property
+    def nbytes(self):
+        return _Postings.deltas.nbytes(self) + _Postings.tfs.nbytes(self)
+
+    def extend(self, doc_numbers, tfs):
+        doc_numbers = np.asarray(doc_numbers, dtype=np.int64)
+        deltas = np.empty_like(doc_numbers)
+        deltas[0] = doc_numbers[0] - max(self.last_doc, 0)
+        np.subtract(doc_numbers[1:], doc_numbers[:-1], out=deltas[1:])
+        _Postings.deltas.extend(self, deltas.astype(_narrowest_uint(int(deltas.max()))))
+        _Postings.tfs.extend(self, np.minimum(tfs, 0xFFFF).astype(np.uint16))
+        self.last_doc = int(doc_numbers[-1])
+
+    def doc_numbers(self):
+        return np.cumsum(self.deltas, dtype=np.int64)
+
+
+class LexicalIndex:
+    """Append-only BM25 index with tombstone deletes and periodic compaction"""
+
+    # Per-document arrays, grown in place as batches are added
+    doc_lengths = _Column()
+    alive = _Column()
+    doc_sources = _Column()
+    pages = _Column()
+    ingested = _Column()
+
+    def __init__(self, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.RLock()
+        self._reset()
+
+    def _reset(self):
+        self.postings = {}       # term -> _Postings
+        self.ids = []            # doc number -> chunk id
+        self.metadatas = []      # doc number -> chunk metadata
+        self.doc_lengths = np.zeros(0, dtype=np.uint32)
+        self.alive = np.zeros(0, dtype=bool)
+        self.id_to_doc = {}
+        self.total_length = 0
+        self._norms = None       # cached BM25 length normalization per doc
+        # Secondary index for metadata filters
+        self.source_codes = {}   # source -> code
+        self.doc_sources = np.zeros(0, dtype=np.int32)  # doc number -> source code
+        self.pages = np.zeros(0)           # doc number -> page, NaN if unknown
+        self.ingested = np.zeros(0)        # doc number -> ingested_at, NaN if unknown
+
+    def __len__(self):
+        return len(self.id_to_doc)
+
+    def memory_bytes(self):
+        """Rough in-memory size: postings and per-document bookkeeping"""
+        with self._lock:
+            postings = sum(p.nbytes for p in self.postings.values())
+            columns = sum(column.nbytes(self) for column in (
+                LexicalIndex.doc_lengths, LexicalIndex.alive, LexicalIndex.doc_sources,
+                LexicalIndex.pages, LexicalIndex.ingested,
+            ))
+            return (postings + columns
+                    + _TERM_OVERHEAD * len(self.postings) + _DOC_OVERHEAD * len(self.ids)
+                    + 8 * len(self.ids))
+
+    def add(self, ids, texts, metadatas=None):
+        metadatas = metadatas or [{} for _ in texts]
+        with self._lock:
+            stale = [i for i in ids if i in self.id_to_doc]
+            if stale:
+                self.delete(stale)
+
+            start = len(self.ids)
+            new_postings = {}
+            lengths = []
+            for offset, text in enumerate(texts):
+                tokens = tokenize(text)
+                lengths.append(len(tokens))
+                counts = {}
+                for token in tokens:
+                    counts[token] = counts.get(token, 0) + 1
+                for term, tf in counts.items():
+                    docs, tfs = new_postings.setdefault(term, ([], []))
+                    docs.append(start + offset)
+                    tfs.append(tf)
+
+            for term, (docs, tfs) in new_postings.items():
+                postings = self.postings.get(term)
+                if postings is None:
+                    postings = self.postings[term] = _Postings()
+                postings.extend(docs, tfs)
+
+            for offset, chunk_id in enumerate(ids):
+                self.id_to_doc[chunk_id] = start + offset
+            self.ids.extend(ids)
+            self.metadatas.extend(dict(m) for m in metadatas)
+            LexicalIndex.doc_lengths.extend(self, np.asarray(lengths, dtype=np.uint32))
+            LexicalIndex.alive.extend(self, np.ones(len(texts), dtype=bool))
+            self.total_length += sum(lengths)
+            self._norms = None
+            self._index_metadata(start)
+
+    def _index_metadata(self, start):
+        """Extend the filter index with documents ``start`` onwards"""
+        added = self.metadatas[start:]
+        codes = [self.source_codes.setdefault(m.get("source"), len(self.source_codes))
+                 for m in added]
+        LexicalIndex.doc_sources.extend(self, np.asarray(codes, dtype=np.int32))
+        LexicalIndex.pages.extend(self, np.asarray([_number(m.get("page")) for m in added],
+                                                   dtype=np.float64))
+        LexicalIndex.ingested.extend(self, np.asarray(
+            [_number(m.get(INGESTED_AT)) for m in added], dtype=np.float64
+        ))
+
+    def sources(self):
+        """Sources that still have live documents, sorted"""
+        with self._lock:
+            live = set(np.unique(self.doc_sources[self.alive]).tolist())
+            return sorted(source for source, code in self.source_codes.items()
+                          if source is not None and code in live)
+
+    def filter_mask(self, metadata_filter, docs):
+        """Boolean mask over ``docs`` (doc numbers) of those passing ``metadata_filter``"""
+        with self._lock:
+            mask = np.ones(len(docs), dtype=bool)
+            if metadata_filter.sources:
+                codes = [self.source_codes[source] for source in metadata_filter.sources
+                         if source in self.source_codes]
+                mask &= np.isin(self.doc_sources[docs], codes)
+            columns = {"page": self.pages, INGESTED_AT: self.ingested}
+            for key, low, high in metadata_filter._ranges():
+                values = columns[key][docs]
+                # NaN (unknown) fails both comparisons
+                if low is not None:
+                    mask &= values >= low
+                if high is not None:
+                    mask &= values <= high
+            return mask
+
+    def add_documents(self, documents, ids):
+        self.add(ids, [d.page_content for d in documents], [d.metadata for d in documents])
+
+    def delete(self, ids):
+        with self._lock:
+            for chunk_id in ids:
+                doc = self.id_to_doc.pop(chunk_id, None)
+                if doc is not None:
+                    self.alive[doc] = False
+                    self.total_length -= int(self.doc_lengths[doc])
+                    self._norms = None
+            dead = len(self.ids) - len(self.id_to_doc)
+            if dead and dead > 0.3 * len(self.ids):
+                self.compact()
+
+    def compact(self):
+        """Rebuild postings without deleted documents, renumbering the live ones"""
+        with self._lock:
+            live = np.flatnonzero(self.alive)
+            renumber = np.cumsum(self.alive, dtype=np.int64) - 1  # old -> new doc number
+            postings = {}
+            for term, old in self.postings.items():
+                docs = old.doc_numbers()
+                keep = self.alive[docs]
+                if keep.any():
+                    postings[term] = _Postings()
+                    postings[term].extend(renumber[docs[keep]], old.tfs[keep])
+            ids = [self.ids[i] for i in live]
+            metadatas = [self.metadatas[i] for i in live]
+            doc_lengths = self.doc_lengths[live]
+            self._reset()
+            self.postings = postings
+            self._restore(ids, metadatas, doc_lengths, np.ones(len(ids), dtype=bool))
+
+    def _restore(self, ids, metadatas, doc_lengths, alive):
+        """Set the per-document state; postings are already in place"""
+        self.ids = ids
+        self.metadatas = metadatas
+        self.doc_lengths = doc_lengths
+        self.alive = alive
+        self.id_to_doc = {chunk_id: doc for doc, chunk_id in enumerate(ids) if alive[doc]}
+        self.total_length = int(doc_lengths[alive].sum())
+        self._index_metadata(0)
+
+    def search(self, query, k=4, filter=None):
+        """Return ``[(chunk_id, score)]`` for the top ``k`` BM25 matches.
+
+        ``filter`` is a ``MetadataFilter``; documents outside it are never scored.
+        """
+        with self._lock:
+            terms = set(tokenize(query))
+            n_docs = len(self.id_to_doc)
+            if not terms or not n_docs:
+                return []
+            filtered = filter is not None and not filter.empty
+            if self._norms is None:
+                avg_length = self.total_length / n_docs or 1.0
+                self._norms = (
+                    self.k1 * (1.0 - self.b + self.b * self.doc_lengths / avg_length)
+                ).astype(np.float32)
+
+            doc_parts, score_parts = [], []
+            for term in terms:
+                postings = self.postings.get(term)
+                if postings is None:
+                    continue
+                docs = postings.doc_numbers()
+                tfs = postings.tfs
+                df = len(docs)
+                idf = np.float32(np.log(1.0 + (n_docs - df + 0.5) / (df + 0.5)))
+                if filtered:
+                    keep = self.filter_mask(filter, docs)
+                    docs, tfs = docs[keep], tfs[keep]
+                tfs = tfs.astype(np.float32)
+                doc_parts.append(docs)
+                score_parts.append(idf * tfs * np.float32(self.k1 + 1.0) / (tfs + self._norms[docs]))
+            if not doc_parts:
+                return []
+
+            if len(doc_parts) == 1:
+                docs, scores = doc_parts[0], score_parts[0]
+            else:
+                # Sum per document over the hits only; no corpus-sized accumulator
+                docs, slots = np.unique(np.concatenate(doc_parts), return_inverse=True)
+                scores = np.bincount(slots, weights=np.concatenate(score_parts),
+                                     minlength=len(docs)).astype(np.float32)
+            keep = self.alive[docs]
+            docs, scores = docs[keep], scores[keep]
+            if len(docs) > k:
+                top = np.argpartition(-scores, k)[:k]
+                docs, scores = docs[top], scores[top]
+            order = np.argsort(-scores, kind="stable")
+            return [(self.ids[int(docs[i])], float(scores[i])) for i in order]
+
+    def save(self, path):
+        with self._lock:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            state = {
+                "version": INDEX_VERSION,
+                "k1": self.k1,
+                "b": self.b,
+                "terms": list(self.postings),
+                "deltas": [p.deltas for p in self.postings.values()],
+                "tfs": [p.tfs for p in self.postings.values()],
+                "last_docs": [p.last_doc for p in self.postings.values()],
+                "ids": self.ids,
+                "metadatas": self.metadatas,
+                "doc_lengths": self.doc_lengths,
+                "alive": self.alive,
+            }
+            tmp_path = path + ".tmp"
+            with open(tmp_path, "wb") as f:
+                pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as f:
+            state = pickle.load(f)
+        if not isinstance(state, dict) or state.get("version") not in READABLE_VERSIONS:
+            raise LexicalIndexError(f"Unsupported lexical index version in {path}")
+        index = cls(k1=state["k1"], b=state["b"])
+        for term, deltas, tfs, last_doc in zip(
+            state["terms"], state["deltas"], state["tfs"], state["last_docs"]
+        ):
+            index.postings[term] = _Postings(deltas, tfs, last_doc)
+        index._restore(state["ids"], state["metadatas"], state["doc_lengths"], state["alive"])
+        return index
+
+    @classmethod
+    def load_or_create(cls, path):
+        """The index saved at ``path``, or a new one if there is none.
+
+        Raises ``LexicalIndexError`` if the file exists but cannot be read
+        (corrupt, truncated or an unknown version); the caller must then
+        re-index, since an empty index would silently find nothing.
+        """
+        if not os.path.exists(path):
+            return cls()
+        try:
+            return cls.load(path)
+        except (OSError, EOFError, pickle.UnpicklingError, ValueError, KeyError,
+                TypeError, AttributeError) as e:
+            raise LexicalIndexError(f"Cannot read lexical index {path}: {e}") from e
+
+
+_chroma_get_lock = threading.Lock()
+
+
+def documents_by_id(vectorstore, ids):
+    """The chunks ``ids`` from ``vectorstore``, in order; ids it no longer has are skipped"""
+    if not ids:
+        return []
+    if hasattr(vectorstore, "get_by_ids"):
+        return vectorstore.get_by_ids(ids)
+    # Chroma. chromadb 0.4 batches get() telemetry events in an unlocked
+    # dict, and concurrent calls race on it (KeyError), so one at a time
+    with _chroma_get_lock:
+        result = vectorstore.get(ids=list(ids), include=["documents", "metadatas"])
+    found = {
+        chunk_id: Document(page_content=text, metadata=metadata or {})
+        for chunk_id, text, metadata in zip(result["ids"], result["documents"],
+                                            result["metadatas"])
+    }
+    return [found[chunk_id] for chunk_id in ids if chunk_id in found]
+
+
+def _document_key(doc):
+    return (doc.metadata.get("source"), doc.metadata.get("page"), doc.page_content)
+
+
+def reciprocal_rank_fusion(result_lists, k=4, rrf_k=60):
+    """Fuse ranked Document lists: score(d) = sum over lists of 1 / (rrf_k + rank)"""
+    scores = {}
+    documents = {}
+    for results in result_lists:
+        for rank, doc in enumerate(results, start=1):
+            key = _document_key(doc)
+            documents.setdefault(key, doc)
+            scores[key] = scores.get(key, 0.0) + 1.0 / (rrf_k + rank)
+    ranked = sorted(scores, key=scores.get, reverse=True)
+    return [documents[key] for key in ranked[:k]]
+
+
+class HybridRetriever(BaseRetriever):
+    """Vector similarity search fused with BM25 lexical search via RRF
+
+    Lexical hits are fetched from ``vectorstore`` by chunk id.
+    """
+
+    vectorstore: object
+    lexical_index: object
+    k: int = config.RETRIEVAL_K
+    fetch_k: int = config.HYBRID_FETCH_K
+    rrf_k: int = config.RRF_K
+    filter: object = None  # MetadataFilter applied by both searches
+    vector_filter: object = None  # the same filter in the vector store's own form
+
+    class Config:
+        arbitrary_types_allowed = True
+
+    def _get_relevant_documents(self, query, *, run_manager=None):
+        search_kwargs = {} if self.vector_filter is None else {"filter": self.vector_filter}
+        vector_docs = self.vectorstore.similarity_search(query, k=self.fetch_k, **search_kwargs)
+        lexical_docs = documents_by_id(self.vectorstore, [
+            chunk_id for chunk_id, _ in self.lexical_index.search(query, k=self.fetch_k,
+                                                                  filter=self.filter)
+        ])
+        return reciprocal_rank_fusion([vector_docs, lexical_docs], k=self.k, rrf_k=self.rrf_k)
@@ -0,0 +1,127 @@
+"""
+Metadata filters applied before retrieval scoring.
+
+A ``MetadataFilter`` restricts a question to some source files, a page range
+and / or an ingest-date window. Every index resolves it through a secondary
+index before any similarity or BM25 score is computed, so a filtered query
+only scores the chunks it can return:
+
+- native backend: indexed ``source`` / ``page`` / ``ingested_at`` columns in
+  the sidecar SQLite table select the rows to score (``FlatIVFIndex.filter_rows``)
+- Chroma: a ``where`` clause, resolved by Chroma's metadata segment before
+  its HNSW search
+- BM25: per-document source / page / ingest-time arrays, checked for the
+  posting hits (``LexicalIndex.filter_mask``)
+
+Chunks get an ``ingested_at`` timestamp (epoch seconds) when they are
+indexed; chunks indexed before it existed never match a date filter.
+"""
+
+import time
+from dataclasses import dataclass
+from datetime import date, datetime, time as day_time
+
+INGESTED_AT = "ingested_at"  # chunk metadata key, epoch seconds
+
+
+def ingest_timestamp():
+    return int(time.time())
+
+
+def _epoch(value, end_of_day=False):
+    """Epoch seconds for a number, ``date`` or ``datetime``"""
+    if value is None or isinstance(value, (int, float)):
+        return value
+    if isinstance(value, datetime):
+        return int(value.timestamp())
+    if isinstance(value, date):
+        moment = datetime.combine(value, day_time.max if end_of_day else day_time.min)
+        return int(moment.timestamp())
+    raise TypeError(f"Unsupported date value {value!r}")
+
+
+@dataclass(frozen=True)
+class MetadataFilter:
+    """Chunks from ``sources`` (any, if empty), pages and ingest times within the bounds.
+
+    Bounds are inclusive; ``None`` leaves a side open. Dates may be given as
+    ``date`` / ``datetime`` objects or epoch seconds.
+    """
+    sources: tuple = ()
+    page_min: int = None
+    page_max: int = None
+    ingested_after: float = None
+    ingested_before: float = None
+
+    def __post_init__(self):
+        # Normalized so equal filters hash equally (they key the answer cache)
+        sources = (self.sources,) if isinstance(self.sources, str) else self.sources or ()
+        object.__setattr__(self, "sources", tuple(sorted(set(sources))))
+        object.__setattr__(self, "ingested_after", _epoch(self.ingested_after))
+        object.__setattr__(self, "ingested_before", _epoch(self.ingested_before, end_of_day=True))
+
+    @property
+    def empty(self):
+        return not self.sources and all(
+            bound is None for bound in (self.page_min, self.page_max,
+                                        self.ingested_after, self.ingested_before)
+        )
+
+    def matches(self, metadata):
+        """Whether a chunk with ``metadata`` passes the filter"""
+        if self.sources and metadata.get("source") not in self.sources:
+            return False
+        for key, low, high in self._ranges():
+            value = metadata.get(key)
+            if value is None:
+                return False
+            if (low is not None and value < low) or (high is not None and value > high):
+                return False
+        return True
+
+    def _ranges(self):
+        ranges = (("page", self.page_min, self.page_max),
+                  (INGESTED_AT, self.ingested_after, self.ingested_before))
+        return [(key, low, high) for key, low, high in ranges
+                if low is not None or high is not None]
+
+    def chroma_where(self):
+        """The filter as a Chroma ``where`` clause, or ``None`` if it is empty"""
+        clauses = []
+        if self.sources:
+            clauses.append({"source": {"$in": list(self.sources)}})
+        for key, low, high in self._ranges():
+            if low is not None:
+                clauses.append({key: {"$gte": low}})
+            if high is not None:
+                clauses.append({key: {"$lte": high}})
+        if not clauses:
+            return None
+        return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+    def sql_where(self):
+        """``(clause, params)`` over ``source`` / ``page`` / ``ingested_at`` columns"""
+        clauses, params = [], []
+        if self.sources:
+            clauses.append(f"source IN ({','.join('?' * len(self.sources))})")
+            params.extend(self.sources)
+        for key, low, high in self._ranges():
+            if low is not None:
+                clauses.append(f"{key} >= ?")
+                params.append(low)
+            if high is not None:
+                clauses.append(f"{key} <= ?")
+                params.append(high)
+        return " AND ".join(clauses) or "1", params
+
+    def describe(self):
+        parts = []
+        if self.sources:
+            parts.append(", ".join(self.sources))
+        if self.page_min is not None or self.page_max is not None:
+            parts.append(f"pages {'' if self.page_min is None else self.page_min}"
+                         f"-{'' if self.page_max is None else self.page_max}")
+        for label, value in (("since", self.ingested_after), ("until", self.ingested_before)):
+            if value is not None:
+                parts.append(f"ingested {label} {datetime.fromtimestamp(value):%Y-%m-%d}")
+        return "; ".join(parts) or "all documents"
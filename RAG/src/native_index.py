@@ -0,0 +1,595 @@
+"""
+Memory-mapped flat/IVF vector index, an optional alternative to Chroma.
+
+Layout of an index directory:
+
+    vectors.f32       float32 rows, appended in insertion order (memory-mapped)
+    metadata.sqlite3  sidecar table: row -> chunk id, text, metadata, deleted, plus
+                      indexed source / page / ingested_at columns for prefiltering
+    ivf.npz           optional IVF partitioning (k-means centroids + row lists)
+    codes.bin         optional int8 / PQ codes, one fixed-size row per vector
+    quantizer.npz     quantizer parameters for codes.bin
+    hnsw.bin          optional HNSW graph over the rows (labels are row numbers)
+
+Vectors are L2-normalized on insert, so inner product is cosine similarity.
+Small corpora are searched brute-force with one BLAS matrix-vector product;
+large ones use IVF and only scan the ``nprobe`` closest partitions. The file
+is opened read-only via mmap, so many processes share one page-cached copy
+and opening an index costs almost nothing.
+
+Searches with a ``MetadataFilter`` look up the matching rows in SQLite first
+and score only those rows exactly, so the more selective the filter, the
+less work a query does.
+
+With ``config.NATIVE_QUANTIZATION`` set, a compact code is kept per vector
+and queries scan the codes first, re-scoring only the best candidates against
+the float32 rows, so the hot working set is 4x (int8) to 16x+ (PQ) smaller.
+
+With ``config.NATIVE_ANN_INDEX = "hnsw"`` an HNSW graph (hnswlib, installed
+with chromadb) is grown in memory as rows are added and written next to the
+vectors by ``save_hnsw`` (the engine does so at ingest checkpoints); queries
+then visit a few hundred rows instead of a whole partition. Until the saved
+graph covers every row, other processes fall back to IVF / brute force.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import uuid
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.vectorstores import VectorStore
+
+import config
+from metadata_filter import INGESTED_AT
+from quantization import make_quantizer, quantizer_from_state, search_quantized
+
+VECTORS_FILE = "vectors.f32"
+METADATA_FILE = "metadata.sqlite3"
+IVF_FILE = "ivf.npz"
+CODES_FILE = "codes.bin"
+QUANTIZER_FILE = "quantizer.npz"
+HNSW_FILE = "hnsw.bin"
+
+
+def _normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def assign_clusters(vectors, centroids):
+    """Index of the closest centroid per row, scored in blocks of rows so the
+    score matrix stays around 16 MB whatever the corpus and partition count"""
+    block = max(1, (1 << 22) // len(centroids))
+    assignment = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), block):
+        rows = np.asarray(vectors[start:start + block])
+        assignment[start:start + block] = np.argmax(rows @ centroids.T, axis=1)
+    return assignment
+
+
+def spherical_kmeans(vectors, n_clusters, iterations=10, sample_size=None, seed=0):
+    """k-means on unit vectors (cosine); returns unit-norm centroids.
+
+    Trained on a sample of ``64 * n_clusters`` rows (at most 100k), which is
+    plenty to place the centroids.
+    """
+    rng = np.random.default_rng(seed)
+    n = len(vectors)
+    sample_size = min(n, sample_size or min(64 * n_clusters, 100_000))
+    n_clusters = min(n_clusters, sample_size)
+    sample = np.asarray(vectors[np.sort(rng.choice(n, sample_size, replace=False))])
+    centroids = sample[rng.choice(sample_size, n_clusters, replace=False)].copy()
+    for _ in range(iterations):
+        assignment = assign_clusters(sample, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, sample)
+        # Re-seed empty clusters with a random point
+        empty = np.flatnonzero(np.bincount(assignment, minlength=n_clusters) == 0)
+        sums[empty] = sample[rng.integers(sample_size, size=len(empty))]
+        centroids = _normalize(sums)
+    return centroids
+
+
+def _new_hnsw(dim, capacity, m=None, ef_construction=None):
+    try:
+        import hnswlib
+    except ImportError as e:
+        raise ImportError(
+            "NATIVE_ANN_INDEX = 'hnsw' needs hnswlib: pip install chroma-hnswlib"
+        ) from e
+    graph = hnswlib.Index(space="ip", dim=dim)
+    if capacity:
+        graph.init_index(
+            max_elements=capacity,
+            M=m or config.HNSW_M,
+            ef_construction=ef_construction or config.HNSW_EF_CONSTRUCTION,
+        )
+    return graph
+
+
+class FlatIVFIndex:
+    """On-disk vector index with brute-force and IVF search modes"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.RLock()
+        self._db = sqlite3.connect(
+            os.path.join(directory, METADATA_FILE), check_same_thread=False
+        )
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            """CREATE TABLE IF NOT EXISTS chunks (
+                row INTEGER PRIMARY KEY,
+                id TEXT NOT NULL,
+                text TEXT NOT NULL,
+                metadata TEXT NOT NULL,
+                deleted INTEGER NOT NULL DEFAULT 0
+            )"""
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_chunks_id ON chunks (id)")
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS idx_chunks_deleted ON chunks (row) WHERE deleted = 1"
+        )
+        self._add_filter_columns()
+        self._db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self._db.commit()
+        self.vectors = None
+        self.deleted = np.zeros(0, dtype=bool)
+        self.ivf = None
+        self.quantizer = None
+        self.codes = None
+        self.hnsw = None
+        self._hnsw_mtime = None
+        self._hnsw_dirty = False
+        self._ivf_build = None
+        self._mapped_state = None
+        self.refresh()
+
+    def _add_filter_columns(self):
+        """Secondary index for metadata filters; backfilled for indexes built before it"""
+        columns = {name for _, name, *_ in self._db.execute("PRAGMA table_info(chunks)")}
+        if "source" not in columns:
+            self._db.execute("ALTER TABLE chunks ADD COLUMN source TEXT")
+            self._db.execute("ALTER TABLE chunks ADD COLUMN page INTEGER")
+            self._db.execute(f"ALTER TABLE chunks ADD COLUMN {INGESTED_AT} INTEGER")
+            self._db.execute(
+                f"""UPDATE chunks SET source = json_extract(metadata, '$.source'),
+                    page = json_extract(metadata, '$.page'),
+                    {INGESTED_AT} = json_extract(metadata, '$.{INGESTED_AT}')"""
+            )
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS idx_chunks_source_page ON chunks (source, page) "
+            "WHERE deleted = 0"
+        )
+        self._db.execute(
+            f"CREATE INDEX IF NOT EXISTS idx_chunks_{INGESTED_AT} ON chunks ({INGESTED_AT}) "
+            "WHERE deleted = 0"
+        )
+
+    @property
+    def dim(self):
+        row = self._db.execute("SELECT value FROM meta WHERE key = 'dim'").fetchone()
+        return int(row[0]) if row else None
+
+    def __len__(self):
+        return 0 if self.vectors is None else len(self.vectors) - int(self.deleted.sum())
+
+    def refresh(self):
+        """Re-map the vector file if another process appended to it"""
+        path = os.path.join(self.directory, VECTORS_FILE)
+        ivf_path = os.path.join(self.directory, IVF_FILE)
+        size = os.path.getsize(path) if os.path.exists(path) else 0
+        ivf_mtime = os.path.getmtime(ivf_path) if os.path.exists(ivf_path) else None
+        codes_path = os.path.join(self.directory, CODES_FILE)
+        codes_size = os.path.getsize(codes_path) if os.path.exists(codes_path) else 0
+        hnsw_path = os.path.join(self.directory, HNSW_FILE)
+        hnsw_mtime = os.path.getmtime(hnsw_path) if os.path.exists(hnsw_path) else None
+        if (size, ivf_mtime, codes_size, hnsw_mtime) == self._mapped_state:
+            return
+        with self._lock:
+            dim = self.dim
+            if not size or not dim:
+                self.vectors = None
+                self.deleted = np.zeros(0, dtype=bool)
+            else:
+                rows = size // (4 * dim)
+                self.vectors = np.memmap(path, dtype=np.float32, mode="r", shape=(rows, dim))
+                self.deleted = np.zeros(rows, dtype=bool)
+                deleted_rows = [r for (r,) in self._db.execute(
+                    "SELECT row FROM chunks WHERE deleted = 1 AND row < ?", (rows,))]
+                self.deleted[deleted_rows] = True
+            if ivf_mtime is not None:
+                with np.load(ivf_path) as data:
+                    self.ivf = {key: data[key] for key in data.files}
+            else:
+                self.ivf = None
+            self._map_codes(codes_path, codes_size)
+            if hnsw_mtime != self._hnsw_mtime:
+                self._load_hnsw(hnsw_path, hnsw_mtime)
+            elif self.hnsw is not None:
+                self._mark_hnsw_deleted(np.flatnonzero(self.deleted))
+            self._mapped_state = (size, ivf_mtime, codes_size, hnsw_mtime)
+
+    def _load_hnsw(self, hnsw_path, hnsw_mtime):
+        self._hnsw_mtime = hnsw_mtime
+        self._hnsw_dirty = False
+        if hnsw_mtime is None:
+            self.hnsw = None
+            return
+        self.hnsw = _new_hnsw(self.dim, 0)
+        self.hnsw.load_index(hnsw_path)
+        self._mark_hnsw_deleted(np.flatnonzero(self.deleted))
+
+    def _mark_hnsw_deleted(self, rows):
+        count = self.hnsw.get_current_count()
+        for row in rows:
+            if row < count:
+                try:
+                    self.hnsw.mark_deleted(int(row))
+                except RuntimeError:
+                    pass  # already marked
+
+    def _map_codes(self, codes_path, codes_size):
+        quantizer_path = os.path.join(self.directory, QUANTIZER_FILE)
+        if not codes_size or not os.path.exists(quantizer_path):
+            self.quantizer = None
+            self.codes = None
+            return
+        with np.load(quantizer_path) as data:
+            self.quantizer = quantizer_from_state({key: data[key] for key in data.files})
+        code_size = self.quantizer.code_size(self.dim)
+        dtype = np.int8 if self.quantizer.kind == "int8" else np.uint8
+        self.codes = np.memmap(codes_path, dtype=dtype, mode="r",
+                               shape=(codes_size // code_size, code_size))
+
+    def add(self, ids, vectors, texts, metadatas):
+        vectors = _normalize(vectors)
+        with self._lock:
+            dim = self.dim
+            if dim is None:
+                dim = vectors.shape[1]
+                self._db.execute("INSERT INTO meta (key, value) VALUES ('dim', ?)", (str(dim),))
+            elif vectors.shape[1] != dim:
+                raise ValueError(
+                    f"Embedding dimension {vectors.shape[1]} does not match index dimension {dim}"
+                )
+            self.delete(ids)
+
+            start = 0 if self.vectors is None else len(self.vectors)
+            metadatas = [metadata or {} for metadata in metadatas]
+            self._db.executemany(
+                f"INSERT INTO chunks (row, id, text, metadata, deleted, source, page, {INGESTED_AT}) "
+                "VALUES (?, ?, ?, ?, 0, ?, ?, ?)",
+                [
+                    (start + i, chunk_id, text, json.dumps(metadata), metadata.get("source"),
+                     metadata.get("page"), metadata.get(INGESTED_AT))
+                    for i, (chunk_id, text, metadata) in enumerate(zip(ids, texts, metadatas))
+                ],
+            )
+            with open(os.path.join(self.directory, VECTORS_FILE), "ab") as f:
+                f.write(vectors.tobytes())
+            self._db.commit()
+            if self.quantizer is not None and self._codes_complete():
+                with open(os.path.join(self.directory, CODES_FILE), "ab") as f:
+                    f.write(self.quantizer.encode(vectors).tobytes())
+            self.refresh()
+            if config.NATIVE_ANN_INDEX == "hnsw":
+                self.update_hnsw()
+            else:
+                self._maybe_rebuild_ivf()
+            self._maybe_quantize()
+
+    def delete(self, ids):
+        ids = list(ids)
+        if not ids:
+            return
+        with self._lock:
+            self._db.executemany(
+                "UPDATE chunks SET deleted = 1 WHERE id = ? AND deleted = 0", [(i,) for i in ids]
+            )
+            self._db.commit()
+            rows = []
+            # Stay well below SQLite's bound-parameter limit
+            for start in range(0, len(ids), 500):
+                batch = ids[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows.extend(r for (r,) in self._db.execute(
+                    f"SELECT row FROM chunks WHERE id IN ({placeholders})", batch))
+            rows = [r for r in rows if r < len(self.deleted)]
+            self.deleted[rows] = True
+            if self.hnsw is not None:
+                self._mark_hnsw_deleted(rows)
+
+    def build_ivf(self, n_lists=None):
+        """Partition all current rows with spherical k-means.
+
+        Rows are only ever appended, so training and assignment run on a
+        snapshot without holding the lock; adds and searches continue
+        meanwhile and rows added since are scanned as the unindexed tail.
+        """
+        with self._lock:
+            vectors = self.vectors
+        n = len(vectors)
+        n_lists = n_lists or config.NATIVE_IVF_LISTS or max(1, int(4 * np.sqrt(n)))
+        centroids = spherical_kmeans(vectors, n_lists)
+        assignment = assign_clusters(vectors, centroids)
+        order = np.argsort(assignment, kind="stable").astype(np.int64)
+        offsets = np.searchsorted(assignment[order], np.arange(len(centroids) + 1))
+        with self._lock:
+            tmp_path = os.path.join(self.directory, "ivf.tmp.npz")
+            np.savez(tmp_path, centroids=centroids, rows=order, offsets=offsets,
+                     indexed=np.array(n))
+            os.replace(tmp_path, os.path.join(self.directory, IVF_FILE))
+            self._mapped_state = None
+            self.refresh()
+
+    def _maybe_rebuild_ivf(self):
+        n = len(self.vectors)
+        if n < config.NATIVE_IVF_MIN_VECTORS:
+            return
+        indexed = int(self.ivf["indexed"]) if self.ivf else 0
+        # Rows added after the last build are scanned brute-force until they
+        # make up a noticeable share of the index; the rebuild runs in the
+        # background so ingest does not wait for k-means
+        if n - indexed > 0.1 * n and not (self._ivf_build and self._ivf_build.is_alive()):
+            self._ivf_build = threading.Thread(target=self.build_ivf, daemon=True,
+                                               name="ivf-build")
+            self._ivf_build.start()
+
+    def update_hnsw(self):
+        """Insert rows the HNSW graph has not seen yet (in memory; see ``save_hnsw``)"""
+        with self._lock:
+            if self.vectors is None:
+                return
+            n = len(self.vectors)
+            if self.hnsw is None:
+                self.hnsw = _new_hnsw(self.dim, max(n, 1024))
+            indexed = self.hnsw.get_current_count()
+            if indexed >= n:
+                return
+            if self.hnsw.get_max_elements() < n:
+                # Grow geometrically so incremental adds do not resize every time
+                self.hnsw.resize_index(max(n, 2 * self.hnsw.get_max_elements()))
+            for start in range(indexed, n, 65536):
+                stop = min(start + 65536, n)
+                self.hnsw.add_items(np.asarray(self.vectors[start:stop]),
+                                    np.arange(start, stop))
+            self._mark_hnsw_deleted(np.flatnonzero(self.deleted[indexed:]) + indexed)
+            self._hnsw_dirty = True
+
+    def save_hnsw(self):
+        """Write the HNSW graph if rows were added since it was last saved.
+
+        Each save rewrites the whole graph, so callers batch it (per ingest
+        checkpoint) rather than saving after every ``add``.
+        """
+        with self._lock:
+            if self.hnsw is None or not self._hnsw_dirty:
+                return
+            hnsw_path = os.path.join(self.directory, HNSW_FILE)
+            tmp_path = hnsw_path + ".tmp"
+            self.hnsw.save_index(tmp_path)
+            os.replace(tmp_path, hnsw_path)
+            self._hnsw_mtime = os.path.getmtime(hnsw_path)
+            self._hnsw_dirty = False
+            self.refresh()
+
+    def hnsw_bytes(self):
+        """Memory held by the in-RAM HNSW graph: a float32 copy of every vector
+        plus its level-0 links, allocated for the graph's full capacity"""
+        if self.hnsw is None:
+            return 0
+        # vector + 2*M links and a link count (4 bytes each) + 8-byte label
+        per_element = 4 * self.dim + 4 * (2 * config.HNSW_M + 1) + 8
+        return self.hnsw.get_max_elements() * per_element
+
+    def _hnsw_complete(self):
+        return self.hnsw is not None and self.hnsw.get_current_count() == len(self.vectors)
+
+    def _search_hnsw(self, query, k, ef):
+        live = len(self)
+        k = min(k, live)
+        if not k:
+            return []
+        self.hnsw.set_ef(max(ef or config.HNSW_EF_SEARCH, k))
+        try:
+            labels, distances = self.hnsw.knn_query(query, k=k)
+        except RuntimeError:
+            # Too few reachable live neighbours (heavy deletes); caller scans exactly
+            return None
+        # "ip" space distance is 1 - inner product
+        return [(int(row), 1.0 - float(d)) for row, d in zip(labels[0], distances[0])]
+
+    def _codes_complete(self):
+        n = 0 if self.vectors is None else len(self.vectors)
+        return self.codes is not None and len(self.codes) == n
+
+    def quantize(self, kind=None, n_subspaces=None):
+        """Fit a quantizer on the current rows and (re)write codes for all of them"""
+        with self._lock:
+            quantizer = make_quantizer(kind or config.NATIVE_QUANTIZATION,
+                                       n_subspaces or config.NATIVE_PQ_SUBSPACES)
+            n = len(self.vectors)
+            rng = np.random.default_rng(0)
+            sample = np.sort(rng.choice(n, min(n, 50_000), replace=False))
+            quantizer.fit(np.asarray(self.vectors[sample]))
+
+            tmp_codes = os.path.join(self.directory, CODES_FILE + ".tmp")
+            with open(tmp_codes, "wb") as f:
+                for start in range(0, n, 65536):
+                    block = np.asarray(self.vectors[start:start + 65536])
+                    f.write(quantizer.encode(block).tobytes())
+            tmp_quantizer = os.path.join(self.directory, "quantizer.tmp.npz")
+            np.savez(tmp_quantizer, **quantizer.state())
+            os.replace(tmp_quantizer, os.path.join(self.directory, QUANTIZER_FILE))
+            os.replace(tmp_codes, os.path.join(self.directory, CODES_FILE))
+            self._mapped_state = None
+            self.refresh()
+
+    def _maybe_quantize(self):
+        if not config.NATIVE_QUANTIZATION or self.vectors is None:
+            return
+        stale_kind = self.quantizer is not None and self.quantizer.kind != config.NATIVE_QUANTIZATION
+        if stale_kind or (
+            not self._codes_complete() and len(self.vectors) >= config.NATIVE_QUANTIZATION_MIN_VECTORS
+        ):
+            self.quantize()
+
+    def _candidate_rows(self, query, nprobe):
+        if not self.ivf:
+            return None
+        centroids, rows, offsets = self.ivf["centroids"], self.ivf["rows"], self.ivf["offsets"]
+        nprobe = min(nprobe, len(centroids))
+        probe = np.argpartition(-(centroids @ query), nprobe - 1)[:nprobe]
+        parts = [rows[offsets[c]:offsets[c + 1]] for c in probe]
+        tail_start = int(self.ivf["indexed"])
+        parts.append(np.arange(tail_start, len(self.vectors), dtype=np.int64))
+        return np.sort(np.concatenate(parts))
+
+    def filter_rows(self, metadata_filter):
+        """Live rows matching a ``MetadataFilter``, from the SQLite secondary index"""
+        clause, params = metadata_filter.sql_where()
+        with self._lock:
+            rows = np.fromiter(
+                (row for (row,) in self._db.execute(
+                    f"SELECT row FROM chunks WHERE deleted = 0 AND {clause} ORDER BY row", params)),
+                dtype=np.int64,
+            )
+        # Rows written by another process may not be mapped yet
+        return rows[rows < len(self.deleted)]
+
+    def search(self, query_vector, k=4, nprobe=None, rows=None, ef=None):
+        """Return ``[(row, score)]``; ``rows`` optionally restricts the search"""
+        self.refresh()
+        if self.vectors is None:
+            return []
+        query = _normalize(query_vector)
+        if rows is not None and not len(rows):
+            return []
+        with self._lock:
+            if rows is None and self._hnsw_complete():
+                hits = self._search_hnsw(query, k, ef)
+                if hits is not None:
+                    return hits
+            if rows is None:
+                rows = self._candidate_rows(query, nprobe or config.NATIVE_IVF_NPROBE)
+            if config.NATIVE_QUANTIZATION and self._codes_complete():
+                best_rows, exact = search_quantized(
+                    self.quantizer, self.codes, self.vectors, query, k,
+                    config.NATIVE_RESCORE_CANDIDATES, rows=rows, exclude=self.deleted,
+                )
+                return [(int(r), float(s)) for r, s in zip(best_rows, exact)]
+            if rows is None:
+                scores = self.vectors @ query
+                scores[self.deleted] = -np.inf
+                candidates = np.arange(len(scores))
+            else:
+                rows = np.asarray(rows, dtype=np.int64)
+                rows = rows[~self.deleted[rows]]
+                scores = self.vectors[rows] @ query
+                candidates = rows
+        if len(scores) > k:
+            top = np.argpartition(-scores, k)[:k]
+        else:
+            top = np.arange(len(scores))
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [(int(candidates[i]), float(scores[i])) for i in top if np.isfinite(scores[i])]
+
+    def documents(self, rows):
+        """Fetch ``Document``s for rows, in the given order"""
+        if not rows:
+            return []
+        placeholders = ",".join("?" * len(rows))
+        found = {
+            row: Document(page_content=text, metadata=json.loads(metadata))
+            for row, text, metadata in self._db.execute(
+                f"SELECT row, text, metadata FROM chunks WHERE row IN ({placeholders})",
+                list(rows),
+            )
+        }
+        return [found[r] for r in rows]
+
+    def documents_by_id(self, ids):
+        """Fetch live ``Document``s by chunk id, in the given order; unknown ids are skipped"""
+        if not ids:
+            return []
+        placeholders = ",".join("?" * len(ids))
+        found = {
+            chunk_id: Document(page_content=text, metadata=json.loads(metadata))
+            for chunk_id, text, metadata in self._db.execute(
+                f"SELECT id, text, metadata FROM chunks "
+                f"WHERE deleted = 0 AND id IN ({placeholders})",
+                list(ids),
+            )
+        }
+        return [found[i] for i in ids if i in found]
+
+
+class NativeVectorStore(VectorStore):
+    """LangChain vector store backed by FlatIVFIndex"""
+
+    def __init__(self, embedding_function, persist_directory=None):
+        self._embedding = embedding_function
+        self.index = FlatIVFIndex(persist_directory or config.NATIVE_INDEX_DIRECTORY)
+
+    @property
+    def embeddings(self):
+        return self._embedding
+
+    def add_texts(self, texts, metadatas=None, ids=None, **kwargs):
+        texts = list(texts)
+        if not texts:
+            return []
+        ids = list(ids) if ids else [uuid.uuid4().hex for _ in texts]
+        metadatas = metadatas or [{} for _ in texts]
+        vectors = self._embedding.embed_documents(texts)
+        self.index.add(ids, vectors, texts, metadatas)
+        return ids
+
+    def delete(self, ids=None, **kwargs):
+        self.index.delete(ids or [])
+        return True
+
+    def persist(self):
+        """Save state kept in memory between adds (the HNSW graph)"""
+        self.index.save_hnsw()
+
+    def get_by_ids(self, ids):
+        return self.index.documents_by_id(list(ids))
+
+    def similarity_search_by_vector_with_score(self, embedding, k=4, filter=None, **kwargs):
+        """``filter`` is a ``MetadataFilter``; only its rows are scored"""
+        rows = None
+        if filter is not None and not filter.empty:
+            rows = self.index.filter_rows(filter)
+        hits = self.index.search(embedding, k=k, nprobe=kwargs.get("nprobe"), rows=rows,
+                                 ef=kwargs.get("ef"))
+        documents = self.index.documents([row for row, _ in hits])
+        return list(zip(documents, [score for _, score in hits]))
+
+    def similarity_search_with_score(self, query, k=4, **kwargs):
+        embedding = self._embedding.embed_query(query)
+        return self.similarity_search_by_vector_with_score(embedding, k=k, **kwargs)
+
+    def similarity_search_by_vector(self, embedding, k=4, **kwargs):
+        return [doc for doc, _ in self.similarity_search_by_vector_with_score(embedding, k, **kwargs)]
+
+    def similarity_search(self, query, k=4, **kwargs):
+        return [doc for doc, _ in self.similarity_search_with_score(query, k, **kwargs)]
+
+    def _select_relevance_score_fn(self):
+        # Cosine similarity in [-1, 1] -> relevance in [0, 1]
+        return lambda score: (score + 1.0) / 2.0
+
+    @classmethod
+    def from_texts(cls, texts, embedding, metadatas=None, ids=None,
+                   persist_directory=None, **kwargs):
+        store = cls(embedding, persist_directory=persist_directory)
+        store.add_texts(texts, metadatas=metadatas, ids=ids)
+        return store
@@ -0,0 +1,229 @@
+"""
+Parallel PDF loading on a process pool, a drop-in for
+``DirectoryLoader(..., loader_cls=PyPDFLoader)``.
+
+Small PDFs are parsed one file per task; large PDFs are split into page
+ranges so a single 2,000-page manual does not serialize the whole load.
+Documents are yielded as a stream in a stable order (files sorted by path,
+pages ascending) with the same ``source``/``page`` metadata PyPDFLoader
+produces. A PDF that cannot be parsed is logged and skipped (listed in
+``errors``) instead of aborting the load.
+
+Workers are started with ``forkserver`` (``spawn`` where that is not
+available), never ``fork``: the apps load PDFs from a process that runs
+threads, and a forked child can inherit a lock some other thread was
+holding.
+
+``UploadPDFLoader`` does the same for in-memory uploads (Streamlit
+``UploadedFile`` objects or raw bytes), parsing straight from the buffer
+instead of round-tripping through a temporary file.
+"""
+
+import glob
+import io
+import logging
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from langchain_core.documents import Document
+
+import config
+
+log = logging.getLogger(__name__)
+
+
+def _process_pool(max_workers):
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+    return ProcessPoolExecutor(max_workers=max_workers, mp_context=context)
+
+
+def _page_count(path):
+    import pypdf
+    return len(pypdf.PdfReader(path).pages)
+
+
+def _extract_pages(path, start=0, stop=None):
+    """Worker: extract ``(page_number, text)`` for pages [start, stop) of a PDF"""
+    import pypdf
+    reader = pypdf.PdfReader(path)
+    stop = len(reader.pages) if stop is None else min(stop, len(reader.pages))
+    return [(i, reader.pages[i].extract_text()) for i in range(start, stop)]
+
+
+def _extract_pages_from_buffer(data):
+    """Worker: extract ``(page_number, text)`` for every page of an in-memory PDF"""
+    import pypdf
+    reader = pypdf.PdfReader(io.BytesIO(data) if isinstance(data, bytes) else data)
+    return [(i, page.extract_text()) for i, page in enumerate(reader.pages)]
+
+
+def find_pdfs(directory, pattern="**/*.pdf", root=None):
+    """PDFs under ``directory``; with ``root``, only those whose real path stays inside it"""
+    # Normalized like DirectoryLoader's paths, so "source" metadata is unchanged
+    paths = (os.path.normpath(path)
+             for path in glob.glob(os.path.join(directory, pattern), recursive=True))
+    if root is not None:
+        root = os.path.realpath(root)
+        paths = (path for path in paths
+                 if os.path.commonpath([root, os.path.realpath(path)]) == root)
+    return sorted(paths)
+
+
+class ParallelPDFLoader:
+    """Load PDFs from a directory (or an explicit file list) across worker processes.
+
+    Files that fail to parse are skipped and listed in ``errors`` as
+    ``(path, exception)``; pages of a large file read before the failure
+    may already have been yielded.
+    """
+
+    def __init__(self, directory=None, paths=None, glob="**/*.pdf", max_workers=None,
+                 pages_per_task=None, large_file_bytes=None):
+        if paths is None:
+            paths = find_pdfs(directory, glob) if directory else []
+        self.paths = list(paths)
+        self.max_workers = max_workers or config.PDF_LOADER_WORKERS or os.cpu_count() or 1
+        self.pages_per_task = pages_per_task or config.PDF_PAGES_PER_TASK
+        self.large_file_bytes = large_file_bytes or config.PDF_LARGE_FILE_BYTES
+        self.errors = []
+
+    @property
+    def failed(self):
+        """Paths of the files in ``errors``"""
+        return {path for path, _ in self.errors}
+
+    def _skip(self, path, error):
+        log.warning("Skipping unreadable PDF %s: %s", path, error)
+        self.errors.append((path, error))
+
+    def _tasks(self):
+        """``(path, start, stop)`` work items in output order"""
+        for path in self.paths:
+            try:
+                if os.path.getsize(path) < self.large_file_bytes:
+                    yield path, 0, None
+                    continue
+                pages = _page_count(path)
+            except Exception as e:
+                self._skip(path, e)
+                continue
+            for start in range(0, pages, self.pages_per_task):
+                yield path, start, start + self.pages_per_task
+
+    def _collect(self, path, extract):
+        """Documents from ``extract()``, or none if it fails (or the file already did)"""
+        if path in self.failed:
+            return []
+        try:
+            pages = extract()
+        except Exception as e:
+            self._skip(path, e)
+            return []
+        return self._to_documents(path, pages)
+
+    @staticmethod
+    def _to_documents(path, pages):
+        return [
+            Document(page_content=text, metadata={"source": path, "page": page})
+            for page, text in pages
+        ]
+
+    def lazy_load(self):
+        if self.max_workers == 1 or len(self.paths) == 0:
+            for path, start, stop in self._tasks():
+                yield from self._collect(path, lambda: _extract_pages(path, start, stop))
+            return
+
+        # Keep a bounded window of tasks in flight and yield in submission order,
+        # so memory stays flat and output order is stable regardless of timing
+        max_pending = self.max_workers * 2
+        with _process_pool(self.max_workers) as executor:
+            pending = deque()
+            for path, start, stop in self._tasks():
+                pending.append((path, executor.submit(_extract_pages, path, start, stop)))
+                if len(pending) >= max_pending:
+                    done_path, future = pending.popleft()
+                    yield from self._collect(done_path, future.result)
+            while pending:
+                done_path, future = pending.popleft()
+                yield from self._collect(done_path, future.result)
+
+    def load(self):
+        return list(self.lazy_load())
+
+
+def _upload_name_and_buffer(upload):
+    """``(name, buffer)`` of an UploadedFile / file-like object or a ``(name, bytes)`` pair"""
+    if isinstance(upload, tuple):
+        return upload
+    return upload.name, upload
+
+
+class UploadPDFLoader:
+    """Load uploaded PDFs from memory, several at a time across worker processes.
+
+    ``uploads`` are Streamlit ``UploadedFile`` objects (any seekable binary
+    file object with a ``name``) or ``(name, bytes)`` pairs. The ``source``
+    metadata is the upload's name. Files that fail to parse are skipped and
+    listed in ``errors`` as ``(name, exception)``.
+    """
+
+    def __init__(self, uploads, max_workers=None):
+        self.uploads = [_upload_name_and_buffer(upload) for upload in uploads]
+        self.max_workers = min(
+            max_workers or config.PDF_LOADER_WORKERS or os.cpu_count() or 1,
+            max(1, len(self.uploads)),
+        )
+        self.errors = []
+
+    @staticmethod
+    def _as_bytes(buffer):
+        # Workers need a picklable copy; getbuffer() avoids a second one in between
+        if isinstance(buffer, (bytes, bytearray, memoryview)):
+            return bytes(buffer)
+        if hasattr(buffer, "getbuffer"):
+            return bytes(buffer.getbuffer())
+        buffer.seek(0)
+        return buffer.read()
+
+    def _parse_inline(self, buffer):
+        if isinstance(buffer, (bytearray, memoryview)):
+            return _extract_pages_from_buffer(bytes(buffer))
+        if not isinstance(buffer, bytes):
+            buffer.seek(0)
+        return _extract_pages_from_buffer(buffer)
+
+    def lazy_load(self):
+        if self.max_workers == 1:
+            for name, buffer in self.uploads:
+                try:
+                    pages = self._parse_inline(buffer)
+                except Exception as e:
+                    self.errors.append((name, e))
+                    continue
+                yield from ParallelPDFLoader._to_documents(name, pages)
+            return
+
+        with _process_pool(self.max_workers) as executor:
+            pending = deque()
+            for name, buffer in self.uploads:
+                pending.append((name, executor.submit(
+                    _extract_pages_from_buffer, self._as_bytes(buffer))))
+                if len(pending) >= self.max_workers * 2:
+                    yield from self._collect(*pending.popleft())
+            while pending:
+                yield from self._collect(*pending.popleft())
+
+    def _collect(self, name, future):
+        try:
+            pages = future.result()
+        except Exception as e:
+            self.errors.append((name, e))
+            return []
+        return ParallelPDFLoader._to_documents(name, pages)
+
+    def load(self):
+        return list(self.lazy_load())
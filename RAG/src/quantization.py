@@ -0,0 +1,180 @@
+"""
+Compressed vector codes for first-pass search, with exact re-scoring.
+
+Two quantizers are provided:
+
+* ``Int8Quantizer``: per-dimension symmetric scalar quantization, 4x smaller
+  than float32.
+* ``ProductQuantizer``: splits vectors into ``m`` subspaces with 256 k-means
+  centroids each and stores one byte per subspace (``4 * dim / m`` x smaller),
+  scored by asymmetric distance computation (lookup tables).
+
+``search_quantized`` scans the codes, keeps the best ``n_candidates`` and
+re-scores them exactly against the full-precision vectors, which can stay on
+disk (memory-mapped) because only a handful of rows are touched per query.
+"""
+
+import numpy as np
+
+BLOCK_ROWS = 4096  # Rows decoded at a time; small enough for the scratch to stay in cache
+
+
+def _kmeans(data, n_clusters, iterations=15, seed=0):
+    """Plain (Euclidean) k-means used to train PQ codebooks"""
+    rng = np.random.default_rng(seed)
+    n_clusters = min(n_clusters, len(data))
+    centroids = data[rng.choice(len(data), n_clusters, replace=False)].copy()
+    for _ in range(iterations):
+        distances = (
+            (data ** 2).sum(axis=1, keepdims=True)
+            - 2 * data @ centroids.T
+            + (centroids ** 2).sum(axis=1)
+        )
+        assignment = np.argmin(distances, axis=1)
+        counts = np.bincount(assignment, minlength=n_clusters)
+        sums = np.stack([
+            np.bincount(assignment, weights=data[:, d], minlength=n_clusters)
+            for d in range(data.shape[1])
+        ], axis=1)
+        empty = counts == 0
+        centroids = (sums / np.maximum(counts, 1)[:, None]).astype(np.float32)
+        # Re-seed empty clusters with random points
+        centroids[empty] = data[rng.integers(len(data), size=int(empty.sum()))]
+    return centroids
+
+
+class Int8Quantizer:
+    kind = "int8"
+
+    def __init__(self, scale=None):
+        self.scale = scale  # float32 (dim,)
+
+    def fit(self, vectors):
+        absmax = np.abs(np.asarray(vectors, dtype=np.float32)).max(axis=0)
+        absmax[absmax == 0] = 1.0
+        self.scale = (absmax / 127.0).astype(np.float32)
+        return self
+
+    def encode(self, vectors):
+        codes = np.rint(np.asarray(vectors, dtype=np.float32) / self.scale)
+        return np.clip(codes, -127, 127).astype(np.int8)
+
+    def code_size(self, dim):
+        return dim
+
+    def scores(self, codes, query):
+        """Approximate inner products of ``query`` with every row of ``codes``"""
+        weighted = (np.asarray(query, dtype=np.float32) * self.scale).astype(np.float32)
+        out = np.empty(len(codes), dtype=np.float32)
+        for start in range(0, len(codes), BLOCK_ROWS):
+            block = np.asarray(codes[start:start + BLOCK_ROWS], dtype=np.float32)
+            out[start:start + BLOCK_ROWS] = block @ weighted
+        return out
+
+    def state(self):
+        return {"kind": self.kind, "scale": self.scale}
+
+
+class ProductQuantizer:
+    kind = "pq"
+
+    def __init__(self, n_subspaces=None, codebooks=None):
+        self.n_subspaces = n_subspaces
+        self.codebooks = codebooks  # float32 (m, 256, dim / m)
+
+    def fit(self, vectors, sample_size=10_000, seed=0):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        dim = vectors.shape[1]
+        m = self.n_subspaces or max(1, dim // 4)
+        while dim % m:
+            m -= 1
+        self.n_subspaces = m
+        rng = np.random.default_rng(seed)
+        if len(vectors) > sample_size:
+            vectors = vectors[rng.choice(len(vectors), sample_size, replace=False)]
+        sub_dim = dim // m
+        self.codebooks = np.stack([
+            _kmeans(vectors[:, j * sub_dim:(j + 1) * sub_dim], 256, seed=seed + j)
+            for j in range(m)
+        ]).astype(np.float32)
+        return self
+
+    def encode(self, vectors):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        m, _, sub_dim = self.codebooks.shape
+        codes = np.empty((len(vectors), m), dtype=np.uint8)
+        book_norms = (self.codebooks ** 2).sum(axis=2)
+        step = 16384
+        for start in range(0, len(vectors), step):
+            block = vectors[start:start + step]
+            for j in range(m):
+                sub = block[:, j * sub_dim:(j + 1) * sub_dim]
+                distances = book_norms[j] - 2 * sub @ self.codebooks[j].T
+                codes[start:start + step, j] = np.argmin(distances, axis=1)
+        return codes
+
+    def code_size(self, dim):
+        return self.n_subspaces
+
+    def scores(self, codes, query):
+        m, _, sub_dim = self.codebooks.shape
+        query = np.asarray(query, dtype=np.float32).reshape(m, 1, sub_dim)
+        # Inner product of each query subvector with each centroid: (m, 256)
+        table = (self.codebooks * query).sum(axis=2)
+        out = np.zeros(len(codes), dtype=np.float32)
+        for start in range(0, len(codes), BLOCK_ROWS):
+            block = np.asarray(codes[start:start + BLOCK_ROWS])
+            partial = out[start:start + BLOCK_ROWS]
+            for j in range(m):
+                partial += table[j].take(block[:, j])
+        return out
+
+    def state(self):
+        return {"kind": self.kind, "codebooks": self.codebooks}
+
+
+def make_quantizer(kind, n_subspaces=None):
+    if kind == "int8":
+        return Int8Quantizer()
+    if kind == "pq":
+        return ProductQuantizer(n_subspaces=n_subspaces)
+    raise ValueError(f"Unknown quantization {kind!r}; expected 'int8' or 'pq'")
+
+
+def quantizer_from_state(state):
+    kind = str(state["kind"])
+    if kind == "int8":
+        return Int8Quantizer(scale=state["scale"])
+    if kind == "pq":
+        codebooks = state["codebooks"]
+        return ProductQuantizer(n_subspaces=len(codebooks), codebooks=codebooks)
+    raise ValueError(f"Unknown quantization {kind!r}")
+
+
+def search_quantized(quantizer, codes, vectors, query, k, n_candidates, rows=None, exclude=None):
+    """Approximate search over ``codes`` then exact re-scoring of the best candidates.
+
+    ``rows`` restricts the search to a subset of row numbers; ``exclude`` is a
+    boolean mask of rows to skip (e.g. deleted). Returns ``(rows, scores)``
+    sorted by exact score, best first.
+    """
+    if rows is None:
+        approx = quantizer.scores(codes, query)
+        candidates = np.arange(len(approx))
+    else:
+        candidates = np.asarray(rows, dtype=np.int64)
+        approx = quantizer.scores(codes[candidates], query)
+    if exclude is not None:
+        approx[exclude[candidates]] = -np.inf
+
+    n_candidates = min(max(n_candidates, k), len(approx))
+    if n_candidates < len(approx):
+        best = np.argpartition(-approx, n_candidates - 1)[:n_candidates]
+    else:
+        best = np.arange(len(approx))
+    best = best[np.isfinite(approx[best])]
+    best_rows = np.sort(candidates[best])  # sorted rows read the mmap sequentially
+
+    exact = np.asarray(vectors[best_rows], dtype=np.float32) @ np.asarray(query, dtype=np.float32)
+    order = np.argsort(-exact, kind="stable")[:k]
+    return best_rows[order], exact[order]
@@ -1,27 +1,69 @@
 import os
+
 import streamlit as st
 from dotenv import load_dotenv
-from langchain_community.document_loaders import PyPDFLoader, DirectoryLoader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_openai import OpenAIEmbeddings, ChatOpenAI
-from langchain_community.vectorstores import Chroma
-from langchain.chains import RetrievalQA
-from langchain.memory import ConversationBufferMemory
-import tempfile
+
+import config
+from embedding_cache import CachedEmbeddings, document_cache
+from embedding_pipeline import PipelinedEmbeddings
+from parallel_loader import ParallelPDFLoader, UploadPDFLoader
+from chroma_store import EmbeddingMismatchError
+from conversation_memory import ConversationMemory
+from engine_registry import engine_key, registry
+from metadata_filter import MetadataFilter
+from rag_engine import RAGEngine
+from tenants import InvalidTenantError, resident_indexes, start_tenant_pruning, validate_tenant
+from warmup import start_warmup, startup_report, warmup_done
 
 # Load environment variables
 load_dotenv()
 
 
+def openai_chat_model(api_key):
+    """Chat model billed to ``api_key``; keys are never read from the shared environment"""
+    from langchain_openai import ChatOpenAI
+    return ChatOpenAI(temperature=0.7, model="gpt-3.5-turbo", api_key=api_key)
+
+
+def azure_chat_model(azure_config):
+    from langchain_openai import AzureChatOpenAI
+    return AzureChatOpenAI(
+        azure_deployment=azure_config["deployment"],
+        api_version=azure_config["api_version"],
+        temperature=0.7,
+        azure_endpoint=azure_config["endpoint"],
+        api_key=azure_config["api_key"]
+    )
+
+
 class RAGBot:
-    def __init__(self):
-        self.embeddings = None
-        self.vectorstore = None
-        self.qa_chain = None
-        self.memory = ConversationBufferMemory(
-            memory_key="chat_history",
-            return_messages=True
-        )
+    """Per-session Streamlit front end; the RAGEngine behind it is shared"""
+
+    def __init__(self, engine=None):
+        self.engine = engine or RAGEngine()
+        self.handle = None  # SessionHandle of the shared engine in use
+        self.api_key = None  # this session's OpenAI key
+        self.memory = ConversationMemory()  # per session, unlike the engine
+
+    @property
+    def embeddings(self):
+        return self.engine.embeddings
+
+    @embeddings.setter
+    def embeddings(self, embeddings):
+        self.engine.embeddings = embeddings
+
+    @property
+    def vectorstore(self):
+        return self.engine.vectorstore
+
+    @property
+    def qa_chain(self):
+        return self.engine.qa_chain
+
+    @property
+    def answer_cache(self):
+        return self.engine.answer_cache
         
     def validate_api_key(self, api_key):
         """Validate OpenAI API key by making a test call"""
@@ -50,41 +92,61 @@ class RAGBot:
             else:
                 return False, f"API key error: {error_msg}"
     
-    def initialize_openai(self, api_key, provider="openai", azure_config=None):
-        """Initialize OpenAI or Azure OpenAI with the provided API key and config"""
+    def _attach(self, key, factory):
+        """Switch this session to the shared engine for ``key``, creating it if needed"""
+        if self.handle is not None and self.handle.key == key:
+            return
+        handle = registry.acquire(key, factory)
+        if self.handle is not None:
+            self.handle.close()
+        self.handle = handle
+        self.engine = handle.engine
+
+    def initialize_openai(self, api_key, provider="openai", azure_config=None, tenant=None):
+        """Initialize OpenAI or Azure OpenAI with the provided API key and config for ``tenant``"""
         if provider == "azure":
             # Azure config must be provided
             if not azure_config or not azure_config.get("api_key") or not azure_config.get("endpoint") or not azure_config.get("deployment") or not azure_config.get("embedding_deployment"):
                 st.error("❌ Please provide Azure API key, endpoint, chat deployment name, and embedding deployment name.")
                 return False
-            os.environ["AZURE_OPENAI_API_KEY"] = azure_config["api_key"]
-            os.environ["AZURE_OPENAI_ENDPOINT"] = azure_config["endpoint"]
-            os.environ["AZURE_OPENAI_DEPLOYMENT_NAME"] = azure_config["deployment"]
-            os.environ["AZURE_OPENAI_EMBEDDING_DEPLOYMENT"] = azure_config["embedding_deployment"]
-            os.environ["AZURE_OPENAI_API_VERSION"] = azure_config.get(
-                "api_version", "2024-12-01-preview"
-            )
+            # Sessions share engines (and the process environment), so every
+            # client gets this session's credentials explicitly
+            azure_config.setdefault("api_version", "2024-12-01-preview")
             try:
-                from langchain_openai import AzureOpenAIEmbeddings, AzureChatOpenAI
-                self.embeddings = AzureOpenAIEmbeddings(
+                from langchain_openai import AzureOpenAIEmbeddings
+                key = engine_key("azure", azure_config["deployment"],
+                                 azure_config["embedding_deployment"],
+                                 azure_config["endpoint"], azure_config["api_key"], tenant=tenant)
+                self._attach(key, lambda: RAGEngine(CachedEmbeddings(PipelinedEmbeddings(AzureOpenAIEmbeddings(
                     azure_deployment=azure_config["embedding_deployment"],
                     api_version=azure_config["api_version"],
                     azure_endpoint=azure_config["endpoint"],
                     api_key=azure_config["api_key"]
-                )
+                )), model_name=azure_config["embedding_deployment"]),
+                    llm=azure_chat_model(azure_config),
+                    tenant=tenant, resident=resident_indexes))
                 st.success("✅ Azure OpenAI API Key and deployments set!")
                 return True
             except Exception as e:
                 st.error(f"❌ Azure OpenAI error: {e}")
                 return False
         else:
+            key = engine_key("openai", "gpt-3.5-turbo", api_key=api_key, tenant=tenant)
+            if self.handle is not None and self.handle.key == key:
+                # Already validated; Streamlit calls this on every rerun
+                return True
             # Validate the API key first
             is_valid, message = self.validate_api_key(api_key)
             if not is_valid:
                 st.error(f"❌ {message}")
                 return False
-            os.environ["OPENAI_API_KEY"] = api_key
-            self.embeddings = OpenAIEmbeddings()
+            self.api_key = api_key
+            from langchain_openai import OpenAIEmbeddings
+            self._attach(key, lambda: RAGEngine(
+                CachedEmbeddings(PipelinedEmbeddings(OpenAIEmbeddings(api_key=api_key))),
+                llm=openai_chat_model(api_key),
+                tenant=tenant, resident=resident_indexes
+            ))
             st.success("✅ OpenAI API Key validated and set!")
             return True
         
@@ -94,13 +156,8 @@ class RAGBot:
             st.error(f"Directory {pdf_directory} does not exist!")
             return []
             
-        # Load PDFs using DirectoryLoader
-        loader = DirectoryLoader(
-            pdf_directory,
-            glob="**/*.pdf",
-            loader_cls=PyPDFLoader,
-            show_progress=True
-        )
+        # Parse PDFs across a process pool
+        loader = ParallelPDFLoader(pdf_directory)
         
         try:
             documents = loader.load()
@@ -112,27 +169,65 @@ class RAGBot:
     
     def load_single_pdf(self, pdf_file):
         """Load a single PDF file"""
+        return self.load_uploaded_pdfs([pdf_file])
+
+    def load_uploaded_pdfs(self, pdf_files):
+        """Parse uploaded PDFs straight from memory, several at a time"""
+        loader = UploadPDFLoader(pdf_files)
+        documents = loader.load()
+        for name, error in loader.errors:
+            st.error(f"Error loading PDF {name}: {str(error)}")
+        loaded = len(pdf_files) - len(loader.errors)
+        if loaded:
+            names = pdf_files[0].name if len(pdf_files) == 1 else f"{loaded} files"
+            st.success(f"Loaded {len(documents)} pages from {names}")
+        return documents
+    
+    def _report_ingest(self, result):
+        """Show embedding throughput and cache use for the last ingest"""
+        if result.embedding_stats:
+            st.info(f"⚡ {result.embedding_stats.summary()}")
+        if result.embedding_cache:
+            st.info(f"🗃️ {result.embedding_cache.summary()}")
+
+    @staticmethod
+    def _progress_bar(label):
+        """A Streamlit progress bar and the ``on_progress`` callback that drives it"""
+        bar = st.progress(0.0, text=label)
+
+        def update(progress):
+            current = os.path.basename(progress.current_file or "")
+            detail = f" ({current})" if current and not progress.done else ""
+            bar.progress(progress.fraction, text=f"{label} {progress.summary()}{detail}")
+
+        return bar, update
+
+    def _create_qa_chain_for_session(self):
+        if hasattr(st.session_state, 'current_provider'):
+            self.create_qa_chain(provider=st.session_state.current_provider,
+                               azure_config=getattr(st.session_state, 'azure_config', None))
+        else:
+            self.create_qa_chain()
+
+    def reopen_index(self):
+        """Serve the persisted index right away instead of re-embedding the corpus"""
+        if self.vectorstore is not None or not self.embeddings:
+            return
+        if self.engine.evicted:
+            # Unloaded to save memory; the next question reloads it
+            return
         try:
-            # Save uploaded file to temporary location
-            with tempfile.NamedTemporaryFile(
-                delete=False, suffix='.pdf'
-            ) as tmp_file:
-                tmp_file.write(pdf_file.getvalue())
-                tmp_file_path = tmp_file.name
-            
-            # Load the PDF
-            loader = PyPDFLoader(tmp_file_path)
-            documents = loader.load()
-            
-            # Clean up temporary file
-            os.unlink(tmp_file_path)
-            
-            st.success(f"Loaded {len(documents)} pages from {pdf_file.name}")
-            return documents
+            if not self.engine.open_existing_index():
+                return
+        except EmbeddingMismatchError as e:
+            st.warning(f"⚠️ {e}")
+            return
         except Exception as e:
-            st.error(f"Error loading PDF {pdf_file.name}: {str(e)}")
-            return []
-    
+            st.error(f"Error opening persisted index: {str(e)}")
+            return
+        st.info(f"📂 Reopened persisted index with {self.engine.document_count()} chunks")
+        self._create_qa_chain_for_session()
+
     def process_documents(self, documents):
         """Split documents into chunks and create vector store"""
         if not self.embeddings:
@@ -141,51 +236,62 @@ class RAGBot:
         if not documents:
             st.warning("No documents to process!")
             return
-            
-        # Split documents into chunks
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=200,
-            length_function=len
-        )
-        
-        chunks = text_splitter.split_documents(documents)
-        st.info(f"Split documents into {len(chunks)} chunks")
-        
-        # Create vector store
+
+        bar, on_progress = self._progress_bar("📥 Indexing:")
         try:
-            self.vectorstore = Chroma.from_documents(
-                documents=chunks,
-                embedding=self.embeddings,
-                persist_directory="./chroma_db"
-            )
+            result = self.engine.add_documents(documents, on_progress=on_progress)
+            bar.empty()
+            st.info(f"Split documents into {result.chunks} chunks")
             st.success("Vector store created successfully!")
-            
-            # Create QA chain - pass provider info
-            if hasattr(st.session_state, 'current_provider'):
-                self.create_qa_chain(provider=st.session_state.current_provider, 
-                                   azure_config=getattr(st.session_state, 'azure_config', None))
-            else:
-                self.create_qa_chain()
-            
+            self._report_ingest(result)
+            self._create_qa_chain_for_session()
         except Exception as e:
             st.error(f"Error creating vector store: {str(e)}")
     
+    def sync_directory(self, pdf_directory):
+        """Incrementally index a PDF directory (see ``RAGEngine.sync_directory``)"""
+        if not self.embeddings:
+            st.error("OpenAI API key is not set or invalid. Please provide a valid key before processing documents.")
+            return
+        if not os.path.exists(pdf_directory):
+            st.error(f"Directory {pdf_directory} does not exist!")
+            return
+
+        bar, on_progress = self._progress_bar("📥 Indexing:")
+        try:
+            result = self.engine.sync_directory(pdf_directory, on_progress=on_progress)
+        except Exception as e:
+            st.error(f"Error indexing directory: {str(e)}")
+            return
+        bar.empty()
+        for path, error in result.failed:
+            st.warning(f"⚠️ Skipped unreadable PDF {path}: {error}")
+
+        diff = result.diff
+        st.info(
+            f"{len(diff.unchanged)} unchanged, {len(diff.added)} new, "
+            f"{len(diff.modified)} modified, {len(diff.removed)} removed PDFs"
+        )
+        if diff.has_changes:
+            st.success(f"Indexed {result.chunks} chunks from {result.files} changed PDFs")
+            self._report_ingest(result)
+        else:
+            st.success("Vector store is up to date, nothing to re-index")
+        self._create_qa_chain_for_session()
+
     def create_qa_chain(self, provider="openai", azure_config=None):
         """Create the QA chain for answering questions"""
         if not self.vectorstore:
             st.error("Vector store not initialized!")
             return
+        if self.engine.llm is not None:
+            # Shared engine: the chat model is part of its key, so reuse it
+            if self.qa_chain is None:
+                self.engine.create_qa_chain()
+            return
         if provider == "azure" and azure_config:
             try:
-                from langchain_openai import AzureChatOpenAI
-                llm = AzureChatOpenAI(
-                    azure_deployment=azure_config["deployment"],
-                    api_version=azure_config["api_version"],
-                    temperature=0.7,
-                    azure_endpoint=azure_config["endpoint"],
-                    api_key=azure_config["api_key"]
-                )
+                llm = azure_chat_model(azure_config)
             except Exception as e:
                 error_msg = str(e)
                 if "DeploymentNotFound" in error_msg:
@@ -201,33 +307,41 @@ class RAGBot:
                     st.error(f"❌ Azure LLM error: {e}")
                 return
         else:
-            llm = ChatOpenAI(
-                temperature=0.7,
-                model="gpt-3.5-turbo"
-            )
-        self.qa_chain = RetrievalQA.from_chain_type(
-            llm=llm,
-            chain_type="stuff",
-            retriever=self.vectorstore.as_retriever(search_kwargs={"k": 4}),
-            return_source_documents=True,
-            verbose=True
-        )
+            llm = openai_chat_model(self.api_key)
+        self.engine.create_qa_chain(llm)
         st.success("QA Chain created successfully!")
-    
-    def ask_question(self, question):
-        """Ask a question and get an answer from the RAG system"""
-        if not self.qa_chain:
-            return "Please load documents first!", []
-            
+
+    def sources(self):
+        """Indexed source files, for the sidebar filter"""
         try:
-            # Use the newer invoke method instead of deprecated __call__
-            result = self.qa_chain.invoke({"query": question})
-            answer = result["result"]
-            source_docs = result["source_documents"]
-            
-            return answer, source_docs
-        except Exception as e:
-            return f"Error processing question: {str(e)}", []
+            return self.engine.sources()
+        except Exception:
+            return []
+
+    def ask_question(self, question, filters=None):
+        """Ask a (possibly follow-up) question and get an answer from the RAG system"""
+        return self.engine.ask_question(question, filters, memory=self.memory)
+
+    def stream_question(self, question, filters=None):
+        """Retrieve sources, then stream the answer token by token"""
+        return self.engine.stream_question(question, filters, memory=self.memory)
+
+
+def source_preview(doc):
+    """What the chat history keeps of a source document"""
+    return {
+        "page": doc.metadata.get("page", "Unknown"),
+        "content": doc.page_content[:config.MAX_CONTENT_PREVIEW],
+    }
+
+
+def show_sources(sources):
+    with st.expander("View Sources"):
+        for i, source in enumerate(sources):
+            st.markdown(f"**Source {i+1}:**")
+            st.markdown(f"Page: {source['page']}")
+            st.markdown(f"Content: {source['content']}...")
+            st.markdown("---")
 
 
 def main():
@@ -236,6 +350,9 @@ def main():
         page_icon="🤖",
         layout="wide"
     )
+    # Load langchain/OpenAI/Chroma in the background while the page renders
+    start_warmup()
+    start_tenant_pruning()
     st.title("🤖 LangChain RAG Bot")
     st.markdown("Upload PDFs and ask questions about their content!")
     
@@ -249,7 +366,29 @@ def main():
     # Sidebar for configuration
     with st.sidebar:
         st.header("Configuration")
-        
+
+        if "workspace" not in st.session_state:
+            # Shared by every session (and its engine) unless the user names one
+            st.session_state.workspace = config.DEFAULT_TENANT or ""
+        workspace = st.text_input(
+            "Workspace",
+            key="workspace",
+            help="Documents and answers are kept separate per workspace; "
+                 "leave empty for the shared one, or enter the same name later "
+                 f"to come back to yours (unused for {config.TENANT_IDLE_DAYS} days, "
+                 "it is deleted)"
+        )
+        try:
+            tenant = validate_tenant(workspace)
+        except InvalidTenantError as e:
+            st.error(f"❌ {e}")
+            st.stop()
+        if st.session_state.get("tenant", tenant) != tenant:
+            # The chat history belongs to the previous workspace
+            st.session_state.messages = []
+            st.session_state.rag_bot.memory.clear()
+        st.session_state.tenant = tenant
+
         provider = st.selectbox("Provider", ["OpenAI", "Azure OpenAI"], index=0)
         api_key = None
         azure_config = None
@@ -278,7 +417,9 @@ def main():
                 }
                 # Store azure config in session state
                 st.session_state.azure_config = azure_config
-                st.session_state.rag_bot.initialize_openai(None, provider="azure", azure_config=azure_config)
+                if st.session_state.rag_bot.initialize_openai(None, provider="azure", azure_config=azure_config,
+                                                             tenant=tenant):
+                    st.session_state.rag_bot.reopen_index()
         else:
             api_key = st.text_input(
                 "OpenAI API Key",
@@ -287,7 +428,8 @@ def main():
             )
             
             if api_key:
-                st.session_state.rag_bot.initialize_openai(api_key, provider="openai")
+                if st.session_state.rag_bot.initialize_openai(api_key, provider="openai", tenant=tenant):
+                    st.session_state.rag_bot.reopen_index()
         
         st.header("Document Upload")
         
@@ -311,12 +453,9 @@ def main():
                     if not st.session_state.get('azure_config'):
                         st.error("Please provide Azure OpenAI credentials first!")
                     else:
-                        all_documents = []
-                        for uploaded_file in uploaded_files:
-                            documents = st.session_state.rag_bot.load_single_pdf(
-                                uploaded_file
-                            )
-                            all_documents.extend(documents)
+                        all_documents = st.session_state.rag_bot.load_uploaded_pdfs(
+                            uploaded_files
+                        )
                         if all_documents:
                             st.session_state.rag_bot.process_documents(
                                 all_documents
@@ -325,12 +464,9 @@ def main():
                     if not api_key:
                         st.error("Please provide OpenAI API Key first!")
                     else:
-                        all_documents = []
-                        for uploaded_file in uploaded_files:
-                            documents = st.session_state.rag_bot.load_single_pdf(
-                                uploaded_file
-                            )
-                            all_documents.extend(documents)
+                        all_documents = st.session_state.rag_bot.load_uploaded_pdfs(
+                            uploaded_files
+                        )
                         if all_documents:
                             st.session_state.rag_bot.process_documents(
                                 all_documents
@@ -349,16 +485,65 @@ def main():
                     if not st.session_state.get('azure_config'):
                         st.error("Please provide Azure OpenAI credentials first!")
                     else:
-                        documents = st.session_state.rag_bot.load_pdfs_from_directory(pdf_directory)
-                        if documents:
-                            st.session_state.rag_bot.process_documents(documents)
+                        st.session_state.rag_bot.sync_directory(pdf_directory)
                 else:
                     if not api_key:
                         st.error("Please provide OpenAI API Key first!")
                     else:
-                        documents = st.session_state.rag_bot.load_pdfs_from_directory(pdf_directory)
-                        if documents:
-                            st.session_state.rag_bot.process_documents(documents)
+                        st.session_state.rag_bot.sync_directory(pdf_directory)
+        
+        with st.expander("🔎 Filter documents"):
+            sources = st.multiselect("Source files", st.session_state.rag_bot.sources())
+            page_from, page_to = st.columns(2)
+            page_min = page_from.number_input("From page", min_value=0, value=None, step=1)
+            page_max = page_to.number_input("To page", min_value=0, value=None, step=1)
+            ingested_after = st.date_input("Ingested since", value=None)
+        st.session_state.filters = MetadataFilter(
+            sources=tuple(sources),
+            page_min=None if page_min is None else int(page_min),
+            page_max=None if page_max is None else int(page_max),
+            ingested_after=ingested_after
+        )
+
+        with st.expander("⏱️ Startup timings"):
+            st.caption("Warm-up finished" if warmup_done() else "Warm-up still running")
+            for module, seconds, thread in startup_report():
+                st.text(f"{module:<36} {seconds:6.3f}s  ({thread})")
+
+        shared = registry.stats()
+        st.caption(f"Shared engines: {shared['engines']}, serving {shared['sessions']} sessions")
+        resident = resident_indexes.stats()
+        st.caption(
+            f"Resident indexes: {resident['resident']} "
+            f"({resident['resident_mb']:.0f} / {resident['memory_cap_mb']:.0f} MB), "
+            f"{resident['evictions']} evicted"
+        )
+        answer_cache = st.session_state.rag_bot.answer_cache
+        if answer_cache:
+            cache_stats = answer_cache.stats()
+            st.caption(
+                f"Answer cache: {cache_stats['entries']} entries, "
+                f"{cache_stats['hit_rate']:.0%} hit rate"
+            )
+        memory = st.session_state.rag_bot.memory.stats()
+        st.caption(
+            f"Conversation memory: {memory['turns']} recent turns, "
+            f"{memory['summarized_turns']} summarized ({memory['tokens']} / {memory['max_tokens']} tokens)"
+        )
+        engine = st.session_state.rag_bot.engine
+        if engine.embeddings is not None:
+            st.caption(
+                f"Duplicate questions coalesced: {engine.flights.coalesced}, "
+                f"query embeddings {engine.embeddings.stats()['hit_rate']:.0%} cached"
+            )
+        embedding_cache = document_cache(engine.embeddings)
+        if embedding_cache is not None:
+            cache_stats = embedding_cache.stats()
+            st.caption(
+                f"Embedding cache: {cache_stats['entries']} vectors, "
+                f"{cache_stats['hits']} hits / {cache_stats['misses']} misses "
+                f"({cache_stats['hit_rate']:.0%})"
+            )
     
     # Main chat interface
     st.header("Chat with your documents")
@@ -367,19 +552,13 @@ def main():
     for message in st.session_state.messages:
         with st.chat_message(message["role"]):
             st.markdown(message["content"])
-            if "sources" in message:
-                with st.expander("View Sources"):
-                    for i, source in enumerate(message["sources"]):
-                        st.markdown(f"**Source {i+1}:**")
-                        page_num = source.metadata.get('page', 'Unknown')
-                        st.markdown(f"Page: {page_num}")
-                        content_preview = source.page_content[:500]
-                        st.markdown(f"Content: {content_preview}...")
-                        st.markdown("---")
+            if message.get("sources"):
+                show_sources(message["sources"])
     
     # Chat input
     if prompt := st.chat_input("Ask a question about your documents..."):
-        if not st.session_state.rag_bot.qa_chain:
+        # An unloaded index is reloaded by the question itself
+        if not (st.session_state.rag_bot.qa_chain or st.session_state.rag_bot.engine.evicted):
             st.error("Please upload and process documents first!")
         else:
             # Add user message
@@ -388,30 +567,32 @@ def main():
             with st.chat_message("user"):
                 st.markdown(prompt)
             
-            # Get bot response
+            # Get bot response, rendering tokens as they arrive
             with st.chat_message("assistant"):
-                with st.spinner("Thinking..."):
-                    answer, sources = st.session_state.rag_bot.\
-                        ask_question(prompt)
+                filters = st.session_state.get("filters")
+                with st.spinner("Searching documents..."):
+                    stream = st.session_state.rag_bot.stream_question(prompt, filters)
                 
-                st.markdown(answer)
+                answer_placeholder = st.empty()
+                for _ in stream:
+                    answer_placeholder.markdown(stream.answer + "▌")
+                answer_placeholder.markdown(stream.answer)
+                answer, sources = stream.answer, [source_preview(doc) for doc in stream.sources]
+                if stream.cached:
+                    st.caption("⚡ Answered from cache")
+                if filters is not None and not filters.empty:
+                    st.caption(f"🔎 Searched only: {filters.describe()}")
                 
                 if sources:
-                    with st.expander("View Sources"):
-                        for i, source in enumerate(sources):
-                            st.markdown(f"**Source {i+1}:**")
-                            page_num = source.metadata.get('page', 'Unknown')
-                            st.markdown(f"Page: {page_num}")
-                            content_preview = source.page_content[:500]
-                            st.markdown(f"Content: {content_preview}...")
-                            st.markdown("---")
+                    show_sources(sources)
             
-            # Add assistant message
+            # Add assistant message; older ones are already in the memory's summary
             st.session_state.messages.append({
                 "role": "assistant",
                 "content": answer,
                 "sources": sources
             })
+            del st.session_state.messages[:-config.CHAT_HISTORY_MAX_MESSAGES]
 
 
 if __name__ == "__main__":
@@ -0,0 +1,745 @@
+"""
+UI-free RAG core shared by the Streamlit app and the HTTP API.
+
+``RAGEngine`` owns the persisted indexes (vector store, BM25 index, ingest
+manifest), the retriever / QA chain built on top of them and the answer
+cache. It never talks to a UI: failures raise, and ingest methods return an
+``IngestResult`` the caller can report however it likes.
+
+An engine serves one tenant's index (see ``tenants``); with a
+``ResidentIndexManager`` attached, the index may be unloaded while the
+tenant is idle and is reloaded from disk on its next question.
+"""
+
+import contextlib
+import itertools
+import logging
+import os
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+
+import config
+from answer_cache import SemanticAnswerCache, normalize_question
+from chroma_store import (
+    KNOWN_DIMENSIONS,
+    EmbeddingMismatchError,
+    chroma_collection_exists,
+    expected_dimension,
+    load_persisted_chroma,
+    open_chroma,
+    record_embedding_signature,
+    reset_chroma,
+    unload_chroma,
+)
+from context_packing import ContextPackingRetriever
+from embedding_cache import CachedEmbeddings, CacheUse, document_cache, with_query_cache
+from embedding_pipeline import PipelinedEmbeddings
+from ingest_manifest import IngestManifest, chunk_ids_for
+from lexical_index import HybridRetriever, LexicalIndex, LexicalIndexError
+from native_index import METADATA_FILE, NativeVectorStore
+from parallel_loader import ParallelPDFLoader, find_pdfs
+from reranker import RerankingRetriever, get_scorer
+from single_flight import SingleFlight
+from streaming import AnswerStream, SharedAnswerStream, stream_answer
+from streaming_ingest import BatchUpserter, IngestProgress, split_pages
+from tenants import record_tenant_use, tenant_collection_name, tenant_directory, validate_tenant
+from token_splitter import get_text_splitter
+
+log = logging.getLogger(__name__)
+
+NO_DOCUMENTS = "Please load documents first!"  # answer while nothing is indexed
+
+
+def embeddings_from_env():
+    """Cached, pipelined embeddings for Azure OpenAI (if configured) or OpenAI, keyed from the process environment"""
+    if os.getenv("AZURE_OPENAI_API_KEY") and os.getenv("AZURE_OPENAI_ENDPOINT"):
+        from langchain_openai import AzureOpenAIEmbeddings
+        deployment = os.getenv("AZURE_OPENAI_EMBEDDING_DEPLOYMENT", "text-embedding-ada-002")
+        return CachedEmbeddings(PipelinedEmbeddings(AzureOpenAIEmbeddings(
+            azure_deployment=deployment,
+            api_version=os.getenv("AZURE_OPENAI_API_VERSION", "2024-12-01-preview"),
+            azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
+            api_key=os.getenv("AZURE_OPENAI_API_KEY"),
+        )), model_name=deployment)
+    from langchain_openai import OpenAIEmbeddings
+    return CachedEmbeddings(PipelinedEmbeddings(OpenAIEmbeddings(api_key=os.getenv("OPENAI_API_KEY"))))
+
+
+def llm_from_env():
+    """Chat model for Azure OpenAI (if configured) or OpenAI, keyed from the process environment"""
+    if os.getenv("AZURE_OPENAI_API_KEY") and os.getenv("AZURE_OPENAI_ENDPOINT"):
+        from langchain_openai import AzureChatOpenAI
+        return AzureChatOpenAI(
+            azure_deployment=os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME", "gpt-4.1"),
+            api_version=os.getenv("AZURE_OPENAI_API_VERSION", "2024-12-01-preview"),
+            azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
+            api_key=os.getenv("AZURE_OPENAI_API_KEY"),
+            temperature=config.OPENAI_TEMPERATURE,
+        )
+    from langchain_openai import ChatOpenAI
+    return ChatOpenAI(temperature=config.OPENAI_TEMPERATURE, model=config.OPENAI_MODEL,
+                      api_key=os.getenv("OPENAI_API_KEY"))
+
+
+@dataclass
+class IngestResult:
+    chunks: int = 0
+    files: int = 0
+    diff: object = None  # ManifestDiff for directory syncs
+    embedding_stats: object = None  # PipelineStats, if anything was embedded
+    embedding_cache: object = None  # CacheUse of the embedding cache, if it was asked
+    failed: list = field(default_factory=list)  # (path, exception) of PDFs that could not be read
+
+    @property
+    def changed(self):
+        return self.diff is None or self.diff.has_changes
+
+
+class RAGEngine:
+    """Indexes, retriever, QA chain and answer cache behind one object.
+
+    Queries may run concurrently from many threads; ingests are serialized
+    by ``ingest_lock``. Rebuilding the QA chain swaps one attribute, so
+    in-flight queries finish on the chain they started with. Identical
+    questions asked while one is being answered wait for that answer instead
+    of running the pipeline again (``flights`` / ``_streams``).
+    """
+
+    def __init__(self, embeddings=None, llm=None, tenant=None, resident=None):
+        self.embeddings = embeddings
+        self.llm = llm
+        self.tenant = validate_tenant(tenant)
+        self.resident = resident  # ResidentIndexManager, if the index may be unloaded
+        self.evicted = False
+        self.vectorstore = None
+        self.qa_chain = None
+        self.lexical_index = None
+        self.answer_cache = SemanticAnswerCache() if config.ANSWER_CACHE_ENABLED else None
+        # Cached answers are only valid for the index version they came from
+        self.index_version = None
+        self.ingest_lock = threading.RLock()
+        self._pins = 0  # questions reading the index; unload() waits for none
+        self._pins_lock = threading.Lock()
+        self.flights = SingleFlight()
+        self._streams = {}  # flight key -> SharedAnswerStream still generating
+        self._streams_lock = threading.Lock()
+        self._use_recorded = -float("inf")  # monotonic time the tenant was last dated
+        self._cache_counts = None  # embedding cache (hits, misses) when the ingest started
+
+    @property
+    def embeddings(self):
+        return self._embeddings
+
+    @embeddings.setter
+    def embeddings(self, embeddings):
+        # Each question is embedded by the answer cache and the retriever
+        self._embeddings = with_query_cache(embeddings)
+
+    @property
+    def index_version(self):
+        return self._index_version
+
+    @index_version.setter
+    def index_version(self, version):
+        # Answers from earlier versions can never be served again
+        self._index_version = version
+        if self.answer_cache is not None:
+            self.answer_cache.retain(version)
+
+    def index_directory(self):
+        """This tenant's directory of the active backend; manifest and BM25 index live there"""
+        if config.VECTOR_BACKEND == "native":
+            return tenant_directory(config.NATIVE_INDEX_DIRECTORY, self.tenant)
+        return tenant_directory(config.PERSIST_DIRECTORY, self.tenant)
+
+    def open_vectorstore(self):
+        """Open (or create) this tenant's persisted vector store of the configured backend"""
+        if config.VECTOR_BACKEND == "native":
+            return NativeVectorStore(self.embeddings, persist_directory=self.index_directory())
+        return open_chroma(self.embeddings, collection_name=tenant_collection_name(self.tenant))
+
+    def has_persisted_index(self):
+        """Whether this tenant has an index on disk, checked without creating one"""
+        if config.VECTOR_BACKEND == "native":
+            return os.path.exists(os.path.join(self.index_directory(), METADATA_FILE))
+        return chroma_collection_exists(collection_name=tenant_collection_name(self.tenant))
+
+    def open_existing_index(self):
+        """Reopen the persisted index without re-embedding anything.
+
+        Returns False if nothing has been indexed yet (creating nothing on
+        disk); raises ``EmbeddingMismatchError`` if the index was built with
+        another model.
+        """
+        with self.ingest_lock:
+            if not self.has_persisted_index():
+                return False
+            if config.VECTOR_BACKEND == "native":
+                vectorstore = self.open_vectorstore()
+                if not len(vectorstore.index):
+                    return False
+                stored_dim, current_dim = vectorstore.index.dim, expected_dimension(self.embeddings)
+                if current_dim and stored_dim != current_dim:
+                    raise EmbeddingMismatchError(
+                        f"Native index holds {stored_dim}-dimensional vectors, but the "
+                        f"configured embeddings produce {current_dim}."
+                    )
+            else:
+                vectorstore = load_persisted_chroma(
+                    self.embeddings, collection_name=tenant_collection_name(self.tenant)
+                )
+                if vectorstore is None:
+                    return False
+            self.vectorstore = vectorstore
+            if self.index_version is None:
+                self.index_version = uuid.uuid4().hex
+            self.create_qa_chain()
+            self.evicted = False
+        self._mark_used()
+        return True
+
+    def ensure_resident(self, pin=False):
+        """Reload the index if the resident-index manager unloaded it; mark it used.
+
+        Returns the QA chain to answer with (``None`` if nothing is indexed),
+        read atomically with the resident check, so a loaded tenant never
+        looks empty. With ``pin`` the index also stays loaded until
+        ``_unpin`` (see ``resident_chain``).
+        """
+        while True:
+            if self.evicted:
+                with self.ingest_lock:
+                    if self.evicted:
+                        if not self.open_existing_index():
+                            # The index is gone from disk; nothing to reload
+                            self.evicted = False
+                        elif self.resident is not None:
+                            self.resident.record_reload()
+            with self._pins_lock:
+                # Unloaded again since the reload: go round
+                if not self.evicted:
+                    qa_chain = self.qa_chain
+                    if pin:
+                        self._pins += 1
+                    break
+        self._mark_used()
+        return qa_chain
+
+    def _unpin(self):
+        with self._pins_lock:
+            self._pins -= 1
+
+    @contextlib.contextmanager
+    def resident_chain(self):
+        """The QA chain (``None`` if nothing is indexed), its index kept loaded inside the block"""
+        qa_chain = self.ensure_resident(pin=True)
+        try:
+            yield qa_chain
+        finally:
+            self._unpin()
+
+    def _mark_used(self):
+        if self.resident is not None and self.vectorstore is not None:
+            self.resident.touch(self)
+        # Dated on disk (hourly at most) so idle tenants can be pruned
+        now = time.monotonic()
+        if self.tenant is not None and now - self._use_recorded >= 3600:
+            if record_tenant_use(self.index_directory()):
+                self._use_recorded = now
+
+    def unload(self):
+        """Drop the in-memory index (vectors, BM25, QA chain) until ``ensure_resident``.
+
+        Returns False, leaving the index loaded, while an ingest is running
+        or a question is reading it (``resident_chain``).
+        """
+        if not self.ingest_lock.acquire(blocking=False):
+            return False
+        try:
+            with self._pins_lock:
+                if self._pins:
+                    return False
+                # From here on readers wait for a reload instead of using the chain
+                self.evicted = True
+            if self.vectorstore is not None and config.VECTOR_BACKEND != "native":
+                unload_chroma(self.vectorstore)
+            self.vectorstore = None
+            self.qa_chain = None
+            self.lexical_index = None
+            return True
+        finally:
+            self.ingest_lock.release()
+
+    def reset_index(self):
+        """Delete this tenant's vector store with the ingest manifest and BM25 index beside it.
+
+        The three describe the same chunks; the next ``sync_directory``
+        re-indexes every PDF.
+        """
+        with self.ingest_lock:
+            self.vectorstore = None
+            self.qa_chain = None
+            self.lexical_index = None
+            self.index_version = None
+            directory = self.index_directory()
+            if config.VECTOR_BACKEND == "native":
+                # Files only: other tenants' indexes live in subdirectories
+                names = ([entry.name for entry in os.scandir(directory) if entry.is_file()]
+                         if os.path.isdir(directory) else [])
+            else:
+                reset_chroma(self.embeddings,
+                             collection_name=tenant_collection_name(self.tenant))
+                names = [config.MANIFEST_FILE, config.LEXICAL_INDEX_FILE]
+            for name in names:
+                path = os.path.join(directory, name)
+                if os.path.exists(path):
+                    os.remove(path)
+
+    def resident_bytes(self):
+        """Estimated memory of the loaded index: vectors, ANN graph and BM25 index"""
+        vectorstore = self.vectorstore
+        if vectorstore is None:
+            return 0
+        if config.VECTOR_BACKEND == "native":
+            index = vectorstore.index
+            # Memory-mapped float32 rows, plus hnswlib's own copy when enabled
+            vector_bytes = len(index) * 4 * (index.dim or 0) + index.hnsw_bytes()
+        else:
+            count = vectorstore._collection.count()
+            dim = ((vectorstore._collection.metadata or {}).get("embedding_dimension")
+                   or expected_dimension(self.embeddings)
+                   or KNOWN_DIMENSIONS["text-embedding-ada-002"])
+            # float32 vector plus ~2*M graph links of 4 bytes each per chunk
+            vector_bytes = count * (4 * dim + 8 * config.HNSW_M)
+        lexical_index = self.lexical_index
+        lexical_bytes = lexical_index.memory_bytes() if lexical_index is not None else 0
+        return vector_bytes + lexical_bytes
+
+    def document_count(self):
+        """Chunks in the open vector store"""
+        if self.vectorstore is None:
+            return 0
+        if config.VECTOR_BACKEND == "native":
+            return len(self.vectorstore.index)
+        return self.vectorstore._collection.count()
+
+    def _record_signature(self, vectorstore):
+        if config.VECTOR_BACKEND != "native":
+            record_embedding_signature(vectorstore, self.embeddings)
+
+    @staticmethod
+    def _persist_vectorstore(vectorstore):
+        # Native HNSW graphs grow in memory; Chroma persists on every write
+        if config.VECTOR_BACKEND == "native":
+            vectorstore.persist()
+
+    def get_lexical_index(self):
+        """BM25 index persisted next to the vector store, loaded on first use"""
+        with self.ingest_lock:
+            if self.lexical_index is None:
+                try:
+                    self.lexical_index = LexicalIndex.load_or_create(
+                        os.path.join(self.index_directory(), config.LEXICAL_INDEX_FILE)
+                    )
+                except LexicalIndexError as e:
+                    # Forget what was indexed so the next sync re-adds every
+                    # file (upserts, embeddings come from the cache) and
+                    # rebuilds lexical coverage
+                    log.warning("%s; the next sync re-indexes this tenant's files", e)
+                    manifest = os.path.join(self.index_directory(), config.MANIFEST_FILE)
+                    if os.path.exists(manifest):
+                        os.remove(manifest)
+                    self.lexical_index = LexicalIndex()
+        return self.lexical_index
+
+    def save_lexical_index(self):
+        self.get_lexical_index().save(
+            os.path.join(self.index_directory(), config.LEXICAL_INDEX_FILE)
+        )
+
+    def _reset_embedding_stats(self):
+        reset = getattr(self.embeddings, "reset_pipeline_stats", None)
+        if reset:
+            reset()
+        cache = document_cache(self.embeddings)
+        self._cache_counts = (cache.hits, cache.misses) if cache else None
+
+    def _embedding_stats(self):
+        stats = getattr(self.embeddings, "pipeline_stats", None)
+        return stats if stats and stats.chunks else None
+
+    def _embedding_cache_use(self):
+        """Cache hits and misses since ``_reset_embedding_stats`` (questions asked meanwhile included)"""
+        cache = document_cache(self.embeddings)
+        if cache is None or self._cache_counts is None:
+            return None
+        hits, misses = self._cache_counts
+        use = CacheUse(hits=cache.hits - hits, misses=cache.misses - misses)
+        return use if use.hits or use.misses else None
+
+    @staticmethod
+    def text_splitter():
+        return get_text_splitter()
+
+    def add_documents(self, documents, on_progress=None):
+        """Split documents, add the chunks to both indexes and rebuild the chain.
+
+        ``documents`` may be any iterable (e.g. a lazy loader); pages are
+        split and indexed in bounded batches as they arrive.
+        """
+        with self.ingest_lock:
+            self._reset_embedding_stats()
+            vectorstore = self.open_vectorstore()
+            sources = set()
+            progress = IngestProgress(files_total=len({
+                doc.metadata.get("source") for doc in documents
+            }) if isinstance(documents, list) else 0)
+
+            def count_file(doc):
+                source = doc.metadata.get("source")
+                if source not in sources:
+                    sources.add(source)
+                    progress.files_done = len(sources) - 1
+                    progress.current_file = source
+                return doc
+
+            writer = BatchUpserter(vectorstore, self.get_lexical_index(), progress,
+                                   on_progress=on_progress)
+            pages = (count_file(doc) for doc in documents)
+            for chunk in split_pages(pages, self.text_splitter(), progress):
+                writer.add(chunk, uuid.uuid4().hex)
+            writer.flush()
+            if progress.chunks:
+                self._record_signature(vectorstore)
+                self._persist_vectorstore(vectorstore)
+                self.save_lexical_index()
+            self.vectorstore = vectorstore
+            self.index_version = uuid.uuid4().hex
+            self.create_qa_chain()
+            self.evicted = False
+            progress.files_done, progress.done = len(sources), True
+            writer.report()
+        self._mark_used()
+        return IngestResult(chunks=progress.chunks, files=len(sources),
+                            embedding_stats=self._embedding_stats(),
+                            embedding_cache=self._embedding_cache_use())
+
+    def sync_directory(self, pdf_directory, on_progress=None, root=None):
+        """Incrementally index a PDF directory using the ingest manifest.
+
+        Unchanged PDFs are skipped, modified ones have their old chunks
+        replaced and PDFs that disappeared from the directory are purged.
+        PDFs are streamed page by page through bounded batches (see
+        ``streaming_ingest``); ``on_progress`` receives ``IngestProgress``
+        snapshots. With ``root``, PDFs whose real path (symlinks resolved)
+        leaves that directory are ignored.
+        """
+        if not os.path.exists(pdf_directory):
+            raise FileNotFoundError(f"Directory {pdf_directory} does not exist!")
+
+        with self.ingest_lock:
+            # Loaded first: an unreadable BM25 index discards the manifest
+            lexical_index = self.get_lexical_index()
+            manifest = IngestManifest(
+                os.path.join(self.index_directory(), config.MANIFEST_FILE)
+            )
+            self._reset_embedding_stats()
+            vectorstore = self.open_vectorstore()
+            self.vectorstore = vectorstore
+            if manifest.files and not self.document_count():
+                # The index was deleted or renamed; the manifest no longer describes it
+                manifest.files.clear()
+            diff = manifest.diff(pdf_directory, find_pdfs(pdf_directory, root=root))
+
+            stale_ids = manifest.stale_chunk_ids(diff)
+            if stale_ids:
+                vectorstore.delete(ids=stale_ids)
+                lexical_index.delete(stale_ids)
+            for state in diff.removed:
+                manifest.forget(state.path)
+
+            progress = IngestProgress(files_total=len(diff.to_index))
+            # Files whose chunks are all buffered; recorded once they are written
+            finished = []
+            last_checkpoint = [time.monotonic()]
+
+            def checkpoint():
+                # BM25 index first: the saved manifest must never list a file
+                # whose chunks the saved BM25 index lacks, or the next sync
+                # would skip it as unchanged. Deletes not yet saved are redone
+                # by the next sync, since the saved manifest still lists them.
+                self._persist_vectorstore(vectorstore)
+                self.save_lexical_index()
+                manifest.save()
+                last_checkpoint[0] = time.monotonic()
+
+            def record_finished():
+                for state, ids in finished:
+                    manifest.record(state, ids)
+                finished.clear()
+                # Saved during the run so an interrupted one keeps its progress
+                if time.monotonic() - last_checkpoint[0] >= config.INGEST_CHECKPOINT_SECONDS:
+                    checkpoint()
+
+            writer = BatchUpserter(vectorstore, lexical_index, progress,
+                                   on_flush=record_finished, on_progress=on_progress)
+            text_splitter = self.text_splitter()
+            states = {state.path: state for state in diff.to_index}
+            loader = ParallelPDFLoader(paths=list(states))
+            # Pages stream in file order, so each file's pages are contiguous
+            pages_by_file = itertools.groupby(
+                loader.lazy_load(), key=lambda doc: doc.metadata["source"]
+            )
+            # Chunks written for files that failed part-way through
+            partial_ids = []
+            for path, pages in pages_by_file:
+                state = states.pop(path)
+                progress.current_file = path
+                ids = []
+                for chunk in split_pages(pages, text_splitter, progress):
+                    chunk_id = chunk_ids_for(state.path, state.sha256, 1, start=len(ids))[0]
+                    ids.append(chunk_id)
+                    writer.add(chunk, chunk_id)
+                # The loader records a failure before yielding the next file's pages
+                if path in loader.failed:
+                    partial_ids.extend(ids)
+                else:
+                    finished.append((state, ids))
+                progress.files_done += 1
+                writer.report()
+            # PDFs without any pages produce no documents but are still indexed
+            for state in states.values():
+                if state.path not in loader.failed:
+                    finished.append((state, []))
+                progress.files_done += 1
+            writer.flush()
+            if partial_ids:
+                vectorstore.delete(ids=partial_ids)
+                lexical_index.delete(partial_ids)
+            # Left out of the manifest, so the next sync tries them again
+            for path in loader.failed:
+                manifest.forget(path)
+            if diff.has_changes:
+                checkpoint()
+                self._record_signature(vectorstore)
+            else:
+                manifest.save()
+
+            if diff.has_changes or self.index_version is None:
+                self.index_version = uuid.uuid4().hex
+            self.create_qa_chain()
+            self.evicted = False
+            progress.done = True
+            writer.report()
+        self._mark_used()
+        return IngestResult(chunks=progress.chunks, files=len(diff.to_index) - len(loader.failed),
+                            diff=diff, failed=list(loader.errors),
+                            embedding_stats=self._embedding_stats(),
+                            embedding_cache=self._embedding_cache_use())
+
+    def _vector_filter(self, filters):
+        """``MetadataFilter`` in the form the vector store's ``filter`` argument takes"""
+        if filters is None or filters.empty:
+            return None
+        if config.VECTOR_BACKEND == "native":
+            return filters
+        return filters.chroma_where()
+
+    def build_retriever(self, filters=None):
+        """Vector or hybrid first stage, optionally followed by CPU reranking and context packing.
+
+        ``filters`` (a ``MetadataFilter``) restricts the first stage before scoring.
+        """
+        k = config.RERANK_FETCH_K if config.RERANK_ENABLED else config.RETRIEVAL_K
+        vector_filter = self._vector_filter(filters)
+        if config.HYBRID_RETRIEVAL:
+            retriever = HybridRetriever(
+                vectorstore=self.vectorstore,
+                lexical_index=self.get_lexical_index(),
+                k=k,
+                fetch_k=max(k, config.HYBRID_FETCH_K),
+                filter=filters,
+                vector_filter=vector_filter
+            )
+        else:
+            search_kwargs = {"k": k}
+            if vector_filter is not None:
+                search_kwargs["filter"] = vector_filter
+            retriever = self.vectorstore.as_retriever(search_kwargs=search_kwargs)
+        if config.RERANK_ENABLED:
+            retriever = RerankingRetriever(base_retriever=retriever, scorer=get_scorer(),
+                                           top_n=config.RERANK_TOP_N)
+        if config.CONTEXT_PACKING:
+            retriever = ContextPackingRetriever(base_retriever=retriever,
+                                                max_tokens=config.CONTEXT_MAX_TOKENS)
+        return retriever
+
+    def create_qa_chain(self, llm=None):
+        """(Re)build the QA chain; ``llm`` replaces the engine's chat model"""
+        if llm is not None:
+            self.llm = llm
+        if not self.vectorstore or self.llm is None:
+            return None
+        # langchain.chains is slow to import; keep it off the startup path
+        from langchain.chains import RetrievalQA
+        self.qa_chain = RetrievalQA.from_chain_type(
+            llm=self.llm,
+            chain_type="stuff",
+            retriever=self.build_retriever(),
+            return_source_documents=True,
+            verbose=config.VERBOSE
+        )
+        if self.answer_cache:
+            self.answer_cache.embeddings = self.embeddings
+        return self.qa_chain
+
+    def _filtered_chain(self, qa_chain, filters):
+        """``qa_chain`` with a retriever restricted to ``filters``; prompt and LLM are shared"""
+        if filters is None or filters.empty:
+            return qa_chain
+        from langchain.chains import RetrievalQA
+        return RetrievalQA(
+            combine_documents_chain=qa_chain.combine_documents_chain,
+            retriever=self.build_retriever(filters),
+            return_source_documents=qa_chain.return_source_documents,
+            verbose=qa_chain.verbose
+        )
+
+    def sources(self):
+        """Sources of the indexed chunks, for choosing filters"""
+        with self.resident_chain():
+            if self.vectorstore is None:
+                return []
+            return self.get_lexical_index().sources()
+
+    @staticmethod
+    def _cache_filters(filters):
+        # Answers to a filtered question are only valid for that filter
+        return None if filters is None or filters.empty else filters
+
+    def _cached_answer(self, question, filters=None):
+        """Look up a previous answer for this (or a paraphrased) question"""
+        if not self.answer_cache:
+            return None
+        try:
+            return self.answer_cache.get(question, self.index_version,
+                                         self._cache_filters(filters))
+        except Exception:
+            # The cache is an optimization; never fail a question because of it
+            return None
+
+    def _cache_answer(self, key, question, answer, source_docs):
+        # Answered from the index version in the flight key; a newer one may have replaced it
+        if not self.answer_cache or key[0] != self.index_version:
+            return
+        try:
+            self.answer_cache.put(question, key[0], answer, source_docs, key[1])
+        except Exception:
+            pass
+
+    def _flight_key(self, question, filters):
+        return (self.index_version, self._cache_filters(filters), normalize_question(question))
+
+    def _answer(self, key, qa_chain, question, filters):
+        result = self._filtered_chain(qa_chain, filters).invoke({"query": question})
+        answer = result["result"]
+        source_docs = result["source_documents"]
+        self._cache_answer(key, question, answer, source_docs)
+        return answer, source_docs
+
+    def _standalone(self, question, memory):
+        if memory is None:
+            return question
+        return memory.standalone_question(question, self.llm)
+
+    def _remember(self, stream, memory, question):
+        """``stream``, recording its turn in ``memory`` once it completes"""
+        if memory is not None:
+            stream.on_complete = lambda stream: memory.add_turn(question, stream.answer, self.llm)
+        return stream
+
+    def _open_stream(self, key, qa_chain, question, filters):
+        stream = stream_answer(
+            self._filtered_chain(qa_chain, filters), question,
+            on_complete=lambda stream: self._cache_answer(
+                key, question, stream.answer, stream.sources
+            )
+        )
+        shared = SharedAnswerStream(stream, on_finish=lambda: self._close_stream(key, shared))
+        with self._streams_lock:
+            self._streams[key] = shared
+        return shared
+
+    def _close_stream(self, key, shared):
+        with self._streams_lock:
+            if self._streams.get(key) is shared:
+                del self._streams[key]
+
+    def ask_question(self, question, filters=None, memory=None):
+        """Ask a question and get ``(answer, source_documents)``.
+
+        ``filters`` is a ``MetadataFilter``; with a ``ConversationMemory`` the
+        question may be a follow-up, and the turn is recorded in it.
+        """
+        with self.resident_chain() as qa_chain:
+            if not qa_chain:
+                return NO_DOCUMENTS, []
+
+            asked, question = question, self._standalone(question, memory)
+            try:
+                key = self._flight_key(question, filters)
+                answer, source_docs = self._cached_answer(question, filters) or self.flights.do(
+                    key, lambda: self._answer(key, qa_chain, question, filters)
+                )
+            except Exception as e:
+                return f"Error processing question: {str(e)}", []
+        if memory is not None:
+            memory.add_turn(asked, answer, self.llm)
+        return answer, source_docs
+
+    def stream_question(self, question, filters=None, memory=None):
+        """Retrieve sources, then stream the answer token by token (see ``ask_question``)"""
+        # Retrieval happens before this returns; the tokens need no index
+        with self.resident_chain() as qa_chain:
+            return self._stream_question(qa_chain, question, filters, memory)
+
+    def _stream_question(self, qa_chain, question, filters, memory):
+        if not qa_chain:
+            return AnswerStream.from_text(NO_DOCUMENTS)
+
+        asked, question = question, self._standalone(question, memory)
+        cached = self._cached_answer(question, filters)
+        if cached:
+            answer, source_docs = cached
+            return self._remember(AnswerStream.from_text(answer, source_docs, cached=True),
+                                  memory, asked)
+
+        key = self._flight_key(question, filters)
+        try:
+            reader = self._join_stream(key, qa_chain, question, filters)
+        except Exception as e:
+            return AnswerStream.from_text(f"Error processing question: {str(e)}")
+        return self._remember(reader, memory, asked)
+
+    def _join_stream(self, key, qa_chain, question, filters):
+        """A reader of the answer being streamed for ``key``, starting one if needed"""
+        while True:
+            with self._streams_lock:
+                shared = self._streams.get(key)
+            if shared is not None:
+                # reader() is taken outside _streams_lock: the stream calls
+                # _close_stream with its own lock held
+                reader = shared.reader(started=time.perf_counter())
+                if reader is not None:
+                    self.flights.joined()
+                    return reader
+            # Callers arriving during retrieval share it too
+            shared = self.flights.do(
+                ("stream", key), lambda: self._open_stream(key, qa_chain, question, filters)
+            )
+            reader = shared.reader()
+            if reader is not None:
+                return reader
+            # Every reader left before this one joined; the stream is gone, start over
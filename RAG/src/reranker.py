@@ -0,0 +1,123 @@
+"""
+Retrieve-wide-then-rerank stage with a per-query latency budget.
+
+The first-stage retriever cheaply fetches many candidates (e.g. 50); a CPU
+scorer then reranks them and only the best few are handed to the LLM, which
+cuts prompt tokens. Scorers are pluggable: a lexical-overlap scorer is the
+default and a local cross-encoder can be used when ``sentence-transformers``
+is installed.
+"""
+
+import threading
+import time
+
+from langchain_core.retrievers import BaseRetriever
+
+import config
+from lexical_index import tokenize
+
+
+class LexicalOverlapScorer:
+    """Fraction of query terms (and adjacent term pairs) present in the passage"""
+
+    def score(self, query, documents):
+        query_terms = tokenize(query)
+        if not query_terms:
+            return [0.0] * len(documents)
+        unique_terms = set(query_terms)
+        query_pairs = set(zip(query_terms, query_terms[1:]))
+
+        scores = []
+        for doc in documents:
+            doc_terms = tokenize(doc.page_content)
+            doc_term_set = set(doc_terms)
+            score = len(unique_terms & doc_term_set) / len(unique_terms)
+            if query_pairs:
+                doc_pairs = set(zip(doc_terms, doc_terms[1:]))
+                score += 0.5 * len(query_pairs & doc_pairs) / len(query_pairs)
+            scores.append(score)
+        return scores
+
+
+class CrossEncoderScorer:
+    """Local cross-encoder relevance scores (requires ``sentence-transformers``)"""
+
+    def __init__(self, model_name=None):
+        try:
+            from sentence_transformers import CrossEncoder
+        except ImportError as e:
+            raise ImportError(
+                "CrossEncoderScorer needs sentence-transformers: "
+                "pip install sentence-transformers"
+            ) from e
+        self.model = CrossEncoder(model_name or config.RERANK_CROSS_ENCODER_MODEL, device="cpu")
+
+    def score(self, query, documents):
+        pairs = [(query, doc.page_content) for doc in documents]
+        return [float(s) for s in self.model.predict(pairs)]
+
+
+_scorers = {}  # name -> scorer; models load once per process, not per retriever
+_scorers_lock = threading.Lock()
+
+
+def get_scorer(name=None):
+    name = name or config.RERANK_SCORER
+    with _scorers_lock:
+        scorer = _scorers.get(name)
+        if scorer is None:
+            scorer = _scorers[name] = (
+                CrossEncoderScorer() if name == "cross-encoder" else LexicalOverlapScorer()
+            )
+        return scorer
+
+
+class RerankingRetriever(BaseRetriever):
+    """Reranks a wide first-stage result list and keeps the top ``top_n``.
+
+    Candidates are scored in small batches in first-stage order. The time
+    budget covers scoring only: first-stage retrieval (which includes the
+    remote query-embedding call) is timed separately. Once the budget is
+    spent the remaining candidates keep their first-stage rank behind the
+    scored ones. ``last_timings`` holds per-stage timings of the most recent
+    query.
+    """
+
+    base_retriever: BaseRetriever
+    scorer: object
+    top_n: int = config.RERANK_TOP_N
+    time_budget_ms: float = config.RERANK_TIME_BUDGET_MS
+    batch_size: int = 8
+    last_timings: dict = {}
+
+    class Config:
+        arbitrary_types_allowed = True
+
+    def _get_relevant_documents(self, query, *, run_manager=None):
+        start = time.perf_counter()
+        candidates = self.base_retriever.get_relevant_documents(query)
+        retrieved = time.perf_counter()
+
+        deadline = retrieved + self.time_budget_ms / 1000.0
+        scored = []
+        position = 0
+        while position < len(candidates) and time.perf_counter() < deadline:
+            batch = candidates[position:position + self.batch_size]
+            scores = self.scorer.score(query, batch)
+            scored.extend(zip(scores, range(position, position + len(batch))))
+            position += len(batch)
+        reranked = time.perf_counter()
+
+        # Higher score first; first-stage rank breaks ties
+        scored.sort(key=lambda item: (-item[0], item[1]))
+        order = [i for _, i in scored] + list(range(position, len(candidates)))
+
+        self.last_timings = {
+            "retrieve_ms": (retrieved - start) * 1000,
+            "rerank_ms": (reranked - retrieved) * 1000,
+            "total_ms": (reranked - start) * 1000,
+            "candidates": len(candidates),
+            "scored": position,
+            "budget_exhausted": position < len(candidates),
+        }
+        return [candidates[i] for i in order[:self.top_n]]
@@ -0,0 +1,50 @@
+"""
+Collapse concurrent identical calls into one execution.
+
+When several threads ask for the same key at once, only the first runs the
+work; the others block until it finishes and receive the same result (or
+exception). Nothing is remembered afterwards; that is what the caches are
+for. Used for query embeddings and whole questions (``RAGEngine``).
+"""
+
+import threading
+from concurrent.futures import Future
+
+
+class SingleFlight:
+    """``do(key, fn)`` runs ``fn`` once per key among concurrent callers"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}  # key -> Future of the call in progress
+        self.executions = 0
+        self.coalesced = 0
+
+    def do(self, key, fn):
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+                self.executions += 1
+            else:
+                self.coalesced += 1
+        if leader:
+            try:
+                future.set_result(fn())
+            except BaseException as e:
+                future.set_exception(e)
+            finally:
+                with self._lock:
+                    del self._calls[key]
+        return future.result()
+
+    def joined(self):
+        """Count a caller served by work shared outside ``do``"""
+        with self._lock:
+            self.coalesced += 1
+
+    def stats(self):
+        with self._lock:
+            return {"executions": self.executions, "coalesced": self.coalesced,
+                    "in_flight": len(self._calls)}
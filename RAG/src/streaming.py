@@ -0,0 +1,164 @@
+"""
+Token streaming for RetrievalQA "stuff" chains.
+
+``RetrievalQA.invoke`` only returns once the whole answer is generated. Here
+retrieval runs first, then the chain's own prompt is filled with the retrieved
+documents and the LLM output is streamed token by token, so the UI can render
+the answer as it is produced. Sources are available before the first token.
+
+``SharedAnswerStream`` fans one generation out to every caller that asked the
+same question while it was running.
+"""
+
+import threading
+import time
+import weakref
+
+from langchain_core.prompts import format_document
+
+
+class AnswerStream:
+    """Iterable of answer tokens; ``answer`` and ``sources`` are filled as it runs"""
+
+    def __init__(self, sources, chunks, started=None, on_complete=None):
+        self.sources = sources
+        self.answer = ""
+        self.started = started or time.perf_counter()
+        self.time_to_first_token = None
+        self.total_time = None
+        self.cached = False
+        self.on_complete = on_complete  # called with the stream after a successful run
+        self._chunks = chunks
+
+    @classmethod
+    def from_text(cls, text, sources=(), cached=False):
+        """A finished stream, for canned messages and cached answers"""
+        stream = cls(list(sources), iter([text]))
+        stream.cached = cached
+        return stream
+
+    def __iter__(self):
+        try:
+            for chunk in self._chunks:
+                text = getattr(chunk, "content", chunk)
+                if not text:
+                    continue
+                if self.time_to_first_token is None:
+                    self.time_to_first_token = time.perf_counter() - self.started
+                self.answer += text
+                yield text
+        except Exception as e:
+            message = f"Error processing question: {str(e)}"
+            self.answer += message
+            yield message
+        else:
+            if self.on_complete:
+                self.on_complete(self)
+        finally:
+            self.total_time = time.perf_counter() - self.started
+
+
+class SharedAnswerStream:
+    """One ``AnswerStream``'s generation, readable by any number of callers.
+
+    Whichever reader is furthest ahead pulls the next token from the LLM, so
+    the answer completes as long as any reader keeps going, and a reader that
+    disconnects does not stall the others. The source stream's
+    ``on_complete`` runs once, when generation succeeds. If every reader goes
+    away first, generation is stopped and the stream takes no new readers.
+    """
+
+    def __init__(self, stream, on_finish=None):
+        self.sources = stream.sources
+        self.done = False
+        self.abandoned = False
+        self._stream = stream
+        self._chunks = iter(stream._chunks)
+        self._tokens = []
+        self._error = None
+        self._readers = 0
+        self._on_finish = on_finish  # called once generation ends, for any reason
+        self._lock = threading.Lock()
+
+    def _end(self):
+        # Called with the lock held, once
+        self.done = True
+        if self._error is None and not self.abandoned and self._stream.on_complete:
+            self._stream.answer = "".join(self._tokens)
+            self._stream.on_complete(self._stream)
+        if self._on_finish:
+            self._on_finish()
+
+    def _pull(self):
+        try:
+            chunk = next(self._chunks)
+        except StopIteration:
+            pass
+        except BaseException as e:
+            self._error = e
+        else:
+            self._tokens.append(getattr(chunk, "content", chunk))
+            return
+        self._end()
+
+    def _release(self):
+        with self._lock:
+            self._readers -= 1
+            if self._readers or self.done:
+                return
+            self.abandoned = True
+            try:
+                close = getattr(self._chunks, "close", None)
+                if close:
+                    close()
+            finally:
+                self._end()
+
+    def _read(self, release):
+        position = 0
+        try:
+            while True:
+                with self._lock:
+                    if position == len(self._tokens) and not self.done:
+                        self._pull()
+                    if position == len(self._tokens):
+                        if self._error is not None:
+                            raise self._error
+                        return
+                    token = self._tokens[position]
+                position += 1
+                yield token
+        finally:
+            release()
+
+    def reader(self, started=None):
+        """A new ``AnswerStream`` over the shared tokens, from the first one.
+
+        ``None`` once the stream was abandoned. A reader stops counting when
+        it is exhausted, closed or garbage-collected, even if never iterated.
+        """
+        with self._lock:
+            if self.abandoned:
+                return None
+            self._readers += 1
+        stream = AnswerStream(self.sources, None, started=started or self._stream.started)
+        release = weakref.finalize(stream, self._release)
+        stream._chunks = self._read(release)
+        return stream
+
+
+def stream_answer(qa_chain, question, on_complete=None):
+    """Retrieve documents for ``question`` and stream the answer from ``qa_chain``"""
+    started = time.perf_counter()
+    sources = qa_chain.retriever.get_relevant_documents(question)
+
+    combine_chain = qa_chain.combine_documents_chain
+    context = combine_chain.document_separator.join(
+        format_document(doc, combine_chain.document_prompt) for doc in sources
+    )
+    llm_chain = combine_chain.llm_chain
+    prompt = llm_chain.prompt.format_prompt(
+        **{combine_chain.document_variable_name: context, "question": question}
+    )
+    return AnswerStream(sources, llm_chain.llm.stream(prompt), started=started,
+                        on_complete=on_complete)
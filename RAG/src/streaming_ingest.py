@@ -0,0 +1,96 @@
+"""
+Bounded-memory ingestion: page -> split -> embed batch -> upsert.
+
+Pages are pulled one at a time from a (lazy) loader, split on their own and
+buffered until ``config.INGEST_BATCH_CHUNKS`` chunks are waiting; the batch
+is then embedded and written to the vector store and BM25 index before the
+next page is pulled. Because every stage pulls from the previous one, a slow
+embeddings API holds back parsing too (``ParallelPDFLoader`` keeps only a
+small window of page ranges in flight), so peak memory depends on the batch
+size and the loader window, not on the size of the corpus.
+
+Progress is reported through an ``on_progress`` callback as
+``IngestProgress`` snapshots.
+"""
+
+import time
+from dataclasses import dataclass, replace
+
+import config
+from metadata_filter import INGESTED_AT, ingest_timestamp
+
+
+@dataclass
+class IngestProgress:
+    """Snapshot of a running ingest, passed to ``on_progress`` callbacks"""
+    files_total: int = 0
+    files_done: int = 0
+    pages: int = 0
+    chunks: int = 0  # split so far
+    chunks_indexed: int = 0  # embedded and written
+    current_file: str = None
+    done: bool = False
+    elapsed: float = 0.0  # seconds since the ingest started
+
+    @property
+    def fraction(self):
+        if self.done:
+            return 1.0
+        return self.files_done / self.files_total if self.files_total else 0.0
+
+    def summary(self):
+        return (f"{self.files_done}/{self.files_total} files, {self.pages} pages, "
+                f"{self.chunks_indexed} chunks indexed in {self.elapsed:.1f}s")
+
+
+class BatchUpserter:
+    """Buffers chunks and writes them to both indexes a batch at a time.
+
+    ``on_flush`` is called after every write, so callers can persist
+    progress (e.g. record finished files in the ingest manifest). Chunks are
+    stamped with the ingest time for date filters.
+    """
+
+    def __init__(self, vectorstore, lexical_index, progress, batch_size=None,
+                 on_flush=None, on_progress=None):
+        self.vectorstore = vectorstore
+        self.lexical_index = lexical_index
+        self.progress = progress
+        self.batch_size = batch_size or config.INGEST_BATCH_CHUNKS
+        self.on_flush = on_flush
+        self.on_progress = on_progress
+        self.chunks = []
+        self.ids = []
+        self.started = time.perf_counter()
+        self.ingested_at = ingest_timestamp()
+
+    def add(self, chunk, chunk_id):
+        chunk.metadata[INGESTED_AT] = self.ingested_at
+        self.chunks.append(chunk)
+        self.ids.append(chunk_id)
+        self.progress.chunks += 1
+        if len(self.chunks) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if self.chunks:
+            self.vectorstore.add_documents(self.chunks, ids=self.ids)
+            self.lexical_index.add_documents(self.chunks, self.ids)
+            self.progress.chunks_indexed += len(self.chunks)
+            self.chunks, self.ids = [], []
+        if self.on_flush:
+            self.on_flush()
+        self.report()
+
+    def report(self):
+        if self.on_progress:
+            self.progress.elapsed = time.perf_counter() - self.started
+            self.on_progress(replace(self.progress))
+
+
+def split_pages(pages, text_splitter, progress=None):
+    """Yield the chunks of each page as it arrives; metadata as ``split_documents``"""
+    for page in pages:
+        if progress is not None:
+            progress.pages += 1
+        yield from text_splitter.split_documents([page])
@@ -0,0 +1,239 @@
+"""
+Per-tenant indexes and the manager that keeps hot ones in memory.
+
+Each tenant gets its own Chroma collection (``COLLECTION_NAME-<tenant>``,
+in the shared ``PERSIST_DIRECTORY``) or native index directory, plus its own
+ingest manifest and BM25 index under ``<index directory>/tenants/<tenant>``.
+Nothing is created until the tenant first ingests. The tenant ``None`` is
+the original shared index, so single-user deployments keep working as they
+were.
+
+``ResidentIndexManager`` tracks every loaded tenant index in LRU order with
+an estimate of the memory it holds (vectors, ANN graph and BM25 index). When
+the total goes over ``config.RESIDENT_INDEX_MEMORY_MB`` the least recently
+used indexes are unloaded; their engines reload them from disk on the next
+question (see ``RAGEngine.ensure_resident``).
+
+Engines date their tenant's directory as they are used (``LAST_USED_FILE``);
+``start_tenant_pruning`` deletes the indexes of tenants nobody has used for
+``config.TENANT_IDLE_DAYS``.
+"""
+
+import logging
+import os
+import re
+import shutil
+import threading
+import time
+import weakref
+from collections import OrderedDict
+
+import config
+
+log = logging.getLogger(__name__)
+
+LAST_USED_FILE = "last_used"
+
+# Lowercase so tenants differing only in case cannot share a directory on
+# case-insensitive filesystems; short enough for Chroma's 63-character names
+TENANT_PATTERN = re.compile(r"^[a-z0-9](?:[a-z0-9_-]{0,46}[a-z0-9])?$")
+
+
+class InvalidTenantError(ValueError):
+    """Tenant id that cannot be used as a collection / directory name"""
+
+
+def validate_tenant(tenant):
+    """Normalized tenant id, or ``None`` for the shared index"""
+    if tenant is None:
+        return None
+    tenant = str(tenant).strip().lower()
+    if not tenant:
+        return None
+    if not TENANT_PATTERN.match(tenant):
+        raise InvalidTenantError(
+            f"Invalid tenant {tenant!r}: use 1-48 letters, digits, '-' or '_', "
+            "starting and ending with a letter or digit"
+        )
+    return tenant
+
+
+def tenant_collection_name(tenant):
+    """Chroma collection holding ``tenant``'s chunks"""
+    return f"{config.COLLECTION_NAME}-{tenant}" if tenant else config.COLLECTION_NAME
+
+
+def tenant_directory(base_directory, tenant):
+    """Directory under ``base_directory`` holding ``tenant``'s index files"""
+    return os.path.join(base_directory, "tenants", tenant) if tenant else base_directory
+
+
+def indexed_tenants():
+    """Tenants with an index on disk for the active backend (``None`` is the shared index)"""
+    if config.VECTOR_BACKEND == "native":
+        from native_index import METADATA_FILE
+        base = config.NATIVE_INDEX_DIRECTORY
+        tenants = set()
+        if os.path.exists(os.path.join(base, METADATA_FILE)):
+            tenants.add(None)
+        if os.path.isdir(os.path.join(base, "tenants")):
+            tenants.update(entry.name for entry in os.scandir(os.path.join(base, "tenants"))
+                           if os.path.exists(os.path.join(entry.path, METADATA_FILE)))
+        return tenants
+    from chroma_store import chroma_collection_names
+    prefix = f"{config.COLLECTION_NAME}-"
+    names = chroma_collection_names()
+    tenants = {name[len(prefix):] for name in names if name.startswith(prefix)}
+    if config.COLLECTION_NAME in names:
+        tenants.add(None)
+    return tenants
+
+
+def record_tenant_use(directory):
+    """Date ``directory`` (a tenant's index directory) as used now; False if it does not exist"""
+    if not os.path.isdir(directory):
+        return False
+    path = os.path.join(directory, LAST_USED_FILE)
+    with open(path, "a"):
+        pass
+    os.utime(path)
+    return True
+
+
+def prune_idle_tenants(idle_days=None, keep=()):
+    """Delete the indexes of tenants unused for ``idle_days``; returns their ids.
+
+    Tenants in ``keep`` or with an engine loaded in this process are left
+    alone. The shared (``None``) tenant is never pruned.
+    """
+    idle_days = config.TENANT_IDLE_DAYS if idle_days is None else idle_days
+    native = config.VECTOR_BACKEND == "native"
+    base = os.path.join(
+        config.NATIVE_INDEX_DIRECTORY if native else config.PERSIST_DIRECTORY, "tenants"
+    )
+    if not os.path.isdir(base):
+        return []
+    keep = set(keep) | resident_indexes.tenants()
+    cutoff = time.time() - idle_days * 86400
+    pruned = []
+    for entry in os.scandir(base):
+        if not entry.is_dir() or entry.name in keep:
+            continue
+        marker = os.path.join(entry.path, LAST_USED_FILE)
+        last_used = os.path.getmtime(marker if os.path.exists(marker) else entry.path)
+        if last_used >= cutoff:
+            continue
+        if not native:
+            # Deferred: chromadb is one of the slowest imports at startup
+            from chroma_store import drop_chroma_collection
+            drop_chroma_collection(tenant_collection_name(entry.name))
+        shutil.rmtree(entry.path, ignore_errors=True)
+        pruned.append(entry.name)
+    if pruned:
+        log.info("Deleted the indexes of %d tenants idle for %s days: %s",
+                 len(pruned), idle_days, ", ".join(pruned))
+    return pruned
+
+
+_pruning = None
+_pruning_lock = threading.Lock()
+
+
+def _prune_daily():
+    while True:
+        try:
+            prune_idle_tenants()
+        except Exception:
+            log.exception("Pruning idle tenants failed")
+        time.sleep(86400)
+
+
+def start_tenant_pruning():
+    """Prune idle tenants now and then daily, on a background thread (once per process)"""
+    global _pruning
+    if config.TENANT_IDLE_DAYS is None:
+        return None
+    with _pruning_lock:
+        if _pruning is None:
+            _pruning = threading.Thread(target=_prune_daily, name="tenant-pruning", daemon=True)
+            _pruning.start()
+    return _pruning
+
+
+class ResidentIndexManager:
+    """LRU of loaded engine indexes under a memory cap.
+
+    Engines report every use through ``touch``; the manager only keeps weak
+    references, so engines dropped elsewhere disappear from it. Index sizes
+    are re-estimated only when an engine's index version changes.
+    """
+
+    def __init__(self, memory_cap_mb=None):
+        cap = config.RESIDENT_INDEX_MEMORY_MB if memory_cap_mb is None else memory_cap_mb
+        self.memory_cap = int(cap * 2**20)
+        self._lock = threading.Lock()
+        self._resident = OrderedDict()  # id(engine) -> [weakref, size, size_key]
+        self.evictions = 0
+        self.reloads = 0
+
+    def _forget(self, engine_id):
+        with self._lock:
+            self._resident.pop(engine_id, None)
+
+    def touch(self, engine):
+        """Mark ``engine``'s index as most recently used and evict over the cap"""
+        engine_id = id(engine)
+        size_key = (engine.index_version, engine.lexical_index is not None)
+        with self._lock:
+            entry = self._resident.get(engine_id)
+            if entry is None or entry[0]() is not engine:
+                ref = weakref.ref(engine, lambda _, engine_id=engine_id: self._forget(engine_id))
+                entry = self._resident[engine_id] = [ref, 0, None]
+            self._resident.move_to_end(engine_id)
+            stale = entry[2] != size_key
+        if stale:
+            # Estimated outside the lock; it walks the BM25 index
+            size = engine.resident_bytes()
+            with self._lock:
+                entry[1], entry[2] = size, size_key
+        self._evict(keep=engine_id)
+
+    def _evict(self, keep):
+        with self._lock:
+            total = sum(entry[1] for entry in self._resident.values())
+            victims = []
+            for engine_id, entry in self._resident.items():
+                if total <= self.memory_cap:
+                    break
+                engine = entry[0]()
+                if engine_id != keep and engine is not None:
+                    victims.append((engine_id, engine))
+                    total -= entry[1]
+        for engine_id, engine in victims:
+            # An engine ingesting or answering stays; it is retried next time
+            if engine.unload():
+                self._forget(engine_id)
+                self.evictions += 1
+
+    def record_reload(self):
+        self.reloads += 1
+
+    def tenants(self):
+        """Tenants with an index loaded in this process"""
+        with self._lock:
+            engines = [entry[0]() for entry in self._resident.values()]
+        return {engine.tenant for engine in engines if engine is not None}
+
+    def stats(self):
+        with self._lock:
+            return {
+                "resident": len(self._resident),
+                "resident_mb": sum(entry[1] for entry in self._resident.values()) / 2**20,
+                "memory_cap_mb": self.memory_cap / 2**20,
+                "evictions": self.evictions,
+                "reloads": self.reloads,
+            }
+
+
+# Shared by every engine in the process (all Streamlit sessions, the API)
+resident_indexes = ResidentIndexManager()
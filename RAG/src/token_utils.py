@@ -0,0 +1,41 @@
+"""
+Token counting helpers shared by ingestion, context packing and memory.
+
+Uses a cached ``tiktoken`` encoding. If the encoding cannot be loaded (for
+example on an offline box where tiktoken cannot download its BPE file) the
+helpers fall back to the usual ~4 characters per token estimate.
+"""
+
+from functools import lru_cache
+
+DEFAULT_ENCODING = "cl100k_base"  # ada-002, gpt-3.5-turbo and gpt-4 family
+
+
+@lru_cache(maxsize=None)
+def get_encoding(name=DEFAULT_ENCODING):
+    """Return the tiktoken encoding, or None when it is unavailable"""
+    try:
+        import tiktoken
+        return tiktoken.get_encoding(name)
+    except Exception:
+        return None
+
+
+def count_tokens(text, encoding_name=DEFAULT_ENCODING):
+    encoding = get_encoding(encoding_name)
+    if encoding is None:
+        return max(1, len(text) // 4) if text else 0
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def truncate_to_tokens(text, max_tokens, encoding_name=DEFAULT_ENCODING):
+    """The longest prefix of ``text`` that fits in ``max_tokens`` tokens"""
+    if max_tokens <= 0:
+        return ""
+    encoding = get_encoding(encoding_name)
+    if encoding is None:
+        return text[:max_tokens * 4]
+    tokens = encoding.encode(text, disallowed_special=())
+    if len(tokens) <= max_tokens:
+        return text
+    return encoding.decode(tokens[:max_tokens])
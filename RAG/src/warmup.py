@@ -0,0 +1,147 @@
+"""
+Cold-start helpers: background warm-up of heavy modules and import timings.
+
+The app imports only what it needs to draw its first page; langchain chains,
+the OpenAI client, Chroma and the PDF loaders are imported on first use.
+``start_warmup`` imports them on a daemon thread right after startup, so by
+the time a user has typed an API key they are usually loaded already.
+
+The first import of each heavy module is timed, from whichever thread runs
+it: ``start_warmup`` installs an import hook, so a page that needs a module
+before the warm-up thread reached it shows up as a main-thread import.
+``startup_report`` lists the timings, and running this module prints the
+cost of each heavy module in a fresh process:
+
+    python src/warmup.py
+"""
+
+import importlib
+import importlib.abc
+import sys
+import threading
+import time
+
+# Slowest imports first; each entry is timed on top of those before it
+HEAVY_MODULES = (
+    "langchain_community.document_loaders",
+    "langchain_openai",
+    "langchain.chains",
+    "langchain.text_splitter",
+    "langchain_community.vectorstores",
+    "chromadb",
+    "pypdf",
+)
+
+import_timings = {}  # module -> (seconds, thread name); 0.0 if it was already loaded
+_lock = threading.Lock()
+_thread = None
+_hook = None
+
+
+def _record(name, seconds, thread=None):
+    import_timings.setdefault(name, (seconds, thread or threading.current_thread().name))
+
+
+class _ImportTimer(importlib.abc.MetaPathFinder):
+    """Times the first load of the watched modules, in whichever thread loads them"""
+
+    def __init__(self, names):
+        self.names = set(names)
+
+    def find_spec(self, name, path, target=None):
+        if name not in self.names or name in import_timings:
+            return None
+        for finder in sys.meta_path:
+            find_spec = getattr(finder, "find_spec", None)
+            if finder is self or find_spec is None:
+                continue
+            spec = find_spec(name, path, target)
+            if spec is not None:
+                break
+        else:
+            return None
+        exec_module = getattr(spec.loader, "exec_module", None)
+        if exec_module is None:
+            return spec
+
+        def timed_exec_module(module):
+            start = time.perf_counter()
+            try:
+                exec_module(module)
+            finally:
+                _record(name, time.perf_counter() - start)
+
+        try:
+            spec.loader.exec_module = timed_exec_module
+        except AttributeError:
+            pass  # Loaders with slots stay untimed
+        return spec
+
+
+def watch_imports(modules=HEAVY_MODULES):
+    """Time the first import of ``modules`` from now on, in any thread"""
+    global _hook
+    with _lock:
+        for name in modules:
+            if name in sys.modules:
+                _record(name, 0.0, "before warm-up")
+        if _hook is None:
+            _hook = _ImportTimer(modules)
+            sys.meta_path.insert(0, _hook)
+        else:
+            _hook.names.update(modules)
+
+
+def timed_import(name):
+    """Import ``name`` and record how long it took"""
+    already_loaded = name in sys.modules
+    start = time.perf_counter()
+    module = importlib.import_module(name)
+    elapsed = 0.0 if already_loaded else time.perf_counter() - start
+    _record(name, elapsed)
+    return module
+
+
+def _warm(modules):
+    for name in modules:
+        try:
+            timed_import(name)
+        except Exception:
+            # Optional integrations may be missing; first use will report it
+            pass
+
+
+def start_warmup(modules=HEAVY_MODULES):
+    """Import ``modules`` on a background thread (once per process)"""
+    global _thread
+    watch_imports(modules)
+    with _lock:
+        if _thread is None:
+            _thread = threading.Thread(target=_warm, args=(modules,), name="warmup", daemon=True)
+            _thread.start()
+    return _thread
+
+
+def warmup_done():
+    return _thread is not None and not _thread.is_alive()
+
+
+def startup_report():
+    """``[(module, seconds, thread)]`` for every timed import, slowest first"""
+    rows = [(name, seconds, thread) for name, (seconds, thread) in import_timings.items()]
+    return sorted(rows, key=lambda row: row[1], reverse=True)
+
+
+def main():
+    total = 0.0
+    print(f"{'module':<40}{'seconds':>9}")
+    for name in HEAVY_MODULES:
+        timed_import(name)
+        seconds = import_timings[name][0]
+        total += seconds
+        print(f"{name:<40}{seconds:>9.3f}")
+    print(f"{'total':<40}{total:>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
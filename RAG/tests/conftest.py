@@ -0,0 +1,78 @@
+"""
+Shared fixtures: ``src`` on the import path, indexes in a temporary
+directory, and a plain-text stand-in for the PDF loader.
+"""
+
+import os
+import sys
+
+import pytest
+from langchain_core.documents import Document
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+
+class TextPDFLoader:
+    """``ParallelPDFLoader`` stand-in for files holding plain text; form feeds split
+    pages, and files that are not UTF-8 are skipped as unreadable"""
+
+    def __init__(self, directory=None, paths=None, **kwargs):
+        self.paths = list(paths or [])
+        self.errors = []
+
+    @property
+    def failed(self):
+        return {path for path, _ in self.errors}
+
+    def lazy_load(self):
+        for path in self.paths:
+            try:
+                with open(path, encoding="utf-8") as f:
+                    pages = f.read().split("\f")
+            except UnicodeDecodeError as e:
+                self.errors.append((path, e))
+                continue
+            for page, text in enumerate(pages):
+                yield Document(page_content=text, metadata={"source": path, "page": page})
+
+    def load(self):
+        return list(self.lazy_load())
+
+
+@pytest.fixture
+def index_config(tmp_path, monkeypatch):
+    """Native-backend indexes under ``tmp_path``, small ingest batches, no answer
+    cache, no tenant pruning"""
+    import config
+    for name, value in {
+        "VECTOR_BACKEND": "native",
+        "NATIVE_INDEX_DIRECTORY": str(tmp_path / "native"),
+        "PERSIST_DIRECTORY": str(tmp_path / "chroma"),
+        "INGEST_BATCH_CHUNKS": 4,
+        "INGEST_CHECKPOINT_SECONDS": 0,
+        "ANSWER_CACHE_ENABLED": False,
+        "TENANT_IDLE_DAYS": None,
+        "VERBOSE": False,
+    }.items():
+        monkeypatch.setattr(config, name, value)
+    return tmp_path
+
+
+@pytest.fixture
+def text_pdfs(monkeypatch):
+    """Make ``RAGEngine.sync_directory`` read ``*.pdf`` files as plain text"""
+    import rag_engine
+    monkeypatch.setattr(rag_engine, "ParallelPDFLoader", TextPDFLoader)
+    return TextPDFLoader
+
+
+def write_pdfs(directory, texts):
+    """``{name: text}`` as text "PDFs" in ``directory``; returns their paths"""
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for name, text in texts.items():
+        path = os.path.join(directory, name)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+        paths.append(path)
+    return paths
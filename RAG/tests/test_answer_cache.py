@@ -0,0 +1,63 @@
+"""
+``SemanticAnswerCache``: paraphrase matching, the numbers-and-names guard,
+filter scoping and dropping answers of old index versions.
+"""
+
+from answer_cache import SemanticAnswerCache, key_terms
+from metadata_filter import MetadataFilter
+
+
+class SameVectorEmbeddings:
+    """Every question embeds identically, so only the cache's own checks tell them apart"""
+
+    def embed_query(self, text):
+        return [1.0, 0.0]
+
+
+def cache():
+    return SemanticAnswerCache(SameVectorEmbeddings(), similarity_threshold=0.97,
+                               ttl_seconds=3600, max_entries=100)
+
+
+def test_key_terms():
+    assert key_terms("What was Acme's revenue in 2023?") == {"acme's", "2023"}
+    assert key_terms("How did the EU market grow? Revenue rose 4.5%") == {"eu", "4.5"}
+    assert key_terms("What did I say about revenue?") == frozenset()
+
+
+def test_paraphrases_must_name_the_same_numbers_and_entities():
+    answers = cache()
+    answers.put("What was revenue in 2023?", "v1", "Twelve percent.", [])
+    assert answers.get("what was the revenue in 2023", "v1") == ("Twelve percent.", [])
+    assert answers.get("What was revenue in 2024?", "v1") is None
+    assert answers.get("What was Globex revenue in 2023?", "v1") is None
+    assert answers.stats()["semantic_hits"] == 1
+
+
+def test_filtered_answers_only_match_the_same_filter():
+    answers = cache()
+    only_a = MetadataFilter(sources=("a.pdf",))
+    answers.put("revenue growth", "v1", "From a.pdf.", [], only_a)
+    assert answers.get("revenue growth", "v1") is None
+    assert answers.get("revenue growth", "v1", MetadataFilter(sources=("a.pdf",))) == (
+        "From a.pdf.", [])
+
+
+def test_retain_drops_other_index_versions():
+    answers = cache()
+    answers.put("revenue growth", "v1", "old", [])
+    answers.put("revenue growth", "v1", "old, filtered", [], MetadataFilter(page_min=2))
+    answers.put("costs", "v2", "new", [])
+    answers.retain("v2")
+    assert answers.stats()["entries"] == 1
+    assert answers.get("costs", "v2") == ("new", [])
+
+
+def test_engine_drops_answers_when_its_index_version_changes():
+    from rag_engine import RAGEngine
+    engine = RAGEngine()
+    engine.answer_cache = cache()
+    engine.index_version = "v1"
+    engine.answer_cache.put("revenue growth", "v1", "old", [])
+    engine.index_version = "v2"
+    assert engine.answer_cache.stats()["entries"] == 0
@@ -0,0 +1,123 @@
+"""
+FastAPI routes: ingest, query, streaming query, health, tenants and input
+validation, against fake models.
+"""
+
+import json
+import os
+import sys
+
+import pytest
+from fastapi.testclient import TestClient
+
+import config
+from conftest import write_pdfs
+from fake_models import CannedChatModel, HashEmbeddings
+from rag_engine import RAGEngine
+
+ANSWER = "Revenue grew twelve percent."
+
+
+@pytest.fixture
+def client(index_config, text_pdfs, monkeypatch):
+    import api_server
+    pdf_directory = index_config / "pdfs"
+    write_pdfs(str(pdf_directory), {
+        "report.pdf": "The 2023 report says revenue grew twelve percent.\fPage two covers costs.",
+        "notes.pdf": "Meeting notes about the office move.",
+    })
+    monkeypatch.setattr(config, "API_INGEST_ROOT", str(index_config))
+    engine = RAGEngine(HashEmbeddings(size=32), CannedChatModel(response=ANSWER))
+    with TestClient(api_server.create_app(engine)) as client:
+        client.pdf_directory = str(pdf_directory)
+        yield client
+
+
+def test_query_before_ingest(client):
+    response = client.post("/query", json={"question": "What about revenue?"})
+    assert response.status_code == 200
+    assert response.json()["answer"] == "Please load documents first!"
+    assert client.get("/health").json()["ready"] is False
+
+
+def test_ingest_then_query(client):
+    response = client.post("/ingest", json={"directory": client.pdf_directory})
+    assert response.status_code == 200
+    assert response.json()["added"] == 2 and response.json()["chunks"] >= 3
+    # Unchanged files are not re-indexed
+    assert client.post("/ingest", json={"directory": client.pdf_directory}).json()["unchanged"] == 2
+
+    body = client.post("/query", json={"question": "How much did revenue grow in 2023?"}).json()
+    assert body["answer"] == ANSWER
+    assert body["sources"][0]["source"].endswith("report.pdf")
+
+    filtered = client.post("/query", json={"question": "revenue", "filters": {
+        "sources": [os.path.join(client.pdf_directory, "notes.pdf")]}}).json()
+    assert {source["source"] for source in filtered["sources"]} == {
+        os.path.join(client.pdf_directory, "notes.pdf")}
+    assert client.get("/health").json()["ready"] is True
+
+
+def test_query_stream(client):
+    client.post("/ingest", json={"directory": client.pdf_directory})
+    with client.stream("POST", "/query/stream", json={"question": "revenue 2023"}) as response:
+        events = [json.loads(line) for line in response.iter_lines() if line]
+    assert events[0]["sources"]
+    assert "".join(event["token"] for event in events if "token" in event) == ANSWER
+    assert events[-1]["done"] is True
+
+
+def test_tenants_are_isolated(client):
+    headers = {"X-Tenant": "acme"}
+    client.post("/ingest", json={"directory": client.pdf_directory}, headers=headers)
+    assert client.post("/query", json={"question": "revenue"}, headers=headers).json()["sources"]
+    assert client.post("/query?tenant=other", json={"question": "revenue"}).json()["answer"] == (
+        "Please load documents first!")
+
+
+def test_invalid_requests(client, tmp_path):
+    assert client.post("/query", json={"question": "  "}).status_code == 400
+    assert client.post("/query", json={"question": "q", "filters": {"pages": 3}}).status_code == 400
+    assert client.post("/query", json={"question": "q"},
+                       headers={"X-Tenant": "../etc"}).status_code == 400
+    outside = str(tmp_path.parent)
+    assert client.post("/ingest", json={"directory": outside}).status_code == 403
+    assert client.post("/ingest", json={}).status_code == 400
+
+
+@pytest.mark.parametrize("body", [b"{not json", b"[1, 2]", b'"question"', b"null"])
+def test_malformed_bodies_are_rejected(client, body):
+    headers = {"content-type": "application/json"}
+    for path in ("/query", "/query/stream", "/ingest"):
+        assert client.post(path, content=body, headers=headers).status_code == 400
+
+
+def test_unknown_tenants_are_answered_without_an_engine(client, monkeypatch):
+    import api_server
+    listings = []
+    monkeypatch.setattr(api_server, "indexed_tenants", lambda: listings.append(1) or set())
+    monkeypatch.setattr(api_server, "RAGEngine", None)  # building one would fail
+    for tenant in ("other", "another", "other"):
+        body = client.post(f"/query?tenant={tenant}", json={"question": "revenue"}).json()
+        assert body == {"answer": "Please load documents first!", "sources": [],
+                        "total_time": body["total_time"]}
+    with client.stream("POST", "/query/stream?tenant=other", json={"question": "q"}) as response:
+        events = [json.loads(line) for line in response.iter_lines() if line]
+    assert events[1] == {"token": "Please load documents first!"}
+    # The tenant listing is reused until it is API_TENANT_LIST_SECONDS old
+    assert len(listings) == 1
+
+
+def test_ingest_pdf_body(client):
+    pytest.importorskip("reportlab")
+    sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+    from create_sample_pdf import create_sample_pdf
+    path = os.path.join(client.pdf_directory, "sample.pdf")
+    create_sample_pdf(path)
+    with open(path, "rb") as f:
+        response = client.post("/ingest?filename=sample.pdf", content=f.read(),
+                               headers={"content-type": "application/pdf"})
+    assert response.status_code == 200 and response.json()["chunks"] > 0
+    bad = client.post("/ingest?filename=bad.pdf", content=b"not a pdf",
+                      headers={"content-type": "application/pdf"})
+    assert bad.status_code == 400
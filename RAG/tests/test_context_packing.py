@@ -0,0 +1,47 @@
+"""
+``merge_chunks``: neighbouring chunks from the token splitter are merged
+back with their token overlap kept once, by position or by text.
+"""
+
+import random
+
+from langchain_core.documents import Document
+
+import config
+from context_packing import merge_chunks, min_overlap_tokens
+from token_splitter import TokenSplitter
+
+PAGE = " ".join(f"Sentence {i} says revenue grew in region {i % 7}." for i in range(60))
+
+
+def page_chunks(overlap, with_start_index=True):
+    splitter = TokenSplitter(chunk_size=40, chunk_overlap=overlap)
+    chunks = splitter.create_documents([PAGE], [{"source": "a.pdf", "page": 1}])
+    if not with_start_index:
+        for chunk in chunks:
+            del chunk.metadata["start_index"]
+    return chunks
+
+
+def test_overlapping_chunks_merge_by_position():
+    chunks = page_chunks(overlap=10)
+    assert len(chunks) > 3
+    shuffled = random.Random(0).sample(chunks, len(chunks))
+    [merged] = merge_chunks(shuffled)
+    assert merged.page_content == PAGE
+    assert merged.metadata["merged_chunks"] == len(chunks)
+    assert merged.metadata["start_index"] == 0
+
+
+def test_overlapping_chunks_merge_by_text(monkeypatch):
+    monkeypatch.setattr(config, "CHUNK_OVERLAP_TOKENS", 6)
+    [merged] = merge_chunks(page_chunks(overlap=6, with_start_index=False))
+    assert merged.page_content == PAGE
+
+
+def test_short_coincidental_overlap_is_not_merged(monkeypatch):
+    monkeypatch.setattr(config, "CHUNK_OVERLAP_TOKENS", 50)
+    assert min_overlap_tokens() == 5
+    documents = [Document(page_content="Revenue grew in the north", metadata={"source": "a.pdf"}),
+                 Document(page_content="the north office moved", metadata={"source": "a.pdf"})]
+    assert len(merge_chunks(documents)) == 2
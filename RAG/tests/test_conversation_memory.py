@@ -0,0 +1,103 @@
+"""
+``ConversationMemory``: the verbatim window, summary folding within the
+token budget (in the background with a model), and follow-up rewriting.
+"""
+
+import threading
+
+from conversation_memory import ConversationMemory, needs_context
+from fake_models import CannedChatModel
+
+
+class FailingModel:
+    def invoke(self, prompt):
+        raise RuntimeError("model unavailable")
+
+
+def test_turns_beyond_the_window_are_summarized():
+    memory = ConversationMemory(window_turns=2, max_tokens=1000, summary_tokens=100)
+    model = CannedChatModel(response="They discussed revenue.")
+    for i in range(4):
+        memory.add_turn(f"question {i}", f"answer {i}", llm=model)
+    memory.wait()
+    assert [text.split("\n")[0] for text, _ in memory.turns] == ["Human: question 2",
+                                                                 "Human: question 3"]
+    assert memory.summary == "They discussed revenue."
+    assert memory.stats()["summarized_turns"] == 2
+    history = memory.history()
+    assert history.startswith("Summary of the earlier conversation:\nThey discussed revenue.")
+    assert history.endswith("Assistant: answer 3")
+
+
+def test_history_stays_within_the_token_budget():
+    memory = ConversationMemory(window_turns=50, max_tokens=120, summary_tokens=40)
+    for i in range(30):
+        memory.add_turn(f"question {i} " + "word " * 20, f"answer {i} " + "word " * 20)
+        assert memory.stats()["tokens"] <= 120
+    # Without a model the summary keeps the most recent folded lines
+    assert memory.summary and memory.turns
+
+
+def test_failing_model_falls_back_to_recent_lines():
+    memory = ConversationMemory(window_turns=1, max_tokens=1000, summary_tokens=100)
+    memory.add_turn("first question", "first answer", llm=FailingModel())
+    memory.add_turn("second question", "second answer", llm=FailingModel())
+    memory.wait()
+    assert "first question" in memory.summary
+
+
+class BlockedModel:
+    def __init__(self):
+        self.release = threading.Event()
+
+    def invoke(self, prompt):
+        self.release.wait(5)
+        return "They discussed revenue."
+
+
+def test_summary_is_written_in_the_background():
+    memory = ConversationMemory(window_turns=1, max_tokens=1000, summary_tokens=100)
+    model = BlockedModel()
+    memory.add_turn("first question", "first answer", llm=model)
+    # Returns while the model is still summarizing; the turn stays in the history meanwhile
+    memory.add_turn("second question", "second answer", llm=model)
+    memory.add_turn("third question", "third answer", llm=model)
+    assert "first question" in memory.history() and not memory.summary
+    model.release.set()
+    memory.wait()
+    assert memory.summary == "They discussed revenue."
+    assert [text.split("\n")[0] for text, _ in memory.turns] == ["Human: third question"]
+
+
+def test_clear_forgets_everything():
+    memory = ConversationMemory(window_turns=1)
+    memory.add_turn("q1", "a1")
+    memory.add_turn("q2", "a2")
+    memory.clear()
+    assert memory.empty and memory.history() == ""
+    assert memory.stats()["summarized_turns"] == 0
+
+
+def test_standalone_question():
+    memory = ConversationMemory()
+    model = CannedChatModel(response="What was revenue on page 4 of the 2023 report?")
+    # Nothing to resolve against: asked as is, without a model call
+    assert memory.standalone_question("and on page 4?", model) == "and on page 4?"
+    assert model.calls == 0
+
+    memory.add_turn("What was revenue in the 2023 report?", "It grew 12%.")
+    assert memory.standalone_question("and on page 4?", model) == model.response
+    assert memory.standalone_question("and on page 4?", FailingModel()) == "and on page 4?"
+    # A self-contained question is not rewritten
+    calls = model.calls
+    question = "What did the 2024 report say about hiring?"
+    assert memory.standalone_question(question, model) == question
+    assert model.calls == calls
+
+
+def test_needs_context():
+    for question in ("and on page 4?", "What about costs?", "Why did it fall?",
+                     "How do those numbers compare?", "page 4?"):
+        assert needs_context(question), question
+    for question in ("What was revenue in the 2023 report?", "Who wrote the annual report?"):
+        assert not needs_context(question), question
@@ -0,0 +1,166 @@
+"""
+``EmbeddingPipeline``: batching, order preservation, 429 retries and the
+token / request budgets, on a fake clock.
+"""
+
+import threading
+import time
+
+import httpx
+import openai
+import pytest
+
+import embedding_pipeline
+from embedding_pipeline import (
+    EmbeddingPipeline,
+    PipelinedEmbeddings,
+    RateLimiter,
+    is_rate_limit_error,
+)
+from fake_models import HashEmbeddings
+
+
+class FakeClock:
+    """``clock`` / ``sleep`` pair where sleeping only advances the clock"""
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        with self._lock:
+            self.sleeps.append(seconds)
+            self.now += seconds
+
+
+class StatusError(Exception):
+    def __init__(self, status_code, retry_after=None):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+        headers = {"retry-after": str(retry_after)} if retry_after is not None else {}
+        self.response = type("Response", (), {"status_code": status_code, "headers": headers})()
+
+
+class FlakyEmbeddings(HashEmbeddings):
+    """Fails the first ``failures`` calls with ``error``"""
+
+    def __init__(self, error, failures):
+        super().__init__(size=8)
+        self.error = error
+        self.failures = failures
+
+    def embed_documents(self, texts):
+        if self.failures:
+            self.failures -= 1
+            raise self.error
+        return super().embed_documents(texts)
+
+
+class ReversedLatencyEmbeddings(HashEmbeddings):
+    """Earlier batches take longer, so batches finish out of order"""
+
+    def embed_documents(self, texts):
+        first = int(texts[0].split()[-1])
+        time.sleep(0.002 * (40 - first))
+        return super().embed_documents(texts)
+
+
+def openai_error(cls, status_code):
+    response = httpx.Response(status_code, request=httpx.Request("POST", "https://api.test"))
+    return cls("error", response=response, body=None)
+
+
+def test_is_rate_limit_error():
+    assert is_rate_limit_error(openai_error(openai.RateLimitError, 429))
+    assert is_rate_limit_error(StatusError(429))
+    assert not is_rate_limit_error(openai_error(openai.InternalServerError, 500))
+    assert not is_rate_limit_error(StatusError(503))
+    # A 429 in the message (request id, token count) is not a rate limit
+    assert not is_rate_limit_error(ValueError("request req_429 used 1429 tokens"))
+
+
+def test_rate_limiter_waits_for_token_budget():
+    clock = FakeClock()
+    limiter = RateLimiter(tokens_per_minute=600, clock=clock, sleep=clock.sleep)
+    limiter.acquire(600)
+    assert clock.sleeps == []
+    limiter.acquire(300)
+    assert clock.sleeps == [pytest.approx(30.0)]
+    # Larger than the whole budget: waits for one full minute, not forever
+    limiter.acquire(10_000)
+    assert sum(clock.sleeps) == pytest.approx(90.0)
+
+
+def test_rate_limiter_waits_for_request_budget():
+    clock = FakeClock()
+    limiter = RateLimiter(requests_per_minute=2, clock=clock, sleep=clock.sleep)
+    for _ in range(3):
+        limiter.acquire(1)
+    assert clock.sleeps == [pytest.approx(30.0)]
+
+
+def test_make_batches_bounds_tokens_and_size(monkeypatch):
+    monkeypatch.setattr(embedding_pipeline, "count_tokens", lambda text: len(text) // 4)
+    pipeline = EmbeddingPipeline(HashEmbeddings(size=8), max_batch_tokens=10, max_batch_size=3)
+    texts = ["x" * 16] * 7 + ["y" * 80]  # 4 tokens each, then one of 20 on its own
+    batches = pipeline.make_batches(texts)
+    assert [indices for indices, _ in batches] == [[0, 1], [2, 3], [4, 5], [6], [7]]
+    assert all(len(indices) <= 3 for indices, _ in batches)
+
+
+def test_vectors_keep_input_order_across_batches():
+    embeddings = ReversedLatencyEmbeddings(size=8)
+    texts = [f"chunk {i}" for i in range(40)]
+    pipeline = EmbeddingPipeline(embeddings, max_batch_size=3, max_workers=8)
+    vectors, stats = pipeline.embed(texts)
+    assert vectors == [HashEmbeddings(size=8).embed_query(text) for text in texts]
+    assert stats.chunks == 40 and stats.batches == 14
+
+
+def test_rate_limited_batch_is_retried():
+    clock = FakeClock()
+    embeddings = FlakyEmbeddings(StatusError(429, retry_after=7), failures=2)
+    pipeline = EmbeddingPipeline(embeddings, clock=clock, sleep=clock.sleep)
+    vectors, stats = pipeline.embed(["alpha", "beta"])
+    assert vectors == HashEmbeddings(size=8).embed_documents(["alpha", "beta"])
+    assert stats.retries == 2
+    assert clock.sleeps == [7.0, 7.0]
+
+
+def test_backoff_grows_and_gives_up():
+    clock = FakeClock()
+    embeddings = FlakyEmbeddings(StatusError(429), failures=10)
+    pipeline = EmbeddingPipeline(embeddings, max_retries=3, backoff_base=1.0,
+                                 clock=clock, sleep=clock.sleep)
+    with pytest.raises(StatusError):
+        pipeline.embed(["alpha"])
+    assert len(clock.sleeps) == 3
+    for attempt, delay in enumerate(clock.sleeps):
+        # Exponential, with up to 50% jitter
+        assert 2 ** attempt / 2 <= delay <= 2 ** attempt
+
+
+def test_other_errors_are_not_retried():
+    clock = FakeClock()
+    embeddings = FlakyEmbeddings(StatusError(400), failures=1)
+    pipeline = EmbeddingPipeline(embeddings, clock=clock, sleep=clock.sleep)
+    with pytest.raises(StatusError):
+        pipeline.embed(["alpha"])
+    assert clock.sleeps == []
+
+
+def test_pipelined_embeddings_accumulate_stats():
+    embeddings = PipelinedEmbeddings(HashEmbeddings(size=8), max_batch_size=2)
+    embeddings.embed_documents(["a", "b", "c"])
+    embeddings.embed_documents(["d"])
+    assert embeddings.pipeline_stats.chunks == 4
+    assert embeddings.pipeline_stats.batches == 3
+    assert embeddings.embed_query("a") == HashEmbeddings(size=8).embed_query("a")
+    # Attributes of the wrapped backend stay visible (model names key caches)
+    assert embeddings.model == "hash-embeddings-8"
+    embeddings.reset_pipeline_stats()
+    assert embeddings.pipeline_stats.chunks == 0
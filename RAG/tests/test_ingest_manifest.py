@@ -0,0 +1,65 @@
+"""
+``IngestManifest``: directory diffs, stale chunk ids and persistence.
+"""
+
+import os
+
+from conftest import write_pdfs
+from ingest_manifest import IngestManifest, chunk_ids_for
+
+
+def indexed_manifest(tmp_path, texts):
+    directory = tmp_path / "pdfs"
+    paths = write_pdfs(str(directory), texts)
+    manifest = IngestManifest(str(tmp_path / "manifest.json"))
+    diff = manifest.diff(str(directory), paths)
+    for state in diff.to_index:
+        manifest.record(state, chunk_ids_for(state.path, state.sha256, 2))
+    manifest.save()
+    return manifest, str(directory)
+
+
+def test_first_diff_adds_everything(tmp_path):
+    paths = write_pdfs(str(tmp_path / "pdfs"), {"a.pdf": "alpha", "b.pdf": "beta"})
+    manifest = IngestManifest(str(tmp_path / "manifest.json"))
+    diff = manifest.diff(str(tmp_path / "pdfs"), paths)
+    assert sorted(os.path.basename(state.path) for state in diff.added) == ["a.pdf", "b.pdf"]
+    assert diff.has_changes and not diff.modified and not diff.removed
+
+
+def test_diff_after_changes(tmp_path):
+    manifest, directory = indexed_manifest(
+        tmp_path, {"same.pdf": "same", "touched.pdf": "touched", "edited.pdf": "v1",
+                   "gone.pdf": "gone"})
+    manifest = IngestManifest(manifest.path)  # reloaded from disk
+    touched = os.path.join(directory, "touched.pdf")
+    os.utime(touched, (1, 1))  # new mtime, same bytes
+    write_pdfs(directory, {"edited.pdf": "version two", "new.pdf": "new"})
+    os.remove(os.path.join(directory, "gone.pdf"))
+
+    paths = sorted(os.path.join(directory, name) for name in os.listdir(directory))
+    diff = manifest.diff(directory, paths)
+    names = lambda states: sorted(os.path.basename(state.path) for state in states)  # noqa: E731
+    assert names(diff.added) == ["new.pdf"]
+    assert names(diff.modified) == ["edited.pdf"]
+    assert names(diff.removed) == ["gone.pdf"]
+    assert names(diff.unchanged) == ["same.pdf", "touched.pdf"]
+
+    stale = manifest.stale_chunk_ids(diff)
+    for name in ("edited.pdf", "gone.pdf"):
+        assert set(manifest.files[IngestManifest.key(os.path.join(directory, name))].chunk_ids) <= set(stale)
+    assert len(stale) == 4
+
+
+def test_files_outside_the_directory_are_not_removed(tmp_path):
+    manifest, _ = indexed_manifest(tmp_path, {"a.pdf": "alpha"})
+    other = write_pdfs(str(tmp_path / "other"), {"b.pdf": "beta"})
+    diff = manifest.diff(str(tmp_path / "other"), other)
+    assert len(diff.added) == 1 and not diff.removed
+
+
+def test_chunk_ids_depend_on_content():
+    first = chunk_ids_for("/a.pdf", "hash1", 3)
+    assert first == chunk_ids_for("/a.pdf", "hash1", 3)
+    assert first[1:] == chunk_ids_for("/a.pdf", "hash1", 2, start=1)
+    assert set(first).isdisjoint(chunk_ids_for("/a.pdf", "hash2", 3))
@@ -0,0 +1,99 @@
+"""
+``LexicalIndex`` (BM25) and reciprocal-rank fusion.
+"""
+
+import pickle
+
+import pytest
+from langchain_core.documents import Document
+
+from lexical_index import LexicalIndex, LexicalIndexError, reciprocal_rank_fusion, tokenize
+from metadata_filter import MetadataFilter
+
+
+def small_index():
+    index = LexicalIndex()
+    index.add(
+        ["a", "b", "c", "d"],
+        ["Figure 3.2 shows covid-19 cases by region",
+         "Revenue grew in the third quarter",
+         "The drug trial for compound XR-7 reported revenue",
+         "Unrelated appendix text"],
+        [{"source": "x.pdf", "page": 1}, {"source": "x.pdf", "page": 2},
+         {"source": "y.pdf", "page": 5}, {"source": "y.pdf", "page": 9}],
+    )
+    return index
+
+
+def test_tokenize_keeps_dotted_and_hyphenated_terms():
+    assert tokenize("Figure 3.2 and COVID-19") == ["figure", "3.2", "covid-19"]
+
+
+def test_exact_terms_rank_first():
+    index = small_index()
+    assert [chunk_id for chunk_id, _ in index.search("covid-19 figure 3.2")][0] == "a"
+    assert {chunk_id for chunk_id, _ in index.search("revenue")} == {"b", "c"}
+    assert index.search("nothing matches") == []
+
+
+def test_multi_term_scores_add_up():
+    index = small_index()
+    scores = dict(index.search("revenue trial", k=4))
+    # "c" matches both terms, "b" only one
+    assert scores["c"] > scores["b"]
+
+
+def test_metadata_filter_applies_before_scoring():
+    index = small_index()
+    hits = index.search("revenue", filter=MetadataFilter(sources=("x.pdf",)))
+    assert [chunk_id for chunk_id, _ in hits] == ["b"]
+    assert index.search("revenue", filter=MetadataFilter(page_min=3)) == [("c", pytest.approx(
+        dict(index.search("revenue"))["c"]))]
+    assert index.search("revenue", filter=MetadataFilter(sources=("missing.pdf",))) == []
+
+
+def test_delete_compact_and_sources():
+    index = small_index()
+    index.delete(["b", "c"])  # over 30% dead: compacts
+    assert len(index) == 2 and len(index.ids) == 2
+    assert index.search("revenue") == []
+    assert [chunk_id for chunk_id, _ in index.search("covid-19")] == ["a"]
+    assert index.sources() == ["x.pdf", "y.pdf"]
+    index.delete(["d"])
+    assert index.sources() == ["x.pdf"]
+
+
+def test_readding_an_id_replaces_it():
+    index = small_index()
+    index.add(["a"], ["now about revenue only"], [{"source": "x.pdf"}])
+    assert index.search("covid-19") == []
+    assert "a" in {chunk_id for chunk_id, _ in index.search("revenue")}
+
+
+def test_save_and_load_round_trip(tmp_path):
+    index = small_index()
+    path = str(tmp_path / "lexical.pkl")
+    index.save(path)
+    loaded = LexicalIndex.load(path)
+    for query in ("revenue", "covid-19 figure", "xr-7"):
+        assert loaded.search(query) == index.search(query)
+
+
+@pytest.mark.parametrize("content", [b"", b"not a pickle", pickle.dumps({"version": 99})])
+def test_unreadable_file_raises(tmp_path, content):
+    path = tmp_path / "lexical.pkl"
+    path.write_bytes(content)
+    with pytest.raises(LexicalIndexError):
+        LexicalIndex.load_or_create(str(path))
+
+
+def test_missing_file_gives_empty_index(tmp_path):
+    assert len(LexicalIndex.load_or_create(str(tmp_path / "none.pkl"))) == 0
+
+
+def test_reciprocal_rank_fusion_prefers_documents_in_both_lists():
+    a, b, c = (Document(page_content=t, metadata={"source": "s", "page": i})
+               for i, t in enumerate("abc"))
+    fused = reciprocal_rank_fusion([[a, b], [c, b]], k=3)
+    assert fused[0] is b
+    assert {doc.page_content for doc in fused} == {"a", "b", "c"}
@@ -0,0 +1,54 @@
+"""
+``MetadataFilter``: normalization, matching and the Chroma / SQL forms.
+"""
+
+from datetime import date, datetime
+
+from metadata_filter import INGESTED_AT, MetadataFilter
+
+
+def test_equal_filters_hash_equally():
+    assert MetadataFilter(sources=("b.pdf", "a.pdf", "a.pdf")) == MetadataFilter(sources=("a.pdf", "b.pdf"))
+    assert hash(MetadataFilter(sources="a.pdf")) == hash(MetadataFilter(sources=["a.pdf"]))
+    assert MetadataFilter().empty
+    assert not MetadataFilter(page_min=0).empty
+
+
+def test_matches():
+    chunk = {"source": "a.pdf", "page": 4, INGESTED_AT: 1_700_000_000}
+    assert MetadataFilter().matches(chunk)
+    assert MetadataFilter(sources=("a.pdf", "b.pdf"), page_min=4, page_max=4).matches(chunk)
+    assert not MetadataFilter(sources=("b.pdf",)).matches(chunk)
+    assert not MetadataFilter(page_min=5).matches(chunk)
+    assert MetadataFilter(ingested_after=1_600_000_000).matches(chunk)
+    assert not MetadataFilter(ingested_before=1_600_000_000).matches(chunk)
+    # Chunks indexed before timestamps existed never match a date filter
+    assert not MetadataFilter(ingested_after=0).matches({"source": "a.pdf", "page": 4})
+
+
+def test_dates_cover_whole_days():
+    day = MetadataFilter(ingested_after=date(2024, 5, 1), ingested_before=date(2024, 5, 1))
+    assert day.ingested_after == int(datetime(2024, 5, 1).timestamp())
+    assert day.ingested_before - day.ingested_after == 86399
+    assert day.matches({INGESTED_AT: int(datetime(2024, 5, 1, 23, 0).timestamp())})
+
+
+def test_chroma_where():
+    assert MetadataFilter().chroma_where() is None
+    assert MetadataFilter(sources=("a.pdf",)).chroma_where() == {"source": {"$in": ["a.pdf"]}}
+    assert MetadataFilter(sources=("a.pdf",), page_min=2, page_max=5).chroma_where() == {
+        "$and": [{"source": {"$in": ["a.pdf"]}}, {"page": {"$gte": 2}}, {"page": {"$lte": 5}}]
+    }
+
+
+def test_sql_where():
+    assert MetadataFilter().sql_where() == ("1", [])
+    clause, params = MetadataFilter(sources=("a.pdf", "b.pdf"), page_max=3,
+                                    ingested_after=100).sql_where()
+    assert clause == f"source IN (?,?) AND page <= ? AND {INGESTED_AT} >= ?"
+    assert params == ["a.pdf", "b.pdf", 3, 100]
+
+
+def test_describe():
+    assert MetadataFilter().describe() == "all documents"
+    assert MetadataFilter(sources=("a.pdf",), page_min=2).describe() == "a.pdf; pages 2-"
@@ -0,0 +1,156 @@
+"""
+``FlatIVFIndex`` / ``NativeVectorStore`` and the quantizers: exact, IVF,
+quantized and HNSW search, deletes, filters and reopening from disk.
+"""
+
+import numpy as np
+import pytest
+
+import config
+from fake_models import HashEmbeddings
+from metadata_filter import MetadataFilter
+from native_index import FlatIVFIndex, NativeVectorStore, spherical_kmeans
+from quantization import Int8Quantizer, ProductQuantizer, search_quantized
+
+
+def clustered(n, dim=32, clusters=20, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim))
+    vectors = centers[rng.integers(clusters, size=n)] + 0.3 * rng.standard_normal((n, dim))
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+
+def filled_index(directory, vectors, batch=None):
+    index = FlatIVFIndex(str(directory))
+    batch = batch or len(vectors)
+    for start in range(0, len(vectors), batch):
+        stop = min(start + batch, len(vectors))
+        index.add([str(i) for i in range(start, stop)], vectors[start:stop],
+                   [f"text {i}" for i in range(start, stop)],
+                   [{"source": f"doc{i % 3}.pdf", "page": i % 10} for i in range(start, stop)])
+    return index
+
+
+def exact_top(vectors, query, k):
+    return list(np.argsort(-(vectors @ query))[:k])
+
+
+@pytest.fixture
+def native_config(tmp_path, monkeypatch):
+    for name, value in {
+        "NATIVE_ANN_INDEX": "ivf",
+        "NATIVE_QUANTIZATION": None,
+        "NATIVE_IVF_MIN_VECTORS": 10**9,
+    }.items():
+        monkeypatch.setattr(config, name, value)
+    return tmp_path
+
+
+def test_exact_search_delete_and_reopen(native_config):
+    vectors = clustered(300)
+    index = filled_index(native_config / "index", vectors, batch=64)
+    query = vectors[7]
+    assert [row for row, _ in index.search(query, k=5)] == exact_top(vectors, query, 5)
+
+    index.delete(["7"])
+    assert 7 not in [row for row, _ in index.search(query, k=5)]
+    assert len(index) == 299
+
+    reopened = FlatIVFIndex(str(native_config / "index"))
+    assert len(reopened) == 299
+    assert reopened.search(query, k=5) == index.search(query, k=5)
+    assert reopened.documents_by_id(["8", "7", "9"])[0].page_content == "text 8"
+    assert len(reopened.documents_by_id(["8", "7", "9"])) == 2
+
+
+def test_re_adding_an_id_replaces_it(native_config):
+    index = filled_index(native_config / "index", clustered(10))
+    index.add(["3"], clustered(1, seed=5), ["new text"], [{"source": "new.pdf"}])
+    assert len(index) == 10
+    assert index.documents_by_id(["3"])[0].page_content == "new text"
+
+
+def test_filter_rows_restrict_the_search(native_config):
+    vectors = clustered(300)
+    index = filled_index(native_config / "index", vectors)
+    metadata_filter = MetadataFilter(sources=("doc1.pdf",), page_min=2, page_max=5)
+    rows = index.filter_rows(metadata_filter)
+    assert all(row % 3 == 1 and 2 <= row % 10 <= 5 for row in rows)
+    hits = index.search(vectors[0], k=10, rows=rows)
+    assert {row for row, _ in hits} <= set(rows.tolist())
+
+
+def test_ivf_search_finds_the_nearest_neighbours(native_config):
+    vectors = clustered(2000)
+    index = filled_index(native_config / "index", vectors)
+    index.build_ivf(n_lists=16)
+    assert index.ivf is not None and int(index.ivf["indexed"]) == 2000
+    recall = np.mean([
+        len(set(exact_top(vectors, q, 10)) & {row for row, _ in index.search(q, k=10, nprobe=4)}) / 10
+        for q in vectors[:50]
+    ])
+    assert recall >= 0.9
+
+
+def test_rows_added_after_the_ivf_build_are_searched(native_config):
+    vectors = clustered(600)
+    index = filled_index(native_config / "index", vectors[:500])
+    index.build_ivf(n_lists=8)
+    index.add([str(i) for i in range(500, 600)], vectors[500:], [""] * 100, [{}] * 100)
+    assert index.search(vectors[550], k=1)[0][0] == 550
+
+
+def test_spherical_kmeans_returns_unit_centroids():
+    centroids = spherical_kmeans(clustered(1000), 10)
+    assert centroids.shape == (10, 32)
+    assert np.allclose(np.linalg.norm(centroids, axis=1), 1.0, atol=1e-5)
+
+
+@pytest.mark.parametrize("quantizer", [Int8Quantizer(), ProductQuantizer(n_subspaces=8)])
+def test_quantized_search_rescores_exactly(quantizer):
+    vectors = clustered(2000)
+    quantizer.fit(vectors)
+    codes = quantizer.encode(vectors)
+    assert codes.shape == (2000, quantizer.code_size(32))
+    for query in vectors[:20]:
+        rows, scores = search_quantized(quantizer, codes, vectors, query, k=5, n_candidates=100)
+        assert list(rows) == exact_top(vectors, query, 5)
+        assert np.allclose(scores, vectors[rows] @ query)
+
+
+def test_quantized_index_skips_deleted_rows(native_config, monkeypatch):
+    monkeypatch.setattr(config, "NATIVE_QUANTIZATION", "int8")
+    monkeypatch.setattr(config, "NATIVE_QUANTIZATION_MIN_VECTORS", 100)
+    vectors = clustered(300)
+    index = filled_index(native_config / "index", vectors, batch=100)
+    assert index.quantizer is not None and len(index.codes) == 300
+    index.delete(["4"])
+    assert [row for row, _ in index.search(vectors[4], k=5)] == [
+        row for row in exact_top(vectors, vectors[4], 6) if row != 4]
+
+
+def test_hnsw_graph_is_saved_only_when_asked(native_config, monkeypatch):
+    pytest.importorskip("hnswlib")
+    monkeypatch.setattr(config, "NATIVE_ANN_INDEX", "hnsw")
+    vectors = clustered(500)
+    index = filled_index(native_config / "index", vectors, batch=100)
+    assert index.hnsw.get_current_count() == 500
+    assert not FlatIVFIndex(str(native_config / "index"))._hnsw_complete()
+
+    index.save_hnsw()
+    reopened = FlatIVFIndex(str(native_config / "index"))
+    assert reopened._hnsw_complete()
+    assert reopened.search(vectors[42], k=1)[0][0] == 42
+    assert reopened.hnsw_bytes() > 500 * 4 * 32
+
+
+def test_vector_store_round_trip(native_config):
+    store = NativeVectorStore(HashEmbeddings(size=32), persist_directory=str(native_config / "store"))
+    store.add_texts(["revenue grew in 2023", "the cat sat on the mat"],
+                    metadatas=[{"source": "a.pdf", "page": 1}, {"source": "b.pdf", "page": 2}],
+                    ids=["r", "c"])
+    assert store.similarity_search("revenue 2023", k=1)[0].page_content == "revenue grew in 2023"
+    filtered = store.similarity_search("revenue 2023", k=2, filter=MetadataFilter(sources=("b.pdf",)))
+    assert [doc.metadata["source"] for doc in filtered] == ["b.pdf"]
+    store.delete(["r"])
+    assert [doc.page_content for doc in store.get_by_ids(["r", "c"])] == ["the cat sat on the mat"]
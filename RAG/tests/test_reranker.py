@@ -0,0 +1,84 @@
+"""
+``RerankingRetriever``: scoring order, the time budget and scorer caching.
+"""
+
+import os
+import sys
+import time
+
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+import reranker  # noqa: E402
+from reranker import LexicalOverlapScorer, RerankingRetriever, get_scorer  # noqa: E402
+
+
+class ListRetriever(BaseRetriever):
+    """Returns ``documents`` after ``delay`` seconds, like a remote first stage"""
+
+    documents: list
+    delay: float = 0.0
+
+    def _get_relevant_documents(self, query, *, run_manager=None):
+        time.sleep(self.delay)
+        return list(self.documents)
+
+
+class SlowScorer:
+    def __init__(self, delay):
+        self.delay = delay
+        self.inner = LexicalOverlapScorer()
+
+    def score(self, query, documents):
+        time.sleep(self.delay)
+        return self.inner.score(query, documents)
+
+
+def documents():
+    # The best match comes last in first-stage order
+    docs = [Document(page_content=f"filler text {i}") for i in range(20)]
+    docs.append(Document(page_content="figure 3 shows revenue growth"))
+    return docs
+
+
+def test_reranks_best_match_first():
+    retriever = RerankingRetriever(base_retriever=ListRetriever(documents=documents()),
+                                   scorer=LexicalOverlapScorer(), top_n=3)
+    result = retriever.get_relevant_documents("revenue growth figure 3")
+    assert result[0].page_content == "figure 3 shows revenue growth"
+    assert len(result) == 3
+    assert retriever.last_timings["scored"] == 21
+    assert not retriever.last_timings["budget_exhausted"]
+
+
+def test_slow_first_stage_does_not_use_up_the_budget():
+    # Retrieval (e.g. the query-embedding call) takes longer than the whole budget
+    retriever = RerankingRetriever(
+        base_retriever=ListRetriever(documents=documents(), delay=0.3),
+        scorer=LexicalOverlapScorer(), top_n=3, time_budget_ms=150,
+    )
+    result = retriever.get_relevant_documents("revenue growth figure 3")
+    assert result[0].page_content == "figure 3 shows revenue growth"
+    timings = retriever.last_timings
+    assert timings["retrieve_ms"] >= 300
+    assert timings["scored"] == timings["candidates"]
+    assert not timings["budget_exhausted"]
+
+
+def test_budget_stops_scoring_and_keeps_first_stage_order():
+    retriever = RerankingRetriever(base_retriever=ListRetriever(documents=documents()),
+                                   scorer=SlowScorer(0.05), top_n=21, batch_size=4,
+                                   time_budget_ms=20)
+    result = retriever.get_relevant_documents("revenue growth figure 3")
+    timings = retriever.last_timings
+    assert timings["budget_exhausted"]
+    assert 0 < timings["scored"] < timings["candidates"]
+    # Unscored candidates follow the scored ones, in first-stage order
+    assert result[timings["scored"]:] == documents()[timings["scored"]:]
+
+
+def test_scorers_are_cached_per_name(monkeypatch):
+    monkeypatch.setattr(reranker, "_scorers", {})
+    assert get_scorer("lexical") is get_scorer("lexical")
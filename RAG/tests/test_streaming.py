@@ -0,0 +1,113 @@
+"""
+Sharing work between identical questions: ``SingleFlight`` and
+``SharedAnswerStream``.
+"""
+
+import gc
+import threading
+import time
+
+import pytest
+
+from single_flight import SingleFlight
+from streaming import AnswerStream, SharedAnswerStream
+
+
+def test_single_flight_runs_concurrent_calls_once():
+    flights = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def work():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return "answer"
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(flights.do("q", work)))
+    leader.start()
+    started.wait(5)
+    followers = [threading.Thread(target=lambda: results.append(flights.do("q", work)))
+                 for _ in range(3)]
+    for thread in followers:
+        thread.start()
+    deadline = time.monotonic() + 5
+    while flights.stats()["coalesced"] < 3 and time.monotonic() < deadline:
+        time.sleep(0.001)
+    release.set()
+    for thread in [leader, *followers]:
+        thread.join(5)
+
+    assert results == ["answer"] * 4 and len(calls) == 1
+    assert flights.stats() == {"executions": 1, "coalesced": 3, "in_flight": 0}
+    # Nothing is remembered once the call finished
+    assert flights.do("q", lambda: "again") == "again"
+
+
+def test_single_flight_shares_exceptions():
+    def fail():
+        raise ValueError("boom")
+
+    flights = SingleFlight()
+    with pytest.raises(ValueError):
+        flights.do("q", fail)
+    assert flights.stats()["in_flight"] == 0
+
+
+class Generation:
+    """Token source that records how far it was pulled and whether it was closed"""
+
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.pulled = 0
+        self.closed = False
+
+    def __iter__(self):
+        try:
+            for token in self.tokens:
+                self.pulled += 1
+                yield token
+        finally:
+            self.closed = True
+
+
+def shared(tokens, completed):
+    generation = Generation(tokens)
+    source = AnswerStream(["doc"], iter(generation), on_complete=completed.append)
+    return generation, SharedAnswerStream(source)
+
+
+def test_readers_share_one_generation():
+    completed = []
+    generation, stream = shared(["a ", "b ", "c"], completed)
+    first, second = stream.reader(), stream.reader()
+    assert next(iter(first)) == "a "
+    assert list(second) == ["a ", "b ", "c"]
+    assert "".join(first) == "b c"
+    assert generation.pulled == 3
+    assert stream.done and first.answer == second.answer == "a b c"
+    assert len(completed) == 1 and completed[0].answer == "a b c"
+    # A late reader replays the finished answer
+    assert list(stream.reader()) == ["a ", "b ", "c"]
+
+
+def test_generation_stops_when_every_reader_leaves():
+    completed = []
+    generation, stream = shared(["a ", "b ", "c"], completed)
+    reader = stream.reader()
+    tokens = iter(reader)
+    next(tokens)
+    tokens.close()
+    del reader, tokens
+    gc.collect()
+    assert stream.abandoned and generation.closed
+    assert generation.pulled == 1 and completed == []
+    assert stream.reader() is None
+
+
+def test_reader_that_is_never_iterated_is_released():
+    _, stream = shared(["a"], [])
+    stream.reader()
+    gc.collect()
+    assert stream.abandoned
@@ -0,0 +1,124 @@
+"""
+``RAGEngine.sync_directory``: an interrupted sync leaves the manifest and the
+BM25 index consistent, and the next sync completes both.
+"""
+
+import os
+
+import pytest
+
+import config
+import rag_engine
+from conftest import TextPDFLoader, write_pdfs
+from embedding_cache import CachedEmbeddings
+from fake_models import HashEmbeddings
+from ingest_manifest import IngestManifest
+from lexical_index import LexicalIndex
+from rag_engine import RAGEngine
+
+FILES = {f"report{i}.pdf": f"report {i} mentions compound{i} twice: compound{i}.\f"
+         f"page two of report {i} about revenue." for i in range(6)}
+
+
+class Interrupted(Exception):
+    pass
+
+
+class InterruptingLoader(TextPDFLoader):
+    """Fails after the pages of the first ``files`` files, like a killed ingest"""
+
+    files = 3
+
+    def lazy_load(self):
+        seen = set()
+        for doc in super().lazy_load():
+            seen.add(doc.metadata["source"])
+            if len(seen) > self.files:
+                raise Interrupted()
+            yield doc
+
+
+def saved_state(engine):
+    directory = engine.index_directory()
+    manifest = IngestManifest(os.path.join(directory, config.MANIFEST_FILE))
+    lexical = LexicalIndex.load_or_create(os.path.join(directory, config.LEXICAL_INDEX_FILE))
+    return manifest, lexical
+
+
+def test_interrupted_sync_keeps_bm25_consistent(index_config, text_pdfs, monkeypatch):
+    pdf_directory = str(index_config / "pdfs")
+    write_pdfs(pdf_directory, FILES)
+
+    monkeypatch.setattr(rag_engine, "ParallelPDFLoader", InterruptingLoader)
+    with pytest.raises(Interrupted):
+        RAGEngine(HashEmbeddings(size=32)).sync_directory(pdf_directory)
+
+    # Every file the saved manifest lists has its chunks in the saved BM25 index
+    engine = RAGEngine(HashEmbeddings(size=32))
+    manifest, lexical = saved_state(engine)
+    assert manifest.files
+    for state in manifest.files.values():
+        assert state.chunk_ids
+        assert all(chunk_id in lexical.id_to_doc for chunk_id in state.chunk_ids)
+
+    monkeypatch.setattr(rag_engine, "ParallelPDFLoader", TextPDFLoader)
+    result = engine.sync_directory(pdf_directory)
+    assert result.files == len(FILES) - len(manifest.files)
+
+    manifest, lexical = saved_state(RAGEngine(HashEmbeddings(size=32)))
+    assert len(manifest.files) == len(FILES)
+    for i in range(len(FILES)):
+        hits = lexical.search(f"compound{i}", k=1)
+        assert hits, f"compound{i} missing from the BM25 index"
+
+
+def test_unreadable_bm25_index_is_rebuilt_by_next_sync(index_config, text_pdfs, caplog):
+    pdf_directory = str(index_config / "pdfs")
+    write_pdfs(pdf_directory, FILES)
+    engine = RAGEngine(HashEmbeddings(size=32))
+    engine.sync_directory(pdf_directory)
+    with open(os.path.join(engine.index_directory(), config.LEXICAL_INDEX_FILE), "wb") as f:
+        f.write(b"not a pickle")
+
+    engine = RAGEngine(HashEmbeddings(size=32))
+    result = engine.sync_directory(pdf_directory)
+    assert "Cannot read lexical index" in caplog.text
+    assert result.files == len(FILES)
+    _, lexical = saved_state(engine)
+    assert all(lexical.search(f"compound{i}", k=1) for i in range(len(FILES)))
+
+
+def test_unreadable_pdf_is_skipped_and_retried(index_config, text_pdfs):
+    pdf_directory = str(index_config / "pdfs")
+    write_pdfs(pdf_directory, FILES)
+    broken = os.path.join(pdf_directory, "broken.pdf")
+    with open(broken, "wb") as f:
+        f.write(b"%PDF-1.4 \xff\xfe truncated")
+
+    engine = RAGEngine(HashEmbeddings(size=32))
+    result = engine.sync_directory(pdf_directory)
+    assert [path for path, _ in result.failed] == [broken]
+    assert result.files == len(FILES)
+    manifest, _ = saved_state(engine)
+    assert len(manifest.files) == len(FILES)
+    assert broken not in {state.path for state in manifest.files.values()}
+
+    # Still unreadable: tried again, the other files are unchanged
+    result = engine.sync_directory(pdf_directory)
+    assert [len(result.diff.added), len(result.diff.unchanged)] == [1, len(FILES)]
+    assert result.files == 0
+
+
+def test_re_ingest_reports_embedding_cache_hits(index_config, text_pdfs):
+    pdf_directory = str(index_config / "pdfs")
+    write_pdfs(pdf_directory, FILES)
+    embeddings = CachedEmbeddings(HashEmbeddings(size=32),
+                                  cache_path=str(index_config / "embeddings.sqlite3"))
+    first = RAGEngine(embeddings).sync_directory(pdf_directory)
+    assert first.embedding_cache.hits == 0 and first.embedding_cache.misses == first.chunks
+
+    engine = RAGEngine(embeddings)
+    engine.reset_index()
+    second = engine.sync_directory(pdf_directory)
+    assert second.embedding_cache.hits == second.chunks and second.embedding_cache.misses == 0
+    assert "100%" in second.embedding_cache.summary()
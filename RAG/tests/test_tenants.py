@@ -0,0 +1,32 @@
+"""
+Tenant indexes: idle ones are pruned from disk, used and loaded ones stay.
+"""
+
+import os
+import time
+
+from conftest import write_pdfs
+from fake_models import HashEmbeddings
+from rag_engine import RAGEngine
+from tenants import LAST_USED_FILE, prune_idle_tenants, resident_indexes
+
+
+def test_prune_idle_tenants(index_config, text_pdfs):
+    pdf_directory = str(index_config / "pdfs")
+    write_pdfs(pdf_directory, {"a.pdf": "alpha report"})
+    engines = {tenant: RAGEngine(HashEmbeddings(size=16), tenant=tenant)
+               for tenant in ("idle", "recent", "loaded")}
+    for engine in engines.values():
+        engine.sync_directory(pdf_directory)
+    loaded = RAGEngine(HashEmbeddings(size=16), tenant="loaded", resident=resident_indexes)
+    assert loaded.open_existing_index()
+
+    long_ago = time.time() - 40 * 86400
+    for tenant in ("idle", "loaded"):
+        marker = os.path.join(engines[tenant].index_directory(), LAST_USED_FILE)
+        os.utime(marker, (long_ago, long_ago))
+
+    assert prune_idle_tenants(idle_days=30) == ["idle"]
+    assert not os.path.exists(engines["idle"].index_directory())
+    assert not RAGEngine(HashEmbeddings(size=16), tenant="idle").open_existing_index()
+    assert RAGEngine(HashEmbeddings(size=16), tenant="recent").open_existing_index()
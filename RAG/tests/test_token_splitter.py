@@ -0,0 +1,99 @@
+"""
+Property test: ``TokenSplitter`` chunks never exceed ``chunk_size`` tokens.
+
+Runs over random text with cl100k_base when tiktoken can load it, with a
+small byte-level BPE built here (so it also runs offline), and with the
+characters-per-token fallback used when no encoding is available.
+"""
+
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+import token_splitter  # noqa: E402
+import token_utils  # noqa: E402
+
+WORDS = ("revenue grew in the quarter report healthcare model data analysis results "
+         "performance market growth retrieval embeddings").split()
+SEPARATORS = (" ", " ", " ", ". ", ", ", "\n", "\n\n")
+
+
+def random_text(rng, words):
+    pieces = []
+    for _ in range(words):
+        if rng.random() < 0.7:
+            word = rng.choice(WORDS)
+        else:
+            word = "".join(rng.choice("abcdefghijklmnopqrstuvwxyz0123456789éß")
+                           for _ in range(rng.randint(1, 14)))
+        pieces.append(word + rng.choice(SEPARATORS))
+    return "".join(pieces)
+
+
+def toy_encoding():
+    """Byte-level BPE whose word tokens all carry the leading space.
+
+    A chunk starting at a bare word therefore encodes to more tokens than
+    the window it was cut from, which is the case the splitter must handle.
+    """
+    tiktoken = pytest.importorskip("tiktoken")
+    ranks = {bytes([i]): i for i in range(256)}
+    for word in WORDS:
+        token = (" " + word).encode()
+        for end in range(2, len(token) + 1):
+            ranks.setdefault(token[:end], len(ranks))
+    return tiktoken.Encoding("toy", pat_str=r""" ?\w+| ?[^\s\w]+|\s+(?!\S)|\s+""",
+                             mergeable_ranks=ranks, special_tokens={})
+
+
+def cl100k_encoding():
+    encoding = token_utils.get_encoding()
+    if encoding is None:
+        pytest.skip("cl100k_base is not available offline")
+    return encoding
+
+
+@pytest.fixture(params=["toy", "cl100k_base", "fallback"])
+def encoding(request, monkeypatch):
+    encoding = {"toy": toy_encoding, "cl100k_base": cl100k_encoding,
+                "fallback": lambda: None}[request.param]()
+    for module in (token_utils, token_splitter):
+        monkeypatch.setattr(module, "get_encoding", lambda name=None: encoding)
+    return encoding
+
+
+@pytest.mark.parametrize("chunk_size", [8, 20, 50, 128])
+def test_chunks_fit_chunk_size(encoding, chunk_size):
+    rng = random.Random(chunk_size)
+    for overlap in (0, chunk_size // 4, chunk_size // 2):
+        splitter = token_splitter.TokenSplitter(chunk_size=chunk_size, chunk_overlap=overlap)
+        for _ in range(25):
+            text = random_text(rng, rng.randint(1, 600))
+            for chunk in splitter.split_text(text):
+                assert token_utils.count_tokens(chunk) <= chunk_size, chunk
+
+
+def test_chunks_cover_text(encoding):
+    rng = random.Random(1)
+    splitter = token_splitter.TokenSplitter(chunk_size=30, chunk_overlap=0)
+    for _ in range(25):
+        text = random_text(rng, rng.randint(1, 400))
+        # Without overlap, the chunks are the text minus whitespace at the cuts
+        assert "".join("".join(splitter.split_text(text)).split()) == "".join(text.split())
+
+
+def test_offsets_and_span_count_match_a_full_encode(encoding):
+    rng = random.Random(2)
+    for _ in range(25):
+        text = random_text(rng, rng.randint(1, 300))
+        tokens = token_splitter._TokenOffsets(text)
+        if encoding is not None:
+            assert tokens.starts == encoding.decode_with_offsets(encoding.encode_ordinary(text))[1]
+        for _ in range(20):
+            start, end = sorted(rng.randrange(len(text) + 1) for _ in range(2))
+            assert tokens.span_count(text, start, end) == token_utils.count_tokens(
+                text[start:end].strip()), (start, end)
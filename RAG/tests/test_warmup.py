@@ -0,0 +1,40 @@
+"""
+Import timings: first imports of watched modules are recorded from any
+thread, not only the warm-up thread's.
+"""
+
+import sys
+import threading
+
+import pytest
+
+import warmup
+
+
+@pytest.fixture
+def watched(tmp_path, monkeypatch):
+    for name in ("slow_module_a", "slow_module_b"):
+        (tmp_path / f"{name}.py").write_text("import time\ntime.sleep(0.01)\n")
+    monkeypatch.syspath_prepend(str(tmp_path))
+    monkeypatch.setattr(sys, "meta_path", list(sys.meta_path))
+    monkeypatch.setattr(warmup, "_hook", None)
+    monkeypatch.setattr(warmup, "import_timings", {})
+    yield ("slow_module_a", "slow_module_b")
+    for name in ("slow_module_a", "slow_module_b"):
+        sys.modules.pop(name, None)
+
+
+def test_imports_are_timed_in_any_thread(watched):
+    warmup.watch_imports(watched + ("json",))
+    import slow_module_a  # noqa: F401
+    thread = threading.Thread(target=warmup.timed_import, args=("slow_module_b",), name="warmup")
+    thread.start()
+    thread.join()
+
+    timings = warmup.import_timings
+    assert timings["slow_module_a"][1] == threading.current_thread().name
+    assert timings["slow_module_b"][1] == "warmup"
+    assert timings["slow_module_a"][0] >= 0.01
+    # Loaded before watching started: no cost to attribute
+    assert timings["json"] == (0.0, "before warm-up")
+    assert [name for name, _, _ in warmup.startup_report()][-1] == "json"